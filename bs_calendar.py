@@ -0,0 +1,112 @@
+"""Array-backed Bikram Sambat <-> Gregorian calendar index.
+
+The month-length table shipped with ``nepali_datetime`` is read once at import
+and flattened into two compact arrays:
+
+* ``_MONTH_START[k]`` - day offset (from BS 1975-01-01) of the first day of
+  month ``k``, where ``k = (year - MIN_YEAR) * 12 + (month - 1)``.
+* ``_DAY_MONTH[n]``   - month index ``k`` that day offset ``n`` falls in.
+
+With those, both directions are a couple of array lookups instead of building a
+``nepali_datetime.date`` and formatting it with ``strftime``.
+"""
+import csv
+from array import array
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from nepali_datetime.config import CALENDAR_PATH, REFERENCE_DATE_AD
+
+_EPOCH_AD = date(**REFERENCE_DATE_AD)  # AD date of BS MIN_YEAR-01-01
+_EPOCH_ORDINAL = _EPOCH_AD.toordinal()
+
+
+def _load_table():
+    years = []
+    month_start = array('i', [0])
+    with open(CALENDAR_PATH, 'r') as fh:
+        rows = csv.reader(fh)
+        next(rows)
+        for row in rows:
+            years.append(int(row[0]))
+            for days in row[1:13]:
+                month_start.append(month_start[-1] + int(days))
+    day_month = array('H', bytes(2 * month_start[-1]))
+    for k in range(len(month_start) - 1):
+        for n in range(month_start[k], month_start[k + 1]):
+            day_month[n] = k
+    return years[0], years[-1], month_start, day_month
+
+
+MIN_YEAR, MAX_YEAR, _MONTH_START, _DAY_MONTH = _load_table()
+MIN_AD = _EPOCH_AD
+MAX_AD = _EPOCH_AD + timedelta(days=len(_DAY_MONTH) - 1)
+
+
+def _offset(year: int, month: int, day: int) -> int:
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"BS year must be in {MIN_YEAR}..{MAX_YEAR}", year)
+    if not 1 <= month <= 12:
+        raise ValueError("month must be in 1..12", month)
+    k = (year - MIN_YEAR) * 12 + month - 1
+    first = _MONTH_START[k]
+    if not 1 <= day <= _MONTH_START[k + 1] - first:
+        raise ValueError("day is out of range for month", day)
+    return first + day - 1
+
+
+def days_in_month(year: int, month: int) -> int:
+    k = (year - MIN_YEAR) * 12 + month - 1
+    return _MONTH_START[k + 1] - _MONTH_START[k]
+
+
+def bs_to_ad(year: int, month: int, day: int) -> date:
+    return date.fromordinal(_EPOCH_ORDINAL + _offset(year, month, day))
+
+
+def ad_to_bs(ad_date: date) -> Tuple[int, int, int]:
+    n = ad_date.toordinal() - _EPOCH_ORDINAL
+    if not 0 <= n < len(_DAY_MONTH):
+        raise ValueError(f"AD date must be in {MIN_AD}..{MAX_AD}", ad_date)
+    k = _DAY_MONTH[n]
+    return MIN_YEAR + k // 12, k % 12 + 1, n - _MONTH_START[k] + 1
+
+
+def parse_bs(bs_date_str) -> date:
+    """Converts a ``YYYY-MM-DD`` (or ``YYYY/MM/DD``) BS string to an AD date."""
+    y, m, d = map(int, str(bs_date_str).replace('/', '-').split('-'))
+    return bs_to_ad(y, m, d)
+
+
+def format_bs(ad_date: date) -> str:
+    return '%04d-%02d-%02d' % ad_to_bs(ad_date)
+
+
+def ad_range_to_bs(start: date, end: date) -> List[str]:
+    """Formats every day from ``start`` to ``end`` (inclusive) as a BS string.
+
+    Walks the month table once instead of converting each day separately.
+    """
+    count = (end - start).days + 1
+    if count <= 0:
+        return []
+    format_bs(end)  # range check on the far end
+    n = start.toordinal() - _EPOCH_ORDINAL
+    y, m, d = ad_to_bs(start)
+    k = _DAY_MONTH[n]
+    month_len = _MONTH_START[k + 1] - _MONTH_START[k]
+    prefix = '%04d-%02d-' % (y, m)
+    out = []
+    for _ in range(count):
+        if d > month_len:
+            k += 1
+            y, m, d = MIN_YEAR + k // 12, k % 12 + 1, 1
+            month_len = _MONTH_START[k + 1] - _MONTH_START[k]
+            prefix = '%04d-%02d-' % (y, m)
+        out.append(prefix + '%02d' % d)
+        d += 1
+    return out
+
+
+def today_bs(now: datetime = None) -> str:
+    return format_bs((now or datetime.now()).date())
@@ -14,3 +14,6 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'padsala_project.settings')
 
 application = get_asgi_application()
+
+from study_planner import chapter_index  # noqa: E402 (needs the app registry)
+chapter_index.warm()
@@ -60,6 +60,7 @@ SITE_ID = 1
 AUTH_USER_MODEL = 'study_planner.CustomUser'
 
 MIDDLEWARE = [
+    'study_planner.metrics.MetricsMiddleware', # first, so its timings include the other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,6 +74,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'padsala_project.urls'
 
+# Requests slower than this are logged with their slowest SQL (see study_planner.metrics)
+SLOW_REQUEST_MS = 500
+
+# Plans computed at once per process (see study_planner.planner_pool)
+PLANNER_WORKERS = 4
+
+# Planning job queue (see study_planner.jobs): worker processes started by
+# run_plan_jobs, jobs one user (or anonymous session) may have waiting or running, seconds before a
+# running job is taken to be orphaned and re-run, seconds finished jobs are kept
+PLAN_JOB_PROCESSES = 2
+PLAN_JOB_MAX_ACTIVE = 3
+PLAN_JOB_LEASE = 300
+PLAN_JOB_KEEP = 24 * 60 * 60
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -98,10 +113,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not the shared-cache in-memory default: that one fails concurrent
+        # writers with "table is locked" instead of waiting, which the session
+        # ingestion concurrency test needs.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Caches
+# 'plans' holds generated schedules (study_planner.plan_cache): LRU over
+# MAX_ENTRIES, expiring after TIMEOUT seconds. Keys change with the user's
+# mastery, so per-process entries never go stale; use
+# 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION
+# directory to share hits between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'plans': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'plans',
+        'TIMEOUT': 6 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 512},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -137,6 +176,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = '/static/'
+# Bump with every change to the static assets: index.html requests them with
+# ?v=ASSET_VERSION and the service worker precaches those URLs
+ASSET_VERSION = '23'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
@@ -14,3 +14,6 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'padsala_project.settings')
 
 application = get_wsgi_application()
+
+from study_planner import chapter_index  # noqa: E402 (needs the app registry)
+chapter_index.warm()
@@ -1,85 +1,330 @@
-import nepali_datetime
+import bs_calendar
+import time
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 
 def bs_to_ad(bs_date_str):
-    bs_date_str = str(bs_date_str).replace('/', '-')
-    y, m, d = map(int, bs_date_str.split('-'))
-    np_date = nepali_datetime.date(y, m, d)
-    return np_date.to_datetime_date()
+    return bs_calendar.parse_bs(bs_date_str)
 
 def ad_to_bs(ad_date):
-    np_date = nepali_datetime.date.from_datetime_date(ad_date)
-    return np_date.strftime('%Y-%m-%d')
+    return bs_calendar.format_bs(ad_date)
 
-def get_micro_chunks(subject_name: str, focus_area: str, allocated_mins: float, session_mins: float, break_mins: float, plan_type: str = "study", current_time: datetime = None):
-    plan = []
+TASK_TYPES = ("study", "revision", "exam", "break", "meal", "buffer")
+STUDY, REVISION, EXAM, BREAK, MEAL, BUFFER = range(len(TASK_TYPES))
+_WITH_SUBJECT = (True, True, True, False, False, False) # task types that carry a "subject" key
+
+# Activity labels by id; {focus} and {subject} are filled in at render time
+LABELS = (
+    "{focus}", # free text, e.g. meal names from the day template
+    "Final Polish: {subject}",
+    "OFFICIAL EXAM",
+    "Post-Exam Recovery",
+    "Reflection & Next Day Prep",
+    "Deep Rest / Buffer",
+    "Micro-Break (20-20-20)",
+    "Rapid Concept Scan: {focus} ({subject})",
+    "Past Paper Blitz: {focus} ({subject})",
+    "Formula Drill: {focus} ({subject})",
+    "High-Yield Review: {focus} ({subject})",
+    "Deep Work: Concepts: {focus} ({subject})",
+    "Active Recall: {focus} ({subject})",
+    "Past Paper Sprint: {focus} ({subject})",
+    "Feynman Review: {focus} ({subject})",
+    "Spaced Revision: {focus} ({subject})",
+    "Weak Point Polish: {focus} ({subject})",
+    "Flashcard Drill: {focus} ({subject})",
+)
+TEXT, POLISH, OFFICIAL_EXAM, RECOVERY, REFLECTION, DEEP_REST, MICRO_BREAK = range(7)
+PHASES = {"intensive": (7, 8, 9, 10), "study": (11, 12, 13, 14), "revision": (15, 16, 17)}
+
+class StringTable:
+    """Interned subject, chapter and meal names of one plan, referenced by id."""
+    __slots__ = ('strings', '_ids')
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def id(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+class Task:
+    """One scheduled block: start minute of the day, length, type code, label id
+    and string-table ids for subject and focus (-1 when absent)."""
+    __slots__ = ('start', 'minutes', 'type', 'label', 'subject', 'focus')
+
+    def __init__(self, start, minutes, type, label, subject=-1, focus=-1):
+        self.start = start
+        self.minutes = minutes
+        self.type = type
+        self.label = label
+        self.subject = subject
+        self.focus = focus
+
+class PlanDay:
+    """One planned day before rendering."""
+    __slots__ = ('index', 'date', 'bs_date', 'is_today', 'is_exam_day', 'subject', 'tasks')
+
+    def __init__(self, index, date, bs_date, is_today, is_exam_day, subject, tasks):
+        self.index = index
+        self.date = date
+        self.bs_date = bs_date
+        self.is_today = is_today
+        self.is_exam_day = is_exam_day
+        self.subject = subject
+        self.tasks = tasks
+
+_HHMM = [f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)]
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+class PlanRenderer:
+    """Turns Task/PlanDay records into the JSON shape the frontend reads.
+
+    This is the only place task strings are formatted; activity labels are
+    cached per (label, subject, focus) since a day repeats the same few.
+    """
+    def __init__(self, strings: StringTable):
+        self.strings = strings.strings
+        self._labels = {}
+
+    def activity(self, task: Task) -> str:
+        key = (task.label, task.subject, task.focus)
+        text = self._labels.get(key)
+        if text is None:
+            s = self.strings
+            text = self._labels[key] = LABELS[task.label].format(
+                subject=s[task.subject] if task.subject >= 0 else "",
+                focus=s[task.focus] if task.focus >= 0 else "")
+        return text
+
+    def task(self, task: Task) -> Dict:
+        start = int(task.start)
+        out = {
+            "time": f"{_HHMM[start % 1440]} - {_HHMM[int(task.start + task.minutes) % 1440]}",
+            "activity": self.activity(task),
+            "type": TASK_TYPES[task.type],
+            "minutes": int(task.minutes),
+        }
+        if _WITH_SUBJECT[task.type]:
+            out["subject"] = self.strings[task.subject]
+        return out
+
+    def day(self, day: PlanDay) -> Dict:
+        return {
+            "id": f"day-{day.index}",
+            "bs_date": day.bs_date,
+            "ad_date": day.date.isoformat(),
+            "day_of_week": _WEEKDAYS[day.date.weekday()],
+            "is_exam_day": day.is_exam_day,
+            "status": "today" if day.is_today else "upcoming",
+            "subject": day.subject,
+            "tasks": [self.task(t) for t in day.tasks],
+        }
+
+# Fixed blocks of a study day. Users can override any key (see resolve_day_template).
+DEFAULT_DAY_TEMPLATE = {
+    "meals": [
+        {"start": "08:00", "minutes": 45, "activity": "Breakfast & Hydration"},
+        {"start": "13:00", "minutes": 60, "activity": "Lunch & Mindful Rest"},
+        {"start": "20:00", "minutes": 60, "activity": "Dinner & Family Time"},
+    ],
+    "exam_start": None, # "HH:MM"; by default the exam follows the Final Polish from the day start
+    "polish_minutes": 90,
+    "exam_minutes": 180,
+    "recovery_minutes": 120,
+    "reflection_minutes": 15,
+    "long_break_every": 3,
+    "long_break_minutes": 45,
+}
+
+def resolve_day_template(overrides: Optional[Dict] = None) -> Dict:
+    template = dict(DEFAULT_DAY_TEMPLATE)
+    if overrides:
+        template.update({k: v for k, v in overrides.items() if k in DEFAULT_DAY_TEMPLATE})
+    return template
+
+def _to_minute(hhmm: str) -> int:
+    h, m = str(hhmm).split(':')
+    return int(h) * 60 + int(m)
+
+def _is_hhmm(value) -> bool:
+    if not isinstance(value, str) or len(value) != 5 or value[2] != ':' or not (value[:2] + value[3:]).isdigit():
+        return False
+    return int(value[:2]) < 24 and int(value[3:]) < 60
+
+def _is_minutes(value, least=0) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and least <= value <= 24 * 60
+
+def validate_day_template(overrides: Dict) -> None:
+    """Raises ValueError unless ``overrides`` can be passed to resolve_day_template and planned with."""
+    if not isinstance(overrides, dict):
+        raise ValueError("day_template must be an object")
+    for key, value in overrides.items():
+        if key not in DEFAULT_DAY_TEMPLATE:
+            raise ValueError(f"unknown day_template key {key!r}")
+        if key == "meals":
+            if not isinstance(value, list):
+                raise ValueError("meals must be a list")
+            for meal in value:
+                if not isinstance(meal, dict) or not _is_hhmm(meal.get("start")) or not _is_minutes(meal.get("minutes"), 1) \
+                        or not isinstance(meal.get("activity"), str):
+                    raise ValueError("each meal needs a start (HH:MM), minutes and an activity")
+        elif key == "exam_start":
+            if value is not None and not _is_hhmm(value):
+                raise ValueError("exam_start must be HH:MM or null")
+        elif key == "long_break_every":
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError("long_break_every must be a positive whole number")
+        elif not _is_minutes(value):
+            raise ValueError(f"{key} must be a number of minutes")
+
+    # The blocks that are fixed in time must fit the day without overlapping each other
+    template = resolve_day_template(overrides)
+    meals = sorted((_to_minute(m["start"]), _to_minute(m["start"]) + m["minutes"]) for m in template["meals"])
+    for (_, end), (start, _) in zip(meals, meals[1:]):
+        if start < end:
+            raise ValueError("meals must not overlap")
+    if meals and meals[-1][1] > 24 * 60:
+        raise ValueError("meals must end by midnight")
+    if template["exam_start"]:
+        exam_start = _to_minute(template["exam_start"])
+        if exam_start < template["polish_minutes"] or exam_start + template["exam_minutes"] + template["recovery_minutes"] > 24 * 60:
+            raise ValueError("the exam, with its polish before and recovery after, must fit within the day")
+
+class DayTimeline:
+    """One day's fixed blocks as sorted minute intervals, filled front to back.
+
+    Meals, the exam window and post-exam recovery are laid out up front; study
+    and break chunks are then placed into the gaps between them by a single
+    cursor, emitting each fixed block as the cursor reaches it. The
+    end-of-day reflection closes the day at wherever the cursor stops.
+    """
+    def __init__(self, day, start_minute: float, template: Optional[Dict] = None, exam_subject: Optional[str] = None, strings: Optional[StringTable] = None):
+        self.day = day
+        self.template = template or DEFAULT_DAY_TEMPLATE
+        self.strings = strings if strings is not None else StringTable()
+        self.cursor = float(start_minute)
+        self.tasks = []
+        t = self.template
+
+        required = []
+        if exam_subject:
+            polish, exam, recovery = t["polish_minutes"], t["exam_minutes"], t["recovery_minutes"]
+            exam_start = _to_minute(t["exam_start"]) if t["exam_start"] else self.cursor + polish
+            exam_start = max(exam_start, self.cursor + polish)
+            subject = self.strings.id(exam_subject)
+            required = [
+                Task(exam_start - polish, polish, STUDY, POLISH, subject),
+                Task(exam_start, exam, EXAM, OFFICIAL_EXAM, subject),
+                Task(exam_start + exam, recovery, BREAK, RECOVERY),
+            ]
+        blocks = list(required)
+        for meal in sorted(t["meals"], key=lambda m: _to_minute(m["start"])):
+            start = _to_minute(meal["start"])
+            end = start + meal["minutes"]
+            if start < self.cursor or any(start < b.start + b.minutes and b.start < end for b in blocks):
+                continue # already past, or clashes with the exam window / an earlier meal
+            blocks.append(Task(start, meal["minutes"], MEAL, TEXT, focus=self.strings.id(meal["activity"])))
+        blocks.sort(key=lambda b: b.start)
+        self.blocks = blocks
+        self._next = 0
+        self._required_until = max((b.start + b.minutes for b in required), default=None)
+
+    def _flush(self):
+        """Emits the fixed blocks the cursor has reached."""
+        while self._next < len(self.blocks) and self.blocks[self._next].start <= self.cursor:
+            block = self.blocks[self._next]
+            self._next += 1
+            self.tasks.append(block)
+            self.cursor = block.start + block.minutes
+
+    def gap(self) -> float:
+        """Free minutes before the next fixed block."""
+        if self._next < len(self.blocks):
+            return self.blocks[self._next].start - self.cursor
+        return float('inf')
+
+    def fit(self, minutes: float, min_minutes: float = 15) -> float:
+        """Skips past fixed blocks until at least ``min_minutes`` are free; returns the usable length."""
+        need = min(minutes, min_minutes)
+        while True:
+            self._flush()
+            gap = self.gap()
+            if gap >= need:
+                return min(minutes, gap)
+            self.cursor = self.blocks[self._next].start
+
+    def add(self, minutes: float, type: int, label: int, subject: int = -1, focus: int = -1):
+        """Places a task of ``minutes`` at the cursor."""
+        self.tasks.append(Task(self.cursor, minutes, type, label, subject, focus))
+        self.cursor += minutes
+
+    def close(self, reflect: bool = True) -> List[Task]:
+        """Emits any exam blocks not yet reached and the end-of-day reflection."""
+        if self._required_until is not None:
+            while self._next < len(self.blocks) and self.blocks[self._next].start < self._required_until:
+                self.cursor = max(self.cursor, self.blocks[self._next].start)
+                self._flush()
+        if reflect:
+            mins = self.template["reflection_minutes"]
+            self.fit(mins, mins)
+            self.add(mins, BUFFER, REFLECTION)
+        return self.tasks
+
+    @property
+    def current_time(self) -> datetime:
+        return datetime.combine(self.day, datetime.min.time()) + timedelta(minutes=self.cursor)
+
+def _place_chunks(timeline: DayTimeline, subject_name: str, focus_area: str, allocated_mins: float, session_mins: float, break_mins: float, plan_type: str = "study"):
     remaining = float(allocated_mins)
-    
-    phases = []
-    if plan_type == "intensive":
-        phases = ["Rapid Concept Scan", "Past Paper Blitz", "Formula Drill", "High-Yield Review"]
-    elif plan_type == "study":
-        phases = ["Deep Work: Concepts", "Active Recall", "Past Paper Sprint", "Feynman Review"]
-    else:
-        phases = ["Spaced Revision", "Weak Point Polish", "Flashcard Drill"]
+    phases = PHASES.get(plan_type, PHASES["revision"])
+    task_type = REVISION if plan_type == "revision" else STUDY
+    subject = timeline.strings.id(subject_name)
+    focus = timeline.strings.id(focus_area)
         
     sessions_count = 0
+    long_every = timeline.template["long_break_every"]
+    long_mins = timeline.template["long_break_minutes"]
     
     while remaining > 0:
-        # Check for meals
-        current_hour = current_time.hour
-        if current_hour == 8 and not any('Breakfast' in p['activity'] for p in plan):
-            end_time = current_time + timedelta(minutes=45)
-            plan.append({"time": f"{current_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}", "activity": "Breakfast & Hydration", "type": "meal", "minutes": 45})
-            current_time = end_time
-            continue
-        elif current_hour == 13 and not any('Lunch' in p['activity'] for p in plan):
-            end_time = current_time + timedelta(minutes=60)
-            plan.append({"time": f"{current_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}", "activity": "Lunch & Mindful Rest", "type": "meal", "minutes": 60})
-            current_time = end_time
-            continue
-        elif current_hour == 20 and not any('Dinner' in p['activity'] for p in plan):
-            end_time = current_time + timedelta(minutes=60)
-            plan.append({"time": f"{current_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}", "activity": "Dinner & Family Time", "type": "meal", "minutes": 60})
-            current_time = end_time
-            continue
-            
         dur = min(session_mins, remaining)
         if dur < 15: # if less than 15 mins left, just append it to a break or skip
             break
+        # Meals and other fixed blocks are emitted as the cursor reaches them;
+        # a session that would run into one is shortened to the free gap.
+        dur = timeline.fit(dur)
             
-        end_time = current_time + timedelta(minutes=dur)
-        phase = phases[sessions_count % len(phases)]
-        plan.append({
-            "time": f"{current_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}",
-            "activity": f"{phase}: {focus_area} ({subject_name})",
-            "type": "study" if plan_type == "intensive" else plan_type,
-            "minutes": int(dur),
-            "subject": subject_name
-        })
-        current_time = end_time
+        timeline.add(dur, task_type, phases[sessions_count % len(phases)], subject, focus)
         remaining -= dur
         sessions_count += 1
         
         if remaining > 15:
-            # Add break
-            b_dur = break_mins if sessions_count % 3 != 0 else 45 # long break every 3 sessions
-            end_time = current_time + timedelta(minutes=b_dur)
-            plan.append({
-                "time": f"{current_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}",
-                "activity": "Deep Rest / Buffer" if b_dur == 45 else "Micro-Break (20-20-20)",
-                "type": "break",
-                "minutes": int(b_dur)
-            })
-            current_time = end_time
+            # Add break, unless a fixed block (meal, recovery) starts first and serves as one
+            b_dur = break_mins if sessions_count % long_every != 0 else long_mins # long break every few sessions
+            if timeline.gap() >= b_dur:
+                timeline.add(b_dur, BREAK, DEEP_REST if b_dur == long_mins else MICRO_BREAK)
 
-    return plan, current_time
+def get_micro_chunks(subject_name: str, focus_area: str, allocated_mins: float, session_mins: float, break_mins: float, plan_type: str = "study", current_time: datetime = None, timeline: Optional[DayTimeline] = None):
+    """Chunks ``allocated_mins`` of one subject into sessions and breaks.
 
-def generate_study_plan(exams_list: List[Dict], daily_study_hours: float = 8.0, session_mins: float = 30.0, break_mins: float = 5.0, start_time: str = "06:00", topic_mastery_map: Optional[Dict] = None):
+    Returns the rendered tasks and the time the last one ends.
+    """
+    if timeline is None:
+        timeline = DayTimeline(current_time.date(), current_time.hour * 60 + current_time.minute + current_time.second / 60.0)
+    first_task = len(timeline.tasks)
+    _place_chunks(timeline, subject_name, focus_area, allocated_mins, session_mins, break_mins, plan_type)
+    renderer = PlanRenderer(timeline.strings)
+    return [renderer.task(t) for t in timeline.tasks[first_task:]], timeline.current_time
+
+def _prepare_exams(exams_list: List[Dict]) -> List[Dict]:
     prepared_exams = []
-    topic_mastery_map = topic_mastery_map or {}
-    
     for ex in exams_list:
         try:
             date_str = str(ex['date']).replace('/', '-')
@@ -100,147 +345,409 @@ def generate_study_plan(exams_list: List[Dict], daily_study_hours: float = 8.0,
         except: continue
         
     prepared_exams.sort(key=lambda x: x['ad_date'])
-    laptop_now = datetime.now()
-    today_ad = laptop_now.date()
+    return prepared_exams
+
+def _mastery_averages(topic_mastery_map: Dict) -> Dict[str, float]:
+    averages = {}
+    for s_name, mastery_data in topic_mastery_map.items():
+        averages[s_name] = sum(float(v) for v in mastery_data.values()) / len(mastery_data) / 100.0 if mastery_data else 0.0
+    return averages
+
+def _effective_start_time(start_time: str, now: datetime) -> str:
+    start_dt = datetime.strptime(start_time, "%H:%M")
+    if now.time() > start_dt.time():
+        next_hour = now.hour + 1 if now.minute > 0 else now.hour
+        if next_hour >= 23: next_hour = 22
+        return f"{next_hour:02d}:00"
+    return start_time
+
+# Revision rungs as (type, days, anchor): ``days`` after the study day, or
+# ``days`` before the exam when the anchor is "exam".
+DEFAULT_REVISION_LADDER = (("rev-1", 1, "study"), ("rev-2", 3, "study"), ("rev-3", 1, "exam"))
+
+def sm2_ladder(repetitions: int = 4, ease: float = 2.5):
+    """SM-2 style rungs: intervals of 1, 6, then x``ease`` days, plus an exam-eve pass."""
+    rungs, interval, offset = [], 1, 0
+    for n in range(repetitions):
+        interval = 1 if n == 0 else (6 if n == 1 else round(interval * ease))
+        offset += interval
+        rungs.append((f"sm2-{n + 1}", offset, "study"))
+    rungs.append(("exam-eve", 1, "exam"))
+    return tuple(rungs)
+
+REVISION_LADDERS = {"default": DEFAULT_REVISION_LADDER, "sm2": sm2_ladder()}
+
+class RevisionScheduler:
+    """Spaced-repetition revisions keyed by date, then subject.
+
+    A day's bucket is popped when that day is planned, so lookups are a dict pop
+    and nothing accumulates behind the day loop.
+    """
+    def __init__(self, ladder=DEFAULT_REVISION_LADDER, due=None):
+        self.ladder = tuple(ladder)
+        self._due = due if due is not None else {} # date -> {subject: [rev types]}
+
+    def schedule(self, subject: str, studied_on, exam_date):
+        for rev_type, days, anchor in self.ladder:
+            due = exam_date - timedelta(days=days) if anchor == "exam" else studied_on + timedelta(days=days)
+            if due > studied_on: # the day loop has already moved past anything earlier
+                self._due.setdefault(due, {}).setdefault(subject, []).append(rev_type)
+
+    def take(self, date, subject: Optional[str]) -> List[str]:
+        """Revisions of ``subject`` due on ``date``; drops the rest of that day's bucket."""
+        bucket = self._due.pop(date, None)
+        if not bucket or not subject:
+            return []
+        return bucket.get(subject, [])
+
+    def copy(self):
+        return RevisionScheduler(self.ladder, {d: {s: list(t) for s, t in b.items()} for d, b in self._due.items()})
+
+    def __len__(self):
+        return sum(len(t) for b in self._due.values() for t in b.values())
+
+class PlanState:
+    """Day-loop state carried from one day to the next.
+
+    A copy is taken before every day so that a later replan can resume from any
+    day without re-running the days before it.
+    """
+    __slots__ = ('subject_progress', 'last_studied_date', 'revisions', 'last_subject')
+
+    def __init__(self, subject_progress, last_studied_date=None, revisions=None, last_subject=None):
+        self.subject_progress = subject_progress
+        self.last_studied_date = last_studied_date if last_studied_date is not None else {}
+        self.revisions = revisions if revisions is not None else RevisionScheduler()
+        self.last_subject = last_subject
+
+    def snapshot(self):
+        return PlanState(dict(self.subject_progress), dict(self.last_studied_date), self.revisions.copy(), self.last_subject)
+
+class PlanTrace:
+    """Checkpoints recorded by generate_study_plan for replan_study_plan.
+
+    Holds the inputs the plan was built from, the emitted days, and for every day
+    the PlanState it started from plus the subject selection it made. With
+    ``checkpoints=False`` the per-day snapshots are skipped (plain full runs).
+    """
+    def __init__(self, checkpoints: bool = True):
+        self.checkpoints = checkpoints
+        self.settings = None
+        self.exams = []
+        self.days = []
+        self.snapshots = []
+        self.selections = []
+        self.state = None
+        self.strings = StringTable()
+        self.days_replanned = 0
+
+class StageTimer:
+    """Wall time per planner stage, for profiling (pass as ``timer=``).
+
+    Stages: parse_exams (exam dates, BS input included), date_range (the day
+    list and its BS dates), scoring (subject selection), revisions, chunking,
+    day_assembly and render. Time the consumer of iter_study_plan spends
+    between days is not counted. ``clock`` can be replaced for tests.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.seconds = {}
+        self._last = None
+
+    def start(self):
+        self._last = self.clock()
+
+    def lap(self, stage):
+        """Charges the time since the previous lap (or start) to ``stage``."""
+        now = self.clock()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def report(self):
+        total = sum(self.seconds.values())
+        return {stage: {"ms": round(s * 1000, 3), "share": round(s / total, 3) if total else 0.0} for stage, s in self.seconds.items()}
+
+class _NoTimer:
+    def start(self): pass
+    def lap(self, stage): pass
+
+_NO_TIMER = _NoTimer()
+
+def _exam_key(ex):
+    return (ex['ad_date'], tuple(str(c) for c in ex['chapters']), ex['difficulty'])
+
+def _first_by_name(prepared_exams: List[Dict]) -> Dict[str, Dict]:
+    by_name = {}
+    for ex in prepared_exams:
+        by_name.setdefault(ex['name'], ex)
+    return by_name
+
+class ExamIndex:
+    """Date-sorted index over the prepared exams for the day loop.
+
+    Exams are looked up by date in a dict, and the pending (not yet sat) exams
+    are the tail of the sorted list past a cursor that only moves forward as
+    exams expire, so a day never rescans the whole exam list. Per-exam score
+    inputs that do not change from day to day are precomputed once.
+    """
+    def __init__(self, prepared_exams: List[Dict], mastery: Dict[str, float]):
+        self.exams = prepared_exams
+        self.ordinals = [ex['ad_date'].toordinal() for ex in prepared_exams]
+        self.by_date = {}
+        for ex in prepared_exams:
+            self.by_date.setdefault(ex['ad_date'], ex)
+        self.by_name = _first_by_name(prepared_exams)
+        # (name, exam ordinal, difficulty, chapter count, mastery factor)
+        self.rows = [
+            (ex['name'], o, float(ex['difficulty']), len(ex.get('chapters', [])), 1.2 - mastery.get(ex['name'], 0.0))
+            for ex, o in zip(prepared_exams, self.ordinals)
+        ]
+        self._cursor = 0
+
+    def pending(self, d_ord: int) -> int:
+        """Index of the first exam strictly after day ordinal ``d_ord``."""
+        lo = self._cursor
+        if lo and self.ordinals[lo - 1] > d_ord:
+            lo = bisect_right(self.ordinals, d_ord)
+        while lo < len(self.ordinals) and self.ordinals[lo] <= d_ord:
+            lo += 1
+        self._cursor = lo
+        return lo
+
+    def select(self, date, state: PlanState):
+        """Picks the subject for ``date``.
+
+        Returns (exam_today, selected_subject, is_intensive_mode). Only reads the
+        index and ``state``, so a replan can re-run it against old checkpoints.
+        """
+        exam_today = self.by_date.get(date)
+        if exam_today:
+            return exam_today, exam_today['name'], False
+
+        d_ord = date.toordinal()
+        lo = self.pending(d_ord)
+        if lo == len(self.rows):
+            return None, None, False
+
+        # 2a. Check for Lockdown Phase (Exam within 7 days): the nearest pending exam
+        nearest = self.rows[lo]
+        if nearest[1] - d_ord <= 7:
+            return None, nearest[0], True
+
+        # 2b. 'Wise' Selection (weighted by topics left, difficulty, and stale penalty)
+        rotate = len(self.rows) - lo > 1
+        progress = state.subject_progress
+        last_studied_date = state.last_studied_date
+        best_name, best_score = None, None
+        for s_name, e_ord, diff, n_chapters, mastery_factor in self.rows[lo:]:
+            days_left = max(1, e_ord - d_ord)
+            
+            # Remaining Topics
+            rem_topics = max(1, n_chapters - progress.get(s_name, 0))
+            
+            # Stale Penalty (encourage rotation)
+            # If this was studied yesterday AND we have other subjects, penalize it heavily to force rotation
+            rotation_penalty = 1.0
+            if rotate and s_name == state.last_subject:
+                rotation_penalty = 0.1 # Force a switch
+            
+            days_since_last = 7
+            if s_name in last_studied_date:
+                days_since_last = (date - last_studied_date[s_name]).days
+            stale_boost = min(3.0, 1.0 + (days_since_last * 0.4))
+            
+            # Perfected Score Formula with Rotation Penalty
+            score = (diff * rem_topics * mastery_factor * stale_boost * rotation_penalty) / days_left
+            if best_score is None or score > best_score:
+                best_name, best_score = s_name, score
+        return None, best_name, False
+
+def _first_affected_day(trace: PlanTrace, prepared_exams: List[Dict], mastery: Dict[str, float], today_ad) -> int:
+    """Index of the first checkpointed day whose output would change.
+
+    A day's tasks depend only on its checkpoint state, its subject selection and
+    the exam entry of the selected subject, so replaying the (cheap) selection
+    against each old checkpoint finds the divergence point exactly.
+    """
+    old_by_name = _first_by_name(trace.exams)
+    index = ExamIndex(prepared_exams, mastery)
+    new_by_name = index.by_name
+    for i, state in enumerate(trace.snapshots):
+        date = today_ad + timedelta(days=i)
+        exam_today, selected, intensive = index.select(date, state)
+        if (exam_today and exam_today['name'], selected, intensive) != trace.selections[i]:
+            return i
+        if selected and _exam_key(old_by_name[selected]) != _exam_key(new_by_name[selected]):
+            return i
+    return len(trace.snapshots)
+
+def generate_study_plan(exams_list: List[Dict], daily_study_hours: float = 8.0, session_mins: float = 30.0, break_mins: float = 5.0, start_time: str = "06:00", topic_mastery_map: Optional[Dict] = None, now: Optional[datetime] = None, trace: Optional[PlanTrace] = None, revision_ladder=None, day_template: Optional[Dict] = None, subject_mastery: Optional[Dict[str, float]] = None, timer: Optional[StageTimer] = None):
+    """Builds the day-by-day plan from today to the last exam.
+
+    Pass a PlanTrace to keep per-day checkpoints for replan_study_plan, and a
+    sequence of rungs (see REVISION_LADDERS) to change the revision intervals.
+    ``day_template`` overrides keys of DEFAULT_DAY_TEMPLATE (meals, exam window).
+    ``subject_mastery`` ({subject: average topic score, 0-100}) can be passed
+    instead of ``topic_mastery_map`` when the averages are already known.
+    A StageTimer passed as ``timer`` collects the time spent in each stage.
+    """
+    return _collect(iter_study_plan(exams_list, daily_study_hours, session_mins, break_mins, start_time, topic_mastery_map, now, trace, revision_ladder, day_template, subject_mastery=subject_mastery, timer=timer))
+
+def replan_study_plan(trace: PlanTrace, exams_list: List[Dict], daily_study_hours: float = 8.0, session_mins: float = 30.0, break_mins: float = 5.0, start_time: str = "06:00", topic_mastery_map: Optional[Dict] = None, now: Optional[datetime] = None, revision_ladder=None, day_template: Optional[Dict] = None, subject_mastery: Optional[Dict[str, float]] = None, timer: Optional[StageTimer] = None):
+    """Incremental counterpart of generate_study_plan.
+
+    Reuses the days of ``trace`` up to the first day whose inputs changed and
+    resumes the loop from that day's checkpoint. The result is identical to a
+    full generate_study_plan call with the same arguments.
+    """
+    return _collect(iter_study_plan(exams_list, daily_study_hours, session_mins, break_mins, start_time, topic_mastery_map, now, trace, revision_ladder, day_template, subject_mastery, replan=True, timer=timer))
+
+def _collect(stream) -> Dict:
+    plan = next(stream)
+    if plan["status"] != "success":
+        return plan
+    return {"status": plan["status"], "days": list(stream), "summary": plan["summary"]}
+
+def iter_study_plan(exams_list: List[Dict], daily_study_hours: float = 8.0, session_mins: float = 30.0, break_mins: float = 5.0, start_time: str = "06:00", topic_mastery_map: Optional[Dict] = None, now: Optional[datetime] = None, trace: Optional[PlanTrace] = None, revision_ladder=None, day_template: Optional[Dict] = None, subject_mastery: Optional[Dict[str, float]] = None, replan: bool = False, timer: Optional[StageTimer] = None):
+    """Generator form of generate_study_plan.
+
+    Yields the plan header (``status`` and ``summary``, or the error) first and
+    then each day as soon as it is planned. With ``replan=True`` the days of
+    ``trace`` before the first affected one are reused, as in replan_study_plan.
+    """
+    timer = timer or _NO_TIMER
+    timer.start()
+    now = now or datetime.now()
+    revision_ladder = tuple(tuple(rung) for rung in (revision_ladder or DEFAULT_REVISION_LADDER))
+    day_template = resolve_day_template(day_template)
+    settings = (daily_study_hours, session_mins, break_mins, start_time, now.date(), _effective_start_time(start_time, now), revision_ladder, day_template)
+    prepared_exams = _prepare_exams(exams_list)
+    timer.lap("parse_exams")
+    if subject_mastery is not None:
+        mastery = {subject: avg / 100.0 for subject, avg in subject_mastery.items()}
+    else:
+        mastery = _mastery_averages(topic_mastery_map or {})
+    timer.lap("scoring")
     
     if not prepared_exams:
-        return {"status": "error", "message": "No exams found"}
+        yield {"status": "error", "message": "No exams found"}
+        return
+    if trace is None:
+        trace = PlanTrace(checkpoints=False)
+
+    resume = 0
+    if replan and trace.settings == settings and trace.days and trace.checkpoints:
+        resume = _first_affected_day(trace, prepared_exams, mastery, now.date())
+        resume = min(resume, (prepared_exams[-1]['ad_date'] - now.date()).days + 1)
+    if resume > 0:
+        state = trace.snapshots[resume].snapshot() if resume < len(trace.snapshots) else trace.state.snapshot()
+        state.subject_progress = {ex['name']: state.subject_progress.get(ex['name'], 0) for ex in prepared_exams}
+        trace.exams = prepared_exams
+        del trace.days[resume:], trace.snapshots[resume:], trace.selections[resume:]
+    else:
+        state = PlanState({ex['name']: 0 for ex in prepared_exams}, revisions=RevisionScheduler(revision_ladder))
+        trace.settings, trace.exams = settings, prepared_exams
+        trace.days, trace.snapshots, trace.selections = [], [], []
+        trace.strings = StringTable()
+
+    yield {
+        "status": "success",
+        "summary": { "total_days": max(0, (prepared_exams[-1]['ad_date'] - now.date()).days + 1), "subjects_covered": list(set(ex['name'] for ex in exams_list)) }
+    }
+    render = PlanRenderer(trace.strings).day
+    finished = False
+    try:
+        timer.start()
+        for day in _plan_days(prepared_exams, mastery, daily_study_hours, session_mins, break_mins, start_time, day_template, now, state, trace, resume, timer):
+            rendered = render(day)
+            timer.lap("render")
+            yield rendered
+            timer.start()
+        finished = True
+    finally:
+        if not finished:
+            trace.settings = None # consumer stopped early; the trace is partial, so the next replan starts over
 
+def _plan_days(prepared_exams, mastery, daily_study_hours, session_mins, break_mins, start_time, day_template, now, state, trace, first_day, timer=_NO_TIMER):
+    today_ad = now.date()
     last_exam_ad = prepared_exams[-1]['ad_date']
     all_dates = []
     temp_date = today_ad
     while temp_date <= last_exam_ad:
         all_dates.append(temp_date)
         temp_date += timedelta(days=1)
+    bs_dates = bs_calendar.ad_range_to_bs(today_ad, last_exam_ad)
+    timer.lap("date_range")
+    index = ExamIndex(prepared_exams, mastery)
+    by_name = index.by_name
+    timer.lap("scoring")
         
-    final_days = []
+    final_days = trace.days # PlanDay records, rendered as they are yielded
+    strings = trace.strings
+    yield from final_days[:first_day]
     
     # Last studied tracker for revision
-    last_studied_date = {} # subject_name -> date
-    revision_queue = [] # list of {subject, date_to_revise, type}
+    last_studied_date = state.last_studied_date # subject_name -> date
+    revisions = state.revisions # date -> subject -> due revision types
     
     # Chapter progress tracker
-    subject_progress = {ex['name']: 0 for ex in prepared_exams}
+    subject_progress = state.subject_progress
     
-    for i, date in enumerate(all_dates):
-        d_status = "today" if date == today_ad else "upcoming"
+    for i in range(first_day, len(all_dates)):
+        date = all_dates[i]
+        if trace.checkpoints:
+            trace.snapshots.append(state.snapshot())
+        is_today = date == today_ad
         effective_start_time = start_time
-        if d_status == "today":
-            now_time = datetime.now()
-            start_dt = datetime.strptime(start_time, "%H:%M")
-            if now_time.time() > start_dt.time():
-                next_hour = now_time.hour + 1 if now_time.minute > 0 else now_time.hour
-                if next_hour >= 23: next_hour = 22
-                effective_start_time = f"{next_hour:02d}:00"
+        if is_today:
+            effective_start_time = _effective_start_time(start_time, now)
                 
         daily_mins_avail = daily_study_hours * 60.0
-        if d_status == "today" and effective_start_time != start_time:
+        if is_today and effective_start_time != start_time:
             start_h = int(effective_start_time.split(':')[0])
             daily_mins_avail = max(120.0, min(daily_mins_avail, float(24 - start_h) * 60.0))
             
-        current_dt = datetime.combine(date, datetime.strptime(effective_start_time, "%H:%M").time())
-        day_tasks = []
         
-        # 1. Check if it's an exam day
-        exam_today = next((ex for ex in prepared_exams if ex['ad_date'] == date), None)
+        timer.lap("day_assembly")
+        # 1. Select Top Subject for the Day (the exam itself on exam days)
+        exam_today, selected_subject, is_intensive_mode = index.select(date, state)
+        trace.selections.append((exam_today and exam_today['name'], selected_subject, is_intensive_mode))
+        timer.lap("scoring")
+        revisions_today = revisions.take(date, selected_subject)
+        timer.lap("revisions")
+        timeline = DayTimeline(date, _to_minute(effective_start_time), day_template, exam_today['name'] if exam_today else None, strings)
         if exam_today:
-            end_c = current_dt + timedelta(minutes=90)
-            day_tasks.append({"time": f"{current_dt.strftime('%H:%M')} - {end_c.strftime('%H:%M')}", "activity": f"Final Polish: {exam_today['name']}", "type": "study", "minutes": 90, "subject": exam_today['name']})
-            current_dt = end_c
-            end_c = current_dt + timedelta(minutes=180)
-            day_tasks.append({"time": f"{current_dt.strftime('%H:%M')} - {end_c.strftime('%H:%M')}", "activity": "OFFICIAL EXAM", "type": "exam", "minutes": 180, "subject": exam_today['name']})
-            current_dt = end_c
-            
-            # Post-exam recovery
-            end_c = current_dt + timedelta(minutes=120)
-            day_tasks.append({"time": f"{current_dt.strftime('%H:%M')} - {end_c.strftime('%H:%M')}", "activity": "Post-Exam Recovery", "type": "break", "minutes": 120})
-            current_dt = end_c
-            daily_mins_avail -= 390
+            daily_mins_avail -= day_template["polish_minutes"] + day_template["exam_minutes"] + day_template["recovery_minutes"]
             
         if daily_mins_avail <= 0:
-            final_days.append({
-                "id": f"day-{i}", "bs_date": ad_to_bs(date), "ad_date": str(date), "day_of_week": date.strftime("%A"),
-                "is_exam_day": bool(exam_today), "status": d_status, "subject": exam_today['name'] if exam_today else "None",
-                "tasks": day_tasks
-            })
+            state.last_subject = exam_today['name'] if exam_today else "None"
+            final_days.append(PlanDay(i, date, bs_dates[i], is_today, bool(exam_today), state.last_subject, timeline.close(reflect=False)))
+            timer.lap("day_assembly")
+            yield final_days[-1]
             continue
 
-        # 2. Select Top Subject for the Day
-        next_exams = [e for e in prepared_exams if e['ad_date'] > date]
-        if not next_exams and not exam_today:
-            final_days.append({
-                "id": f"day-{i}", "bs_date": ad_to_bs(date), "ad_date": str(date), "day_of_week": date.strftime("%A"),
-                "is_exam_day": bool(exam_today), "status": d_status, "subject": "None", "tasks": day_tasks
-            })
+        # 2. Nothing left to prepare for
+        if not selected_subject:
+            state.last_subject = "None"
+            final_days.append(PlanDay(i, date, bs_dates[i], is_today, bool(exam_today), "None", timeline.close(reflect=False)))
+            timer.lap("day_assembly")
+            yield final_days[-1]
             continue
 
-        selected_subject = None
-        is_intensive_mode = False
-        
-        if exam_today:
-            selected_subject = exam_today['name']
-        else:
-            # 2a. Check for Lockdown Phase (Exam within 7 days)
-            lockdown_subject = None
-            min_days = 99
-            for ex in next_exams:
-                d_left = (ex['ad_date'] - date).days
-                if d_left <= 7 and d_left < min_days:
-                    min_days = d_left
-                    lockdown_subject = ex['name']
-            
-            if lockdown_subject:
-                selected_subject = lockdown_subject
-                is_intensive_mode = True
-            else:
-                # 2b. 'Wise' Selection (weighted by topics left, difficulty, and stale penalty)
-                subject_scores = []
-                
-                for ex in next_exams:
-                    s_name = ex['name']
-                    days_left = max(1, (ex['ad_date'] - date).days)
-                    diff = float(ex['difficulty'])
-                    
-                    # Remaining Topics
-                    rem_topics = max(1, len(ex.get('chapters', [])) - subject_progress.get(s_name, 0))
-                    
-                    # Stale Penalty (encourage rotation)
-                    # If this was studied yesterday AND we have other subjects, penalize it heavily to force rotation
-                    last_subject = final_days[-1]['subject'] if final_days else None
-                    rotation_penalty = 1.0
-                    if s_name == last_subject and len(next_exams) > 1:
-                        rotation_penalty = 0.1 # Force a switch
-                    
-                    days_since_last = 7
-                    if s_name in last_studied_date:
-                        days_since_last = (date - last_studied_date[s_name]).days
-                    stale_boost = min(3.0, 1.0 + (days_since_last * 0.4))
-                    
-                    mastery_data = topic_mastery_map.get(s_name, {})
-                    avg_m = sum(float(v) for v in mastery_data.values()) / len(mastery_data) / 100.0 if mastery_data else 0.0
-                    
-                    # Perfected Score Formula with Rotation Penalty
-                    score = (diff * rem_topics * (1.2 - avg_m) * stale_boost * rotation_penalty) / days_left
-                    subject_scores.append({"ex": ex, "score": score})
-                
-                if subject_scores:
-                    best_item = max(subject_scores, key=lambda x: x['score'])
-                    selected_subject = best_item['ex']['name']
-
+        timer.lap("day_assembly")
         # 3. Process Revisions (ONLY for the selected subject)
         if selected_subject:
-            revisions_today = [r for r in revision_queue if r['date'] == date and r['subject'] == selected_subject]
             for rev in revisions_today:
                 if daily_mins_avail < 30: break
                 rev_mins = min(90, daily_mins_avail * 0.3) # Dedicate up to 30% for revision if needed
-                chunks, current_dt = get_micro_chunks(rev['subject'], "Spaced Revision", rev_mins, session_mins, break_mins, "revision", current_dt)
-                day_tasks.extend(chunks)
+                _place_chunks(timeline, selected_subject, "Spaced Revision", rev_mins, session_mins, break_mins, "revision")
                 daily_mins_avail -= rev_mins
+        timer.lap("chunking")
             
         # 4. Allocate remaining time to the ONE Selected Subject
         if selected_subject and daily_mins_avail >= 30:
             # Find the full exam object for the selected subject
-            target_ex = next((e for e in prepared_exams if e['name'] == selected_subject), None)
+            target_ex = by_name.get(selected_subject)
             if target_ex:
                 chaps = target_ex['chapters']
                 idx = subject_progress[selected_subject]
@@ -251,34 +758,24 @@ def generate_study_plan(exams_list: List[Dict], daily_study_hours: float = 8.0,
                 
                 # No 4-hour cap; use all available time
                 p_type = "intensive" if is_intensive_mode else "study"
-                chunks, current_dt = get_micro_chunks(selected_subject, focus, daily_mins_avail, session_mins, break_mins, p_type, current_dt)
-                day_tasks.extend(chunks)
+                _place_chunks(timeline, selected_subject, focus, daily_mins_avail, session_mins, break_mins, p_type)
+                timer.lap("chunking")
                 
                 # Schedule future revisions
                 if selected_subject not in last_studied_date or last_studied_date[selected_subject] != date:
-                    revision_queue.append({"subject": selected_subject, "date": date + timedelta(days=1), "type": "rev-1"})
-                    revision_queue.append({"subject": selected_subject, "date": date + timedelta(days=3), "type": "rev-2"})
-                    revision_queue.append({"subject": selected_subject, "date": target_ex['ad_date'] - timedelta(days=1), "type": "rev-3"})
+                    revisions.schedule(selected_subject, date, target_ex['ad_date'])
                 
                 last_studied_date[selected_subject] = date
+                timer.lap("revisions")
                 
         # Buffer at end of day
-        end_c = current_dt + timedelta(minutes=15)
-        day_tasks.append({"time": f"{current_dt.strftime('%H:%M')} - {end_c.strftime('%H:%M')}", "activity": "Reflection & Next Day Prep", "type": "buffer", "minutes": 15})
+        day_tasks = timeline.close()
         
-        final_days.append({
-            "id": f"day-{i}",
-            "bs_date": ad_to_bs(date),
-            "ad_date": str(date),
-            "day_of_week": date.strftime("%A"),
-            "is_exam_day": bool(exam_today),
-            "status": d_status,
-            "subject": selected_subject if selected_subject else "Break/Buffer",
-            "tasks": day_tasks
-        })
-
-    return {
-        "status": "success",
-        "days": final_days,
-        "summary": { "total_days": len(all_dates), "subjects_covered": list(set(ex['name'] for ex in exams_list)) }
-    }
+        state.last_subject = selected_subject if selected_subject else "Break/Buffer"
+        final_days.append(PlanDay(i, date, bs_dates[i], is_today, bool(exam_today), state.last_subject, day_tasks))
+        timer.lap("day_assembly")
+        yield final_days[-1]
+
+    del final_days[len(all_dates):], trace.snapshots[len(all_dates):], trace.selections[len(all_dates):]
+    trace.state = state
+    trace.days_replanned = max(0, len(all_dates) - first_day)
@@ -1,5 +1,6 @@
 // STATE
 let db = {};
+let todayBS = null; // from /api/today, kept out of the cacheable metadata
 let selectedSubjects = [];
 let timerInterval = null;
 let secondsRemaining = 5400; // Default 90m
@@ -16,6 +17,8 @@ let currentUsername = "";
 
 // Per-user storage key — prevents plans from bleeding across accounts
 function plansKey() { return `padsala_plans_${currentUsername || 'guest'}`; }
+// Whose write this is, should the service worker queue it offline (see OWNER_HEADER in sw.js)
+function outboxOwner() { return encodeURIComponent(currentUsername); }
 
 const RANKS = [
     { min: 0, title: "Beginner" },
@@ -139,9 +142,10 @@ async function initWizard() {
             await syncSchedules(); // Pull from server
         }
 
-        const res = await fetch('/api/metadata');
+        const [res, todayRes] = await Promise.all([fetch('/api/metadata'), fetch('/api/today')]);
         if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
         db = await res.json();
+        todayBS = (await todayRes.json()).today_bs;
 
         // Always ensure dropdowns are ready for a new plan
         populateDropdown('select-university', Object.keys(db));
@@ -332,7 +336,7 @@ function prepareDateInputs() {
     const container = document.getElementById('exam-date-inputs');
     
     // Default to today or the BS date from DB
-    const defaultBS = db.today_bs || "2081-12-30"; 
+    const defaultBS = todayBS || "2081-12-30"; 
     
     container.innerHTML = selectedSubjects.map(s => `
         <div class="glass-card" style="padding: 1.5rem; display: flex; align-items: center; justify-content: space-between; border: 1px solid #e2e8f0; background: white; border-radius: 16px;">
@@ -385,12 +389,24 @@ async function generateSchedule() {
             exams: exams
         };
 
+        // Data-saver clients take the compact format in one response instead of the NDJSON stream
+        const saveData = navigator.connection && navigator.connection.saveData;
         const res = await fetch('/api/generate-schedule', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'Accept': saveData ? `${COMPACT_TYPE}, application/json` : 'application/x-ndjson, application/json' },
             body: JSON.stringify(inputs)
         });
-        const data = await res.json();
+
+        // Show the dashboard as soon as the first week has arrived
+        let shown = false;
+        const data = await readScheduleStream(res, (partial) => {
+            if (shown || partial.days.length < 7) return;
+            shown = true;
+            currentSchedule = partial;
+            wizardInputs = inputs;
+            renderBlueprint(partial);
+            switchView('dashboard');
+        });
 
         // PERSIST MULTIPLE
         const name = document.getElementById('schedule-name').value || `Timeline ${savedSchedules.length + 1}`;
@@ -408,6 +424,82 @@ async function generateSchedule() {
     } catch (e) { alert("Compute Error"); }
 }
 
+// Reads a schedule sent as NDJSON (a header line, then one line per day),
+// calling onDays with the growing schedule. Falls back to plain or compact JSON.
+async function readScheduleStream(res, onDays) {
+    const contentType = res.headers.get('Content-Type') || '';
+    if (!res.body || !contentType.includes('application/x-ndjson')) return decodeCompactPlan(await res.json());
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let data = null;
+    let buffer = '';
+    const handleLine = (line) => {
+        if (!line.trim()) return;
+        const item = JSON.parse(line);
+        if (item.error) throw new Error(item.error);
+        if (!data) {
+            data = item.status === 'success' ? { status: item.status, days: [], summary: item.summary } : item;
+        } else {
+            data.days.push(item);
+        }
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+        if (data && data.status === 'success') onDays(data);
+    }
+    handleLine(buffer + decoder.decode());
+    return data;
+}
+
+// COMPACT WIRE FORMAT: the inverse of study_planner/wire.py's encode, whose docstring describes the layout
+const COMPACT_TYPE = 'application/vnd.padsala.compact+json';
+const WEEKDAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
+const pad2 = (n) => String(n).padStart(2, '0');
+const hhmm = (m) => `${pad2(Math.floor(m / 60))}:${pad2(m % 60)}`;
+
+function decodeCompactPlan(doc) {
+    if (!doc || doc.compact === undefined) return doc; // plain JSON
+    if (doc.compact !== 1) throw new Error(`Unsupported plan format ${doc.compact}`);
+    const { strings, days: d, tasks: t } = doc;
+    const date = new Date(`${doc.start}T00:00:00Z`);
+    const days = [];
+    const ends = new Map(t.ends);
+    let index = 0, bs = null, k = 0;
+    for (let i = 0; i < d.index.length; i++) {
+        index += d.index[i];
+        date.setUTCDate(date.getUTCDate() + d.date[i]);
+        bs = typeof d.bs[i] === 'string' ? d.bs[i] : bs.slice(0, 8) + pad2(Number(bs.slice(8)) + d.bs[i]);
+        const tasks = [];
+        let end = null;
+        for (let n = 0; n < d.tasks[i]; n++, k++) {
+            const start = end === null ? t.gap[k] : (end + t.gap[k]) % 1440;
+            const minutes = t.minutes[k];
+            const task = { time: `${hhmm(start)} - ${hhmm(ends.has(k) ? ends.get(k) : (start + minutes) % 1440)}`, activity: strings[t.label[k]], type: strings[t.type[k]], minutes };
+            if (t.subject[k] >= 0) task.subject = strings[t.subject[k]];
+            tasks.push(task);
+            end = start + minutes;
+        }
+        days.push({
+            id: `day-${index}`,
+            bs_date: bs,
+            ad_date: date.toISOString().slice(0, 10),
+            day_of_week: WEEKDAY_NAMES[date.getUTCDay()],
+            is_exam_day: d.exam[i] === 1,
+            status: strings[d.status[i]],
+            subject: strings[d.subject[i]],
+            tasks
+        });
+    }
+    return { ...doc.plan, days };
+}
+
 function renderGallery() {
     const gallery = document.getElementById('timeline-gallery');
     if (!gallery) return;
@@ -772,7 +864,15 @@ document.getElementById('btn-save-adjust').onclick = async () => {
         day.tasks = result.tasks;
         // Sync the correct schedule in the list
         const schedEntry = savedSchedules.find(s => s.data === currentSchedule);
-        if (schedEntry) localStorage.setItem('padsala_saved_schedules', JSON.stringify(savedSchedules));
+        if (schedEntry) {
+            if (schedEntry.revision !== undefined) {
+                schedEntry.dirty = [...new Set([...(schedEntry.dirty || []), day.id])];
+                await pushDayEdits(schedEntry); // only this day goes up; a conflict takes the server's day
+            } else {
+                delete schedEntry.hash; // edited locally: the next sync takes the server's copy again
+            }
+            localStorage.setItem('padsala_saved_schedules', JSON.stringify(savedSchedules));
+        }
 
         renderBlueprint(currentSchedule);
         closeAdjustModal();
@@ -969,7 +1069,7 @@ async function submitNeural() {
         try {
             await fetch('/api/v17/log-session', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'X-Padsala-User': outboxOwner() },
                 body: JSON.stringify({
                     subject: sub,
                     topic: task,
@@ -1023,7 +1123,8 @@ async function syncXP() {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json',
-                'X-CSRFToken': window.CSRF_TOKEN
+                'X-CSRFToken': window.CSRF_TOKEN,
+                'X-Padsala-User': outboxOwner()
             },
             body: JSON.stringify({ xp: focusXP, streak: concentrationStreak })
         });
@@ -1186,22 +1287,119 @@ function updateAuthUI() {
     }
 }
 
+function applyScheduleChanges(entry, changes) {
+    // As schedule_sync._merge_days: a day replaces the one with its id, null deletes it, new days go in date order
+    const data = entry.data;
+    for (const [key, value] of Object.entries(changes)) {
+        if (key === '@inputs') entry.inputs = value;
+        else if (key === '@plan') {
+            Object.keys(data).filter(k => k !== 'days').forEach(k => delete data[k]);
+            Object.assign(data, value);
+        } else {
+            const i = data.days.findIndex(d => d.id === key);
+            if (value === null) { if (i >= 0) data.days.splice(i, 1); }
+            else if (i >= 0) data.days[i] = value;
+            else {
+                const at = value.ad_date ? data.days.findIndex(d => (d.ad_date || '') > value.ad_date) : -1;
+                data.days.splice(at < 0 ? data.days.length : at, 0, value);
+            }
+        }
+    }
+}
+
+function canonicalJSON(value) {
+    // As study_planner.schedules.content_hash serializes: sorted keys, no spaces, non-ASCII escaped
+    if (Array.isArray(value)) return `[${value.map(v => canonicalJSON(v === undefined ? null : v)).join(',')}]`;
+    if (value && typeof value === 'object') {
+        const keys = Object.keys(value).filter(k => value[k] !== undefined).sort();
+        return `{${keys.map(k => `${canonicalJSON(k)}:${canonicalJSON(value[k])}`).join(',')}}`;
+    }
+    return JSON.stringify(value === undefined ? null : value)
+        .replace(/[\u0080-\uffff]/g, c => `\\u${c.charCodeAt(0).toString(16).padStart(4, '0')}`);
+}
+
+async function contentHash(data, inputs) {
+    // The server's content hash of a plan, or null where WebCrypto is unavailable (insecure origins)
+    if (!(window.crypto && crypto.subtle)) return null;
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(canonicalJSON([data, inputs])));
+    return [...new Uint8Array(digest)].map(b => b.toString(16).padStart(2, '0')).join('').slice(0, 32);
+}
+
+async function pushDayEdits(entry) {
+    // Sends the days in entry.dirty on top of entry.revision and takes back what other devices changed meanwhile
+    if (!isLoggedIn || !entry.dirty || !entry.dirty.length) return;
+    const days = Object.fromEntries(entry.dirty.map(id => [id, entry.data.days.find(d => d.id === id) || null]));
+    try {
+        const res = await fetch('/api/sync/patch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': window.CSRF_TOKEN },
+            body: JSON.stringify({ name: entry.name, base: entry.revision, days })
+        });
+        // Deleted elsewhere (404), or refused (400, e.g. a base from before it was deleted and saved again):
+        // the next sync takes the server's copy whole
+        if (res.status === 404 || res.status === 400) { delete entry.revision; delete entry.hash; delete entry.dirty; return; }
+        if (!res.ok) return; // offline or failing: the ids stay dirty for the next sync
+        const result = await res.json();
+        applyScheduleChanges(entry, { ...result.changes, ...result.conflicts });
+        delete entry.dirty;
+        if (await contentHash(entry.data, entry.inputs ?? null) === result.hash) {
+            entry.revision = result.revision;
+            entry.hash = result.hash;
+        } else { // the merge did not reproduce the server's plan: take it whole next sync
+            delete entry.revision;
+            delete entry.hash;
+        }
+        localStorage.setItem(plansKey(), JSON.stringify(savedSchedules));
+        if (Object.keys(result.conflicts).length || Object.keys(result.changes).length) {
+            if (entry.data === currentSchedule) renderBlueprint(currentSchedule);
+        }
+    } catch (e) { console.error("Cloud patch failed", e); }
+}
+
 async function syncSchedules() {
+    // The listing carries each plan's content hash and revision: unchanged plans are kept, plans this
+    // device already has are brought up to date with the days changed since, and only new ones are downloaded
     try {
+        const stored = JSON.parse(localStorage.getItem(plansKey()) || '[]');
+        const local = new Map([...stored, ...savedSchedules].filter(s => s.hash).map(s => [s.name, s]));
+        for (const mine of local.values()) await pushDayEdits(mine); // edits made offline go up first
         const res = await fetch('/api/sync/schedules');
-        if (res.ok) {
-            const data = await res.json();
-            // Always replace local plans with server-side plans for THIS user
-            savedSchedules = Array.isArray(data) ? data : [];
-            localStorage.setItem(plansKey(), JSON.stringify(savedSchedules));
-        }
+        if (!res.ok) return;
+        const listing = await res.json();
+        if (!Array.isArray(listing)) return;
+        const plans = await Promise.all(listing.map(async (item) => {
+            const mine = local.get(item.name);
+            if (mine && mine.hash === item.hash) return Object.assign(mine, { revision: item.revision });
+            const path = `/api/sync/schedules/${encodeURIComponent(item.name)}`;
+            if (mine && mine.revision !== undefined && !mine.dirty && mine.revision < item.revision) {
+                const r = await fetch(`${path}?since=${mine.revision}`);
+                if (!r.ok) return null;
+                const s = await r.json();
+                if (!s.changes) return { name: s.name, data: s.data, inputs: s.inputs, hash: s.hash, revision: s.revision };
+                const merged = { ...mine, data: structuredClone(mine.data) };
+                applyScheduleChanges(merged, s.changes);
+                // A delta is only trusted if it reproduces the server's plan; otherwise download it whole
+                if (await contentHash(merged.data, merged.inputs ?? null) === s.hash) {
+                    applyScheduleChanges(mine, s.changes); // in place: mine.data may be the plan on screen
+                    return Object.assign(mine, { hash: s.hash, revision: s.revision });
+                }
+            }
+            const r = await fetch(`${path}?format=compact`);
+            if (!r.ok) return null;
+            const s = await r.json();
+            return { name: s.name, data: s.compact ? decodeCompactPlan(s.compact) : s.data, inputs: s.inputs, hash: s.hash, revision: s.revision };
+        }));
+        // Always replace local plans with server-side plans for THIS user
+        savedSchedules = plans.filter(Boolean);
+        localStorage.setItem(plansKey(), JSON.stringify(savedSchedules));
     } catch (e) { console.error("Sync error", e); }
 }
 
 async function saveToServer(name, data, inputs) {
+    // Resolves to the saved plan's content hash and revision, so the next sync need not download it again
     if (!isLoggedIn) return;
     try {
-        await fetch('/api/sync/save', {
+        const res = await fetch('/api/sync/save', {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json',
@@ -1209,6 +1407,7 @@ async function saveToServer(name, data, inputs) {
             },
             body: JSON.stringify({ name, data, inputs })
         });
+        if (res.ok) return await res.json();
     } catch (e) { console.error("Cloud save failed", e); }
 }
 
@@ -1229,7 +1428,9 @@ generateSchedule = async function () {
     await originalGenerateSchedule();
     if (isLoggedIn && savedSchedules.length > 0) {
         const latest = savedSchedules[savedSchedules.length - 1];
-        await saveToServer(latest.name, latest.data, latest.inputs);
+        const saved = await saveToServer(latest.name, latest.data, latest.inputs);
+        if (saved) Object.assign(latest, { hash: saved.hash, revision: saved.revision });
+        localStorage.setItem(plansKey(), JSON.stringify(savedSchedules));
     }
 };
 
@@ -1243,9 +1444,26 @@ resetPlan = async function () {
     }
 };
 
-// PWA Registration
+// PWA Registration: served from the root so it can cache the API and queue offline writes
 if ('serviceWorker' in navigator) {
-    navigator.serviceWorker.register('/static/sw.js');
+    navigator.serviceWorker.getRegistrations().then(regs => regs
+        .filter(r => new URL(r.scope).pathname === '/static/') // the old pass-through worker
+        .forEach(r => r.unregister()));
+    navigator.serviceWorker.register('/sw.js');
+
+    // Replay queued session logs and XP syncs (where Background Sync is unavailable)
+    const replayOutbox = () => navigator.serviceWorker.ready.then(reg => reg.active && reg.active.postMessage({ type: 'replay-outbox' }));
+    window.addEventListener('online', replayOutbox);
+    replayOutbox();
+
+    // Stale-while-revalidate served an old copy of the saved schedules: pull the fresh one
+    navigator.serviceWorker.addEventListener('message', async (e) => {
+        if (e.data && e.data.type === 'revalidated' && e.data.path === '/api/sync/schedules' && isLoggedIn) {
+            await syncSchedules();
+            updateAuthUI();
+            if (savedSchedules.length > 0) renderGallery();
+        }
+    });
 }
 
 // ATMOSPHERIC SNOW SYSTEM
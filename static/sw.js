@@ -1,8 +1,225 @@
+// Padsala service worker. Served from /sw.js (see views.service_worker), which
+// prepends CACHE_VERSION and PRECACHE_URLS and gives it the whole site as scope.
+//
+// - Versioned static assets are precached on install and served cache-first.
+// - /api/metadata and /api/sync/schedules are stale-while-revalidate: the cached
+//   copy answers at once and the network refreshes it for next time.
+// - Session logs and XP syncs that fail for lack of network go to an IndexedDB
+//   outbox and are replayed on background sync, on 'online', or at next start.
+//   Each entry records whose it is (OWNER_HEADER) and is only replayed while
+//   that account is logged in; other accounts' entries wait for theirs.
+
+const PRECACHE = `padsala-static-${CACHE_VERSION}`;
+const API_CACHE = 'padsala-api'; // per-user data: cleared on login and logout
+const SWR_PATHS = ['/api/metadata', '/api/sync/schedules'];
+const OUTBOX_PATHS = ['/api/v17/log-session', '/api/v17/sync-xp'];
+const OWNER_HEADER = 'X-Padsala-User'; // URI-encoded username, set by main.js on outbox requests
+const INVALIDATES = { '/api/sync/save': '/api/sync/schedules', '/api/sync/patch': '/api/sync/schedules', '/api/sync/delete': '/api/sync/schedules' };
+
 self.addEventListener('install', (e) => {
-    console.log('[Service Worker] Install');
+    e.waitUntil(caches.open(PRECACHE).then(cache => cache.addAll(PRECACHE_URLS)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (e) => {
+    e.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names.filter(n => n.startsWith('padsala-static-') && n !== PRECACHE).map(n => caches.delete(n)));
+        await self.clients.claim();
+        await replayOutbox().catch(() => { });
+    })());
 });
 
 self.addEventListener('fetch', (e) => {
-    // Basic fetch pass-through to ensure it works offline-capable in future
-    e.respondWith(fetch(e.request));
+    const url = new URL(e.request.url);
+    if (url.origin !== location.origin) return; // fonts and CDN scripts: browser default
+
+    if (e.request.method === 'POST') {
+        if (OUTBOX_PATHS.includes(url.pathname)) e.respondWith(sendOrQueue(e.request, url.pathname));
+        else if (url.pathname in INVALIDATES || url.pathname === '/api/auth/login') e.respondWith(postAndInvalidate(e.request, url.pathname));
+        return;
+    }
+    if (e.request.method !== 'GET') return;
+
+    if (e.request.mode === 'navigate') {
+        if (url.pathname.startsWith('/accounts/logout')) e.waitUntil(caches.delete(API_CACHE));
+        if (url.pathname === '/') e.respondWith(networkFirst(e.request));
+        return;
+    }
+    if (PRECACHE_URLS.includes(url.pathname + url.search)) {
+        e.respondWith(caches.match(e.request).then(hit => hit || fetch(e.request)));
+    } else if (SWR_PATHS.includes(url.pathname)) {
+        e.respondWith(staleWhileRevalidate(e));
+    }
+});
+
+async function networkFirst(request) {
+    // The page embeds a CSRF token, so it is only served from cache when offline
+    const cache = await caches.open(PRECACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) cache.put('/', response.clone());
+        return response;
+    } catch (err) {
+        return (await cache.match('/')) || Response.error();
+    }
+}
+
+async function staleWhileRevalidate(e) {
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(e.request);
+    const refresh = fetch(e.request).then(async response => {
+        if (!response.ok) {
+            await cache.delete(e.request); // e.g. 401 after the session expired
+            return response;
+        }
+        const fresh = await response.clone().text();
+        const stale = cached ? await cached.clone().text() : null;
+        await cache.put(e.request, response.clone());
+        if (cached && fresh !== stale) notifyClients({ type: 'revalidated', path: new URL(e.request.url).pathname });
+        return response;
+    });
+    if (!cached) return refresh;
+    e.waitUntil(refresh.catch(() => { })); // offline: the cached copy stands
+    return cached;
+}
+
+async function postAndInvalidate(request, path) {
+    const response = await fetch(request);
+    if (response.ok) {
+        if (path === '/api/auth/login') await caches.delete(API_CACHE);
+        else await (await caches.open(API_CACHE)).delete(INVALIDATES[path]);
+    }
+    return response;
+}
+
+function notifyClients(message) {
+    self.clients.matchAll().then(clients => clients.forEach(c => c.postMessage(message)));
+}
+
+// OUTBOX
+
+function openOutbox() {
+    return new Promise((resolve, reject) => {
+        const req = indexedDB.open('padsala-outbox', 1);
+        req.onupgradeneeded = () => req.result.createObjectStore('requests', { keyPath: 'id', autoIncrement: true });
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+function outboxTx(mode, fn) {
+    return openOutbox().then(db => new Promise((resolve, reject) => {
+        const tx = db.transaction('requests', mode);
+        const request = fn(tx.objectStore('requests'));
+        tx.oncomplete = () => resolve(request ? request.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    }));
+}
+
+async function sendOrQueue(request, path) {
+    const body = await request.clone().text();
+    const owner = request.headers.get(OWNER_HEADER) || null;
+    try {
+        const response = await fetch(request);
+        if (response.ok && path === '/api/v17/sync-xp') await dropQueued(path, owner); // XP is absolute: queued values are now stale
+        if (response.status < 500) return response;
+    } catch (err) { } // offline
+    const item = JSON.parse(body || '{}');
+    if (path === '/api/v17/log-session') item.timestamp = item.timestamp || new Date().toISOString();
+    await outboxTx('readwrite', store => store.add({ path, item, owner }));
+    if (self.registration.sync) self.registration.sync.register('outbox').catch(() => { });
+    return new Response(JSON.stringify({ success: true, queued: true }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+}
+
+function dropQueued(path, owner) {
+    return outboxTx('readwrite', store => {
+        store.getAll().onsuccess = (ev) => ev.target.result.filter(e => e.path === path && e.owner === owner).forEach(e => store.delete(e.id));
+    });
+}
+
+let replaying = null;
+
+function replayOutbox() {
+    // One replay at a time, so a sync event and an 'online' message cannot send an entry twice
+    replaying = replaying || doReplay().finally(() => { replaying = null; });
+    return replaying;
+}
+
+async function currentOwner() {
+    // The logged-in account as OWNER_HEADER spells it, null when logged out, undefined when offline
+    try {
+        const response = await fetch('/api/auth/status', { cache: 'no-store' });
+        const status = await response.json();
+        return status.logged_in ? encodeURIComponent(status.username) : null;
+    } catch (err) {
+        return undefined;
+    }
+}
+
+async function doReplay() {
+    // Resolves to the number of the current account's entries still queued
+    const entries = await outboxTx('readonly', store => store.getAll());
+    if (!entries.length) return 0;
+    const owner = await currentOwner();
+    if (owner === undefined) return entries.length;
+    // Entries of another account wait until it logs in again. Ones without an owner were
+    // queued before owners were recorded and cannot be attributed, so they are dropped.
+    const sent = entries.filter(e => !e.owner);
+    const mine = owner ? entries.filter(e => e.owner === owner) : [];
+    const sessions = mine.filter(e => e.path === '/api/v17/log-session');
+    const xp = mine.filter(e => e.path === '/api/v17/sync-xp');
+    let delivered = 0;
+
+    // Sessions go in one batch (they carry their own timestamps); XP is absolute, so only the latest counts
+    for (let i = 0; i < sessions.length; i += 500) {
+        const chunk = sessions.slice(i, i + 500);
+        const status = await replay('/api/v17/log-sessions', { sessions: chunk.map(e => e.item) });
+        if (status === 400) {
+            // One invalid session fails the whole batch: send them one at a time and
+            // drop only those the server rejects on their own
+            for (const e of chunk) {
+                const one = await replay('/api/v17/log-session', e.item);
+                if (!settled(one)) break;
+                sent.push(e);
+                delivered++;
+            }
+            if (delivered < i + chunk.length) break;
+        } else if (settled(status)) {
+            sent.push(...chunk);
+            delivered += chunk.length;
+        } else {
+            break;
+        }
+    }
+    if (xp.length && settled(await replay('/api/v17/sync-xp', xp[xp.length - 1].item))) {
+        sent.push(...xp);
+        delivered += xp.length;
+    }
+
+    if (sent.length) await outboxTx('readwrite', store => { sent.forEach(e => store.delete(e.id)); });
+    return mine.length - delivered;
+}
+
+function settled(status) {
+    // Delivered, or rejected as invalid (400), which no retry can fix; anything else is retried later
+    return (status >= 200 && status < 300) || status === 400;
+}
+
+async function replay(path, payload) {
+    // The response status, or 0 for a network error
+    try {
+        const response = await fetch(path, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
+        return response.status;
+    } catch (err) {
+        return 0;
+    }
+}
+
+self.addEventListener('sync', (e) => {
+    // Rejecting makes the browser retry the sync later
+    if (e.tag === 'outbox') e.waitUntil(replayOutbox().then(left => { if (left) throw new Error(`${left} requests still queued`); }));
+});
+
+self.addEventListener('message', (e) => {
+    if (e.data && e.data.type === 'replay-outbox') e.waitUntil(replayOutbox().catch(() => { }));
 });
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import University, Faculty, Course, Semester, Subject, Chapter, CustomUser, SavedSchedule, TopicMastery, SessionStats
+from .models import University, Faculty, Course, Semester, Subject, Chapter, CustomUser, SavedSchedule, TopicMastery, SessionStats, PlanJob
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -34,7 +34,26 @@ class ChapterAdmin(admin.ModelAdmin):
 
 @admin.register(SavedSchedule)
 class SavedScheduleAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'created_at')
+    list_display = ('name', 'user', 'day_count', 'created_at', 'updated_at')
+    list_select_related = ('user',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            qs = qs.defer('data', 'inputs') # the plans are only needed by the change form
+        return qs
+
+@admin.register(PlanJob)
+class PlanJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('user',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            qs = qs.defer('payload', 'result')
+        return qs
 
 admin.site.register(TopicMastery)
 admin.site.register(SessionStats)
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class StudyPlannerConfig(AppConfig):
     name = 'study_planner'
+
+    def ready(self):
+        from . import chapter_index, leaderboard, metadata, metrics
+        metadata.connect_signals()
+        chapter_index.connect_signals()
+        leaderboard.connect_signals()
+        metrics.connect_signals()
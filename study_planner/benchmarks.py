@@ -0,0 +1,179 @@
+"""Fixed planner workloads, their measurements and the regression gate.
+
+Every workload derives its inputs from one ``now``, so a run plans exactly the
+same days each time. ``measure`` takes the timing clock as a parameter, which
+lets tests drive it with a fake clock. ``manage.py bench_suite`` runs the suite
+against BASELINE (``--save`` rewrites it).
+
+Times depend on the machine, so their threshold is loose. Allocations and peak
+memory are stable for a given Python version and are gated tightly.
+
+A workload's time also depends on what ran before it in the same process (the
+heap and caches earlier workloads left behind), so ``run(isolate=True)``, which
+bench_suite uses, measures each workload in a process of its own, forked from
+one that has run none of them. Each is called WARMUP times untimed first and
+the median of the timed calls is reported.
+"""
+import gc
+import json
+import multiprocessing
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+from planner import generate_study_plan, get_micro_chunks
+
+from .management.commands.seed_syllabus import PURBANCHAL_DATA
+
+BASELINE = Path(__file__).with_name('bench_baseline.json')
+NOW = datetime(2026, 1, 1, 5, 0)
+THRESHOLDS = {"ms": 0.5, "allocations": 0.1, "peak_kb": 0.1} # allowed growth over the baseline
+SLACK = {"ms": 1.0, "allocations": 50, "peak_kb": 16} # absolute headroom, so tiny workloads are not gated on noise
+METRICS = tuple(THRESHOLDS)
+WARMUP = 2 # untimed calls before the timed ones
+
+
+def synthetic_exams(count, horizon_days, today, exam_window=30):
+    """``count`` exams spread over the last ``exam_window`` days of the horizon."""
+    exams = []
+    window = min(exam_window, horizon_days)
+    for i in range(count):
+        offset = horizon_days - window + max(1, round(window * (i + 1) / count))
+        exams.append({
+            'name': f"Subject {i + 1}",
+            'date': str(today + timedelta(days=offset)),
+            'chapters': [f"Chapter {j + 1}" for j in range(6 + i % 5)],
+            'difficulty': 1 + i % 3,
+        })
+    return exams
+
+
+def semester_exams(semester, today, first_exam=30, gap=3):
+    """A seeded Purbanchal semester: one exam per subject, ``gap`` days apart, with the seeded chapter."""
+    return [
+        {'name': name, 'date': str(today + timedelta(days=first_exam + gap * i)), 'chapters': ["Focus Study Block"], 'difficulty': 1 + i % 3}
+        for i, name in enumerate(PURBANCHAL_DATA[semester])
+    ]
+
+
+def workloads(now=NOW):
+    """``{name: zero-argument callable}``, in report order."""
+    today = now.date()
+    suite = {}
+    for semester in PURBANCHAL_DATA:
+        if semester.startswith("Semester"):
+            suite[f"purbanchal/{semester.lower().replace(' ', '-')}"] = partial(generate_study_plan, semester_exams(semester, today), now=now)
+    for horizon in (60, 365):
+        suite[f"stress/60-exams-{horizon}d"] = partial(generate_study_plan, synthetic_exams(60, horizon, today), now=now)
+    suite["horizon/8-exams-365d"] = partial(generate_study_plan, synthetic_exams(8, 365, today), now=now)
+    suite["horizon/8-exams-365d-15min"] = partial(generate_study_plan, synthetic_exams(8, 365, today), session_mins=15, now=now)
+    for session in (15, 30, 90):
+        suite[f"chunks/{session}min"] = partial(get_micro_chunks, "Subject 1", "Chapter 1", 600, session, 5, current_time=now)
+    return suite
+
+
+def measure(fn, repeat=5, clock=time.perf_counter, warmup=WARMUP):
+    """Median-of-``repeat`` time after ``warmup`` untimed calls, plus one traced run's allocations and peak memory.
+
+    ``allocations`` counts the memory blocks still held once ``fn`` returns,
+    i.e. what its result keeps alive.
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable() # as timeit does; collector pauses grow with heap size
+        start = clock()
+        fn()
+        timings.append(clock() - start)
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.take_snapshot()
+        result = fn()
+        held = tracemalloc.take_snapshot().compare_to(base, 'filename')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"ms": round(statistics.median(timings) * 1000, 3), "allocations": sum(stat.count_diff for stat in held), "peak_kb": round(peak / 1024)}
+
+
+def _measure_and_send(conn, fn, repeat, clock):
+    conn.send(measure(fn, repeat, clock))
+    conn.close()
+
+
+def measure_isolated(fn, repeat=5, clock=time.perf_counter):
+    """``measure`` in a forked child process; in this one where fork is unavailable."""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return measure(fn, repeat, clock)
+    context = multiprocessing.get_context('fork')
+    receive, send = context.Pipe(duplex=False)
+    child = context.Process(target=_measure_and_send, args=(send, fn, repeat, clock))
+    child.start()
+    send.close()
+    try:
+        return receive.recv()
+    except EOFError:
+        raise RuntimeError(f"benchmark process died (exit code {child.join() or child.exitcode})") from None
+    finally:
+        child.join()
+
+
+def best_of(repeat, fn, *args):
+    """Best-of-``repeat`` milliseconds for ``fn(*args)``, timed as ``measure`` times."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run(suite=None, repeat=5, clock=time.perf_counter, only=None, isolate=False):
+    suite = workloads() if suite is None else suite
+    one = measure_isolated if isolate else measure
+    return {name: one(fn, repeat, clock) for name, fn in suite.items() if not only or only in name}
+
+
+def python_version():
+    return ".".join(platform.python_version_tuple()[:2])
+
+
+def load_baseline(path=BASELINE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE):
+    with open(path, 'w') as f:
+        json.dump({"python": python_version(), "now": NOW.isoformat(), "workloads": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def regressions(results, baseline, thresholds=THRESHOLDS, metrics=METRICS):
+    """``(workload, metric, baseline value, current value)`` for every metric over its threshold plus SLACK.
+
+    Workloads missing from the baseline are new and are not gated.
+    """
+    found = []
+    for name, current in results.items():
+        before = baseline["workloads"].get(name)
+        if before is None:
+            continue
+        for metric in metrics:
+            if current[metric] > before[metric] * (1 + thresholds[metric]) + SLACK[metric]:
+                found.append((name, metric, before[metric], current[metric]))
+    return found
@@ -0,0 +1,66 @@
+"""In-process subject name -> chapter names index.
+
+generate_schedule fills in chapters for exams that come without any. The index
+is built with one query over the whole syllabus, warmed when a server process
+starts (see wsgi.py/asgi.py), and dropped after any Subject or Chapter change
+commits. Changes made by another process (e.g. seed_syllabus) are picked up
+within MAX_AGE seconds.
+"""
+import time
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Chapter, Subject
+
+MAX_AGE = 300
+
+_index = None
+_built_at = 0.0
+
+
+def build():
+    """``{subject name: (chapter names...)}``; a name shared by several subjects maps to the first one."""
+    index, owner = {}, {}
+    rows = Subject.objects.order_by('id', 'chapters__id').values_list('name', 'id', 'chapters__name')
+    for name, subject_id, chapter in rows:
+        if owner.setdefault(name, subject_id) != subject_id:
+            continue
+        chapters = index.setdefault(name, [])
+        if chapter is not None:
+            chapters.append(chapter)
+    return {name: tuple(chapters) for name, chapters in index.items()}
+
+
+def get():
+    global _index, _built_at
+    if _index is None or time.monotonic() - _built_at > MAX_AGE:
+        _index, _built_at = build(), time.monotonic()
+    return _index
+
+
+def chapters_for(name):
+    """Chapter names of the subject called ``name`` (empty if unknown)."""
+    return list(get().get(name, ()))
+
+
+def warm():
+    try:
+        get()
+    except DatabaseError:
+        pass # not migrated yet; built on first use instead
+
+
+def invalidate():
+    global _index
+    _index = None
+
+
+def _syllabus_changed(sender, **kwargs):
+    transaction.on_commit(invalidate)
+
+
+def connect_signals():
+    for model in (Subject, Chapter):
+        post_save.connect(_syllabus_changed, sender=model, dispatch_uid=f"chapter-index-{model.__name__}-save")
+        post_delete.connect(_syllabus_changed, sender=model, dispatch_uid=f"chapter-index-{model.__name__}-delete")
@@ -0,0 +1,95 @@
+"""CompressedJSONField: JSON kept as zlib-compressed bytes, decoded on first access.
+
+Rows load with the compressed bytes, and the JSON is only parsed when the
+attribute is read, so code that never touches the value (listings, the admin
+changelist, ``save()`` of another field) never pays for it. Unread values are
+written back as they were, without recompressing. ``values()`` and
+``values_list()`` return the stored bytes (``Packed``); ``unpack`` decodes them.
+
+Values that are plans in the shape the planner renders are stored in the compact
+wire format (see wire.py), which zlib then shrinks several times further than
+the plain JSON; anything else is stored as JSON. The first byte says which.
+"""
+import json
+import zlib
+
+from django import forms
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from . import wire
+
+_JSON = b'J'
+_PLAN = b'W'
+
+
+class Packed(bytes):
+    """A stored value that has not been decoded yet."""
+
+
+def pack(value):
+    try:
+        tag, doc = _PLAN, wire.encode(value)
+    except ValueError:
+        tag, doc = _JSON, value
+    return tag + zlib.compress(json.dumps(doc, separators=(',', ':'), ensure_ascii=False).encode())
+
+
+def unpack(raw):
+    doc = json.loads(zlib.decompress(raw[1:]))
+    return wire.decode(doc) if raw[:1] == _PLAN else doc
+
+
+def plan_json(raw):
+    """A stored plan's compact wire form as JSON text, without decoding it; None for values stored as plain JSON."""
+    return zlib.decompress(raw[1:]).decode() if raw[:1] == _PLAN else None
+
+
+class _LazyJSON(DeferredAttribute):
+    # A data descriptor (it has __set__), so reads reach __get__ even once the value is in __dict__
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, Packed):
+            value = instance.__dict__[self.field.attname] = unpack(value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedJSONField(models.BinaryField):
+    description = "JSON, zlib-compressed"
+    descriptor_class = _LazyJSON
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.editable:
+            del kwargs['editable']
+        else:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Packed(value)
+
+    def pre_save(self, model_instance, add):
+        # Straight from __dict__: going through the descriptor would decode an unread value
+        return model_instance.__dict__.get(self.attname)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and not isinstance(value, Packed):
+            value = pack(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def to_python(self, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{'form_class': forms.JSONField, **kwargs})
@@ -0,0 +1,76 @@
+"""Focus-session ingestion shared by the single and batched log-session endpoints.
+
+A batch is written in one transaction: one bulk INSERT of SessionStats, one
+write per touched rollup row, and the mastery gains through
+mastery.apply_changes, which holds the user's lock while it reads and writes the
+topic scores. Overlapping posts from several tabs or a replayed offline queue
+therefore queue behind each other instead of overwriting each other's gains.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import rollups
+from .mastery import apply_changes
+from .models import SessionStats
+
+MAX_BATCH = 500
+
+
+def mastery_gain(focus_score):
+    return 5 if focus_score > 80 else (2 if focus_score > 50 else 0)
+
+
+def _timestamp(value, now):
+    """Client-side end time of a queued session; never later than ``now``."""
+    if not value:
+        return now
+    ts = parse_datetime(value)
+    if ts is None:
+        raise ValueError(f"bad timestamp {value!r}")
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return min(ts, now)
+
+
+def parse(user, item, now):
+    """One log-session payload as an unsaved SessionStats; ValueError if it is malformed."""
+    if not isinstance(item, dict):
+        raise ValueError("each session must be an object")
+    subject, topic = item.get('subject'), item.get('topic')
+    if not subject or not topic or not isinstance(subject, str) or not isinstance(topic, str):
+        raise ValueError("each session needs a subject and a topic")
+    try:
+        duration = item.get('duration_mins')
+        return SessionStats(
+            user=user,
+            subject=subject,
+            topic=topic,
+            duration_mins=None if duration is None else int(duration),
+            focus_score=int(item.get('focus_score', 100)),
+            distraction_count=int(item.get('distractions', 0)),
+            idle_seconds=int(item.get('idle_seconds', 0)),
+            abandoned=bool(item.get('abandoned', False)),
+            timestamp=_timestamp(item.get('timestamp'), now),
+        )
+    except (TypeError, ValueError):
+        raise ValueError("session fields must be numbers")
+
+
+@transaction.atomic
+def log_sessions(user, items):
+    """Saves ``items`` (log-session payloads) and applies their mastery gains.
+
+    Returns the new score of every topic touched.
+    """
+    now = timezone.now()
+    sessions = [parse(user, item, now) for item in items]
+    changes = {}
+    for s in sorted(sessions, key=lambda s: s.timestamp):
+        changes.setdefault((s.subject, s.topic), []).append(mastery_gain(s.focus_score))
+    # Taking the mastery lock first keeps a batch from interleaving with
+    # another one for the same user on every backend.
+    scores = apply_changes(user, changes)
+    SessionStats.objects.bulk_create(sessions)
+    rollups.record_sessions(sessions)
+    return scores
@@ -0,0 +1,147 @@
+"""Database-backed queue of planning jobs, run by ``manage.py run_plan_jobs``.
+
+``POST /api/jobs`` stores the request as a PlanJob and returns its id at once;
+the client polls ``/api/jobs/<id>`` and fetches ``/api/jobs/<id>/result``.
+The web process only does what generate_schedule does before planning (the
+cache lookup and the mastery read), so a burst of plans queues in the table
+instead of holding web workers. A cached schedule is stored as a finished
+job without queueing.
+
+- Jobs belong to their ``owner``: the user, or for anonymous requests their
+  session, so one visitor's jobs are neither visible to nor counted against
+  another's.
+- Deduplication: a request identical to one of the owner's pending or running
+  jobs (same kind and plan_cache key) gets that job back. The partial unique
+  constraint on PlanJob makes this hold under concurrent submits.
+- Bounded concurrency: each worker process runs one job at a time, so
+  ``run_plan_jobs --processes N`` plans at most N at once on that host, and an
+  owner can have at most settings.PLAN_JOB_MAX_ACTIVE jobs queued or running.
+  Each active job holds one of the owner's numbered slots, unique among its
+  active jobs by another partial constraint, so concurrent submits cannot
+  overshoot the limit either.
+- Claims are a conditional UPDATE, so any number of worker processes can share
+  the table. A job still running after settings.PLAN_JOB_LEASE seconds is
+  taken to belong to a dead worker and is run again, up to MAX_ATTEMPTS times.
+"""
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from planner import generate_study_plan
+
+from . import plan_cache
+from .models import PlanJob
+from .persistence import save_study_plan
+
+KINDS = (PlanJob.SCHEDULE, PlanJob.EXAM_PLAN)
+MAX_ATTEMPTS = 3
+
+
+class QueueFull(Exception):
+    """The owner already has settings.PLAN_JOB_MAX_ACTIVE jobs waiting or running."""
+
+
+def owner(user, session_key=None):
+    """Whose jobs a request sees: the user's, or an anonymous visitor's session's; None without either."""
+    if user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"session:{session_key}" if session_key else None
+
+
+def _active(owner, kind, key):
+    return PlanJob.objects.filter(owner=owner, kind=kind, key=key, status__in=PlanJob.ACTIVE).first()
+
+
+def submit(user, kind, exams, plan_args, cache_key, body=None, session_key=None):
+    """Queues a plan; returns ``(job, created)``. ``created`` is False for a duplicate of an active job.
+
+    ``plan_args`` and ``cache_key`` are what views._plan_request returned; with
+    its cached ``body`` the job is stored finished, except that an exam plan
+    still waits for a worker to write its rows. An anonymous ``user`` needs the
+    ``session_key`` the job will belong to.
+    """
+    job_owner = owner(user, session_key)
+    if job_owner is None:
+        raise ValueError("an anonymous job needs a session")
+    args = {k: v for k, v in plan_args.items() if k != 'now'}
+    job = PlanJob(user=user if user.is_authenticated else None, owner=job_owner, kind=kind, key=cache_key,
+                  payload={"exams": exams, "args": args, "now": plan_args["now"].isoformat()})
+    if body is not None:
+        job.result = json.loads(body)
+        if kind == PlanJob.SCHEDULE:
+            job.status, job.finished_at = PlanJob.DONE, timezone.now()
+    while True:
+        active = _active(job_owner, kind, cache_key)
+        if active is not None:
+            return active, False
+        held = set(PlanJob.objects.filter(owner=job_owner, status__in=PlanJob.ACTIVE).values_list('slot', flat=True))
+        free = [slot for slot in range(settings.PLAN_JOB_MAX_ACTIVE) if slot not in held]
+        if not free:
+            raise QueueFull()
+        job.slot = free[0]
+        try:
+            with transaction.atomic():
+                job.save(force_insert=True)
+            return job, True
+        except IntegrityError: # a concurrent submit took the slot or queued the same plan: look again
+            continue
+
+
+def claim(worker=''):
+    """Marks the oldest runnable job as running and returns it; None if there is none."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PLAN_JOB_LEASE)
+    while True:
+        job = (PlanJob.objects.filter(Q(status=PlanJob.PENDING) | Q(status=PlanJob.RUNNING, started_at__lt=stale))
+               .order_by('created_at').only('pk', 'status', 'attempts').first())
+        if job is None:
+            return None
+        current = PlanJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+        if job.attempts >= MAX_ATTEMPTS:
+            current.update(status=PlanJob.FAILED, error="the worker running this job stopped", finished_at=now)
+            continue
+        if current.update(status=PlanJob.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1):
+            return PlanJob.objects.select_related('user').get(pk=job.pk)
+        # another worker claimed it first: try the next one
+
+
+def _plan(job):
+    if job.result is not None: # planned at submit time, from the web process's cache
+        return job.result
+    payload = job.payload
+    body = plan_cache.get(job.key)
+    if body is not None:
+        return json.loads(body)
+    schedule = generate_study_plan(payload["exams"], now=datetime.fromisoformat(payload["now"]), **payload["args"])
+    plan_cache.set(job.key, schedule)
+    return schedule
+
+
+def run(job):
+    """Plans a claimed job and stores the result, or the error it raised."""
+    try:
+        schedule = _plan(job)
+        if job.kind == PlanJob.EXAM_PLAN and schedule.get("status") == "success":
+            save_study_plan(job.user, schedule)
+    except Exception as e:
+        outcome = {"status": PlanJob.FAILED, "error": str(e) or type(e).__name__}
+    else:
+        outcome = {"status": PlanJob.DONE, "result": schedule}
+    # Only if it is still ours: after the lease ran out another worker may own it
+    PlanJob.objects.filter(pk=job.pk, attempts=job.attempts).update(finished_at=timezone.now(), **outcome)
+
+
+def purge():
+    """Deletes finished jobs older than settings.PLAN_JOB_KEEP seconds; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.PLAN_JOB_KEEP)
+    deleted, _ = PlanJob.objects.filter(status__in=(PlanJob.DONE, PlanJob.FAILED), finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def position(job):
+    """Jobs queued ahead of a pending ``job``."""
+    return PlanJob.objects.filter(status=PlanJob.PENDING, created_at__lt=job.created_at).count()
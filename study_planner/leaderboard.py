@@ -0,0 +1,119 @@
+"""In-process XP rank index for the leaderboard.
+
+Users are kept in a list sorted by (-xp, id), so the top N is a slice and a
+user's rank is one bisect. Saves and deletes of CustomUser move a single entry
+once the transaction commits. The whole index is reloaded from the (indexed) xp
+column after MAX_AGE seconds, which picks up writes made by other processes.
+QuerySet.update() and bulk_update() send no signals, so XP written that way
+also shows up only after that reload (up to MAX_AGE seconds late): change XP
+through save(), as sync_xp does, where the rank must move at once.
+
+Ranks are competition ranks: users with equal XP share a rank.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import CustomUser
+
+MAX_AGE = 300
+
+
+class RankIndex:
+    def __init__(self, rows=()):
+        """``rows`` are (id, username, xp, streak, is_pro) tuples in any order."""
+        self.lock = threading.Lock()
+        self.users = {row[0]: row for row in rows}
+        self.keys = sorted((-row[2], row[0]) for row in self.users.values())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, row):
+        with self.lock:
+            old = self.users.get(row[0])
+            if old is not None:
+                del self.keys[bisect_left(self.keys, (-old[2], old[0]))]
+            self.users[row[0]] = row
+            insort(self.keys, (-row[2], row[0]))
+
+    def remove(self, user_id):
+        with self.lock:
+            old = self.users.pop(user_id, None)
+            if old is not None:
+                del self.keys[bisect_left(self.keys, (-old[2], old[0]))]
+
+    def _rank_of_xp(self, xp):
+        return bisect_left(self.keys, (-xp,)) + 1 # (-xp,) sorts before every (-xp, id)
+
+    def _entries(self, keys):
+        entries = []
+        for neg_xp, user_id in keys:
+            _, username, xp, streak, is_pro = self.users[user_id]
+            entries.append({"rank": self._rank_of_xp(xp), "username": username, "xp": xp, "streak": streak, "is_pro": is_pro})
+        return entries
+
+    def rank(self, user_id):
+        """1-based rank of ``user_id``, or None if unknown."""
+        with self.lock:
+            row = self.users.get(user_id)
+            return self._rank_of_xp(row[2]) if row else None
+
+    def page(self, offset=0, limit=10):
+        with self.lock:
+            return self._entries(self.keys[max(0, offset):max(0, offset) + limit])
+
+    def around(self, user_id, above=10, below=10):
+        """The user's entry with up to ``above`` users ranked ahead and ``below`` behind."""
+        with self.lock:
+            row = self.users.get(user_id)
+            if row is None:
+                return []
+            pos = bisect_left(self.keys, (-row[2], user_id))
+            return self._entries(self.keys[max(0, pos - above):pos + below + 1])
+
+
+_FIELDS = ('id', 'username', 'xp', 'streak', 'is_pro')
+_index = None
+_loaded_at = 0.0
+
+
+def load():
+    return RankIndex(CustomUser.objects.values_list(*_FIELDS))
+
+
+def get():
+    global _index, _loaded_at
+    if _index is None or time.monotonic() - _loaded_at > MAX_AGE:
+        _index, _loaded_at = load(), time.monotonic()
+    return _index
+
+
+def _row(user):
+    return tuple(getattr(user, field) for field in _FIELDS)
+
+
+def _user_saved(sender, instance, **kwargs):
+    row = _row(instance)
+
+    def apply():
+        if _index is not None:
+            _index.update(row)
+    transaction.on_commit(apply)
+
+
+def _user_deleted(sender, instance, **kwargs):
+    user_id = instance.pk
+
+    def apply():
+        if _index is not None:
+            _index.remove(user_id)
+    transaction.on_commit(apply)
+
+
+def connect_signals():
+    post_save.connect(_user_saved, sender=CustomUser, dispatch_uid="leaderboard-user-save")
+    post_delete.connect(_user_deleted, sender=CustomUser, dispatch_uid="leaderboard-user-delete")
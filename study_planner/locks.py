@@ -0,0 +1,37 @@
+"""Per-user write locks, one UserLock row per purpose.
+
+Code that reads some of a user's state and writes it back calls ``acquire``
+first, inside its transaction. Taking the lock is a write to that row: a row
+lock on PostgreSQL, and the database write lock on SQLite, where
+select_for_update is a no-op and a read would not keep another writer from
+interleaving. Writers of the same purpose for the same user queue there until
+commit. Other purposes, and the user row itself (sync_xp, logins), are not
+held, so mastery ingestion and schedule sync do not wait on each other.
+
+The count of acquires (``taken``) only grows, so a holder can use it as a
+per-user sequence number; schedule_sync numbers its revisions with it.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import UserLock
+
+MASTERY = 'mastery' # see mastery.apply_changes
+SCHEDULES = 'schedules' # see schedule_sync
+
+
+def acquire(user, purpose):
+    """Holds ``user``'s ``purpose`` lock until the current transaction ends."""
+    rows = UserLock.objects.filter(user=user, purpose=purpose)
+    if rows.update(taken=F('taken') + 1):
+        return
+    try:
+        with transaction.atomic():
+            UserLock.objects.create(user=user, purpose=purpose, taken=1)
+    except IntegrityError: # a concurrent first acquire created it; wait for that one
+        rows.update(taken=F('taken') + 1)
+
+
+def taken(user, purpose):
+    """How many times ``user``'s ``purpose`` lock has been taken, this holder's acquire included."""
+    return UserLock.objects.filter(user=user, purpose=purpose).values_list('taken', flat=True).get()
@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from study_planner import leaderboard
+from study_planner.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Load-tests the leaderboard rank index against SQL on a throwaway test database'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--ops', type=int, default=2000)
+
+    def timed(self, label, fn, ops):
+        start = time.perf_counter()
+        for i in range(ops):
+            fn(i)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<34} {elapsed / ops * 1e6:>10.1f}")
+
+    def handle(self, *args, **options):
+        rng = random.Random(13)
+        n, ops = options['users'], options['ops']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            CustomUser.objects.bulk_create([
+                CustomUser(username=f"user{i}", password="!", xp=rng.randrange(50_000), streak=rng.randrange(60))
+                for i in range(n)
+            ], batch_size=2000)
+            ids = list(CustomUser.objects.values_list('id', flat=True))
+
+            start = time.perf_counter()
+            index = leaderboard.load()
+            self.stdout.write(f"loaded {len(index)} users in {(time.perf_counter() - start) * 1000:.0f} ms")
+            self.stdout.write(f"{'operation':<34} {'us/op':>10}")
+
+            def sql_rank(i):
+                xp = CustomUser.objects.values_list('xp', flat=True).get(id=ids[i % n])
+                return CustomUser.objects.filter(xp__gt=xp).count() + 1
+
+            changed = set()
+
+            def index_update(i):
+                user_id = ids[rng.randrange(n)]
+                changed.add(user_id)
+                row = index.users[user_id]
+                index.update(row[:2] + (row[2] + rng.randrange(1, 200),) + row[3:])
+
+            self.timed("SQL top 10 (indexed xp)", lambda i: list(CustomUser.objects.order_by('-xp')[:10].values_list('username', 'xp')), min(ops, 500))
+            self.timed("SQL rank (count xp > mine)", sql_rank, min(ops, 200))
+            self.timed("index top 10", lambda i: index.page(0, 10), ops)
+            self.timed("index rank", lambda i: index.rank(ids[i % n]), ops)
+            self.timed("index 10 above / 10 below", lambda i: index.around(ids[i % n]), ops)
+            self.timed("index update (XP sync)", index_update, ops)
+
+            # Write the updated XP back and check the index agrees with SQL
+            CustomUser.objects.bulk_update([CustomUser(id=user_id, xp=index.users[user_id][2]) for user_id in changed], ['xp'], batch_size=2000)
+            for user_id in rng.sample(ids, 50):
+                assert index.rank(user_id) == sql_rank(ids.index(user_id)), user_id
+            self.stdout.write("ranks after updates match SQL")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+
+from planner import _mastery_averages
+from study_planner.mastery import subject_averages, update_topic
+from study_planner.models import CustomUser, SubjectMastery, TopicMastery
+
+
+def topic_map_averages(user):
+    """The old path: every TopicMastery row into a nested dict, averaged in Python."""
+    mastery = {}
+    for subject, topic, score in TopicMastery.objects.filter(user=user).values_list('subject', 'topic', 'mastery_score'):
+        mastery.setdefault(subject, {})[topic] = score
+    return _mastery_averages(mastery)
+
+
+class Command(BaseCommand):
+    help = 'Compares reading mastery from TopicMastery rows vs SubjectMastery aggregates on a throwaway test database'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topics', default='100,1000,5000', help='Comma-separated topic counts per user')
+        parser.add_argument('--subjects', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def timed(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                result = fn()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, len(queries), best
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"{'topics':>7} {'path':<18} {'rows read':>9} {'queries':>8} {'ms':>8}")
+            for n, count in enumerate(int(t) for t in options['topics'].split(',')):
+                user = CustomUser.objects.create_user(f'bench{n}', f'bench{n}@example.com', 'bench-password')
+                TopicMastery.objects.bulk_create([
+                    TopicMastery(user=user, subject=f"Subject {i % options['subjects']}", topic=f"Topic {i}", mastery_score=i * 37 % 101)
+                    for i in range(count)
+                ], batch_size=500)
+                SubjectMastery.objects.bulk_create([
+                    SubjectMastery(user=user, subject=r['subject'], total=r['total'], topics=r['topics'])
+                    for r in TopicMastery.objects.filter(user=user).values('subject').annotate(total=Sum('mastery_score'), topics=Count('id'))
+                ])
+
+                old, old_queries, old_time = self.timed(lambda: topic_map_averages(user), options['repeat'])
+                new, new_queries, new_time = self.timed(lambda: {s: avg / 100.0 for s, avg in subject_averages(user).items()}, options['repeat'])
+                assert old == new, "aggregates disagree with the topic rows"
+                _, write_queries, write_time = self.timed(lambda: update_topic(user, "Subject 0", "Topic 0", 1), options['repeat'])
+
+                topics = TopicMastery.objects.filter(user=user).count()
+                self.stdout.write(f"{topics:>7} {'topic rows':<18} {topics:>9} {old_queries:>8} {old_time * 1000:>8.2f}")
+                self.stdout.write(f"{topics:>7} {'subject aggregate':<18} {len(new):>9} {new_queries:>8} {new_time * 1000:>8.2f}")
+                self.stdout.write(f"{topics:>7} {'update_topic':<18} {'-':>9} {write_queries:>8} {write_time * 1000:>8.2f}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,60 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from planner import generate_study_plan
+from study_planner.benchmarks import synthetic_exams
+from study_planner.models import CustomUser, StudyPlan
+from study_planner.persistence import save_study_plan
+
+
+def save_per_row(user, schedule):
+    """The old api_exam_plan loop: delete everything, then one INSERT per task."""
+    StudyPlan.objects.filter(user=user).delete()
+    for day in schedule["days"]:
+        for task in day.get("tasks", []):
+            StudyPlan.objects.create(user=user, date=date.fromisoformat(day["ad_date"]), subject=day["subject"],
+                                     duration_mins=task["minutes"], plan_type=task["type"])
+
+
+class Command(BaseCommand):
+    help = 'Times StudyPlan persistence (row count, queries, wall time) on a throwaway test database'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--exams', type=int, default=8)
+
+    def handle(self, *args, **options):
+        now = datetime(2026, 1, 1, 5, 0)
+        exams = synthetic_exams(options['exams'], options['days'], now.date())
+        schedule = generate_study_plan(exams, now=now)
+        exams[-1]['date'] = str(now.date() + timedelta(days=options['days'] + 3)) # push the last exam back
+        edited = generate_study_plan(exams, now=now)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = CustomUser.objects.create_user('bench', 'bench@example.com', 'bench-password')
+            runs = [
+                ("per-row create", save_per_row, schedule),
+                ("bulk, first write", save_study_plan, schedule),
+                ("bulk, unchanged", save_study_plan, schedule),
+                ("bulk, last exam moved", save_study_plan, edited),
+            ]
+            self.stdout.write(f"{len(schedule['days'])} days, {sum(len(d['tasks']) for d in schedule['days'])} tasks")
+            self.stdout.write(f"{'run':<24} {'rows written':>12} {'queries':>8} {'ms':>9}")
+            for label, save, plan in runs:
+                if label == "bulk, first write":
+                    StudyPlan.objects.filter(user=user).delete()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    result = save(user, plan)
+                    elapsed = time.perf_counter() - start
+                written = result["rows_created"] if result else StudyPlan.objects.filter(user=user).count()
+                self.stdout.write(f"{label:<24} {written:>12} {len(queries):>8} {elapsed * 1000:>9.1f}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
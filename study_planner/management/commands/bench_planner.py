@@ -0,0 +1,82 @@
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from planner import PlanRenderer, PlanTrace, StageTimer, generate_study_plan
+from study_planner.benchmarks import synthetic_exams
+
+
+class Command(BaseCommand):
+    help = 'Times generate_study_plan on synthetic exam lists across plan horizons'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exams', type=int, default=60)
+        parser.add_argument('--horizons', default='60,120,240,365', help='Comma-separated plan lengths in days')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--memory', action='store_true', help='Report the size of a 180-day plan before and after rendering')
+
+    def handle(self, *args, **options):
+        now = datetime(2026, 1, 1, 5, 0)
+        if options['memory']:
+            return self.memory(now, options['exams'])
+        rows = []
+        for horizon in [int(h) for h in options['horizons'].split(',')]:
+            exams = synthetic_exams(options['exams'], horizon, now.date())
+            best = None
+            for _ in range(options['repeat']):
+                gc.collect()
+                gc.disable() # as timeit does; collector pauses grow with heap size
+                start = time.perf_counter()
+                result = generate_study_plan(exams, now=now)
+                elapsed = time.perf_counter() - start
+                gc.enable()
+                best = elapsed if best is None else min(best, elapsed)
+            days = len(result['days'])
+            rows.append((horizon, days, best))
+
+        # The exam block is the same length at every horizon, so the marginal cost
+        # of the extra days should stay flat if the loop is linear in days.
+        self.stdout.write(f"{'horizon':>8} {'days':>6} {'ms':>9} {'us/day':>8} {'marginal us/day':>16}")
+        prev = None
+        for horizon, days, best in rows:
+            marginal = f"{(best - prev[2]) / (days - prev[1]) * 1e6:>16.1f}" if prev else f"{'-':>16}"
+            self.stdout.write(f"{horizon:>8} {days:>6} {best * 1000:>9.2f} {best / days * 1e6:>8.1f} {marginal}")
+            prev = (horizon, days, best)
+
+    def memory(self, now, exam_count):
+        exams = synthetic_exams(exam_count, 180, now.date())
+        generate_study_plan(exams, now=now) # warm the calendar and label caches
+
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.take_snapshot()
+        trace = PlanTrace(checkpoints=False)
+        result = generate_study_plan(exams, now=now, trace=trace)
+        del result
+        gc.collect()
+        compact = tracemalloc.take_snapshot().compare_to(base, 'filename')
+        compact = sum(stat.size_diff for stat in compact)
+        render = PlanRenderer(trace.strings).day
+        days = [render(day) for day in trace.days]
+        rendered = tracemalloc.take_snapshot().compare_to(base, 'filename')
+        rendered = sum(stat.size_diff for stat in rendered) - compact
+        tracemalloc.stop()
+
+        tasks = sum(len(day.tasks) for day in trace.days)
+        # One call, split by its own stage timer: the call renders each day as it is planned
+        timer = StageTimer()
+        gc.disable()
+        generate_study_plan(exams, now=now, timer=timer)
+        gc.enable()
+        render_time = timer.seconds.get("render", 0.0)
+        plan_time = sum(timer.seconds.values()) - render_time
+
+        self.stdout.write(f"{len(days)} days, {tasks} tasks, {len(json.dumps(days))} bytes of JSON")
+        self.stdout.write(f"compact records: {compact / 1024:.0f} KiB ({compact / tasks:.0f} B/task)")
+        self.stdout.write(f"rendered dicts:  {rendered / 1024:.0f} KiB ({rendered / tasks:.0f} B/task)")
+        self.stdout.write(f"plan {plan_time * 1000:.2f} ms + render {render_time * 1000:.2f} ms")
@@ -0,0 +1,74 @@
+import json
+import os
+import sqlite3
+import tempfile
+import zlib
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from study_planner import benchmarks, fields
+from study_planner.models import SavedSchedule
+
+
+def sqlite_size(blobs):
+    """Bytes on disk of a fresh SQLite table holding ``blobs``, after VACUUM."""
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    try:
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE saved (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        db.executemany("INSERT INTO saved (data) VALUES (?)", ((b,) for b in blobs))
+        db.commit()
+        db.execute("VACUUM")
+        db.close()
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+class Command(BaseCommand):
+    help = """Reports how much smaller SavedSchedule.data is stored compressed than as JSON text.
+
+    The corpus is the bench_suite plans (eight seeded semesters plus the stress
+    and long-horizon plans), each saved --copies times, as the old JSONField and
+    as CompressedJSONField would write them. With --database the saved
+    schedules already in the database are measured as well.
+    """
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=20, help='Rows per plan in the on-disk comparison')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--database', action='store_true', help='Also measure the SavedSchedule rows in the database')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f"{'plan':<28} {'json KiB':>9} {'zlib':>7} {'stored':>7} {'ratio':>6} {'parse ms':>9} {'unpack ms':>10}")
+        texts, packed = [], []
+        for name, fn in benchmarks.workloads().items():
+            if name.startswith('chunks/'):
+                continue
+            plan = fn()
+            text = json.dumps(plan).encode() # as JSONField stores it
+            raw = fields.pack(plan)
+            texts.append(text)
+            packed.append(raw)
+            self.stdout.write(
+                f"{name:<28} {len(text) / 1024:>9.1f} {len(zlib.compress(text)) / 1024:>7.1f} {len(raw) / 1024:>7.1f} {len(text) / len(raw):>6.1f}"
+                f" {benchmarks.best_of(repeat, json.loads, text):>9.2f} {benchmarks.best_of(repeat, fields.unpack, raw):>10.2f}"
+            )
+
+        copies = options['copies']
+        before, after = sqlite_size(texts * copies), sqlite_size(packed * copies)
+        self.stdout.write(
+            f"\nSQLite, {len(texts) * copies} rows: {before / 2**20:.1f} MiB as JSON text, {after / 2**20:.2f} MiB compressed"
+            f" ({before / after:.0f}x smaller)"
+        )
+
+        if options['database']:
+            rows = SavedSchedule.objects.count()
+            stored = SavedSchedule.objects.aggregate(n=Sum(Length('data')))['n'] or 0
+            as_json = sum(len(json.dumps(fields.unpack(raw)).encode()) for raw in SavedSchedule.objects.values_list('data', flat=True).iterator())
+            self.stdout.write(f"database, {rows} saved schedules: {as_json / 1024:.0f} KiB as JSON text, {stored / 1024:.0f} KiB stored")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from study_planner import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Runs the fixed planner workloads and fails if any regresses past the JSON baseline'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=9)
+        parser.add_argument('--only', help='Run only workloads whose name contains this')
+        parser.add_argument('--baseline', default=str(benchmarks.BASELINE))
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline instead of gating')
+        parser.add_argument('--no-time', action='store_true', help='Gate on allocations and peak memory only (e.g. on shared CI runners)')
+        parser.add_argument('--in-process', action='store_true', help='Run every workload in this process instead of one forked process each')
+
+    def handle(self, *args, **options):
+        results = benchmarks.run(repeat=options['repeat'], only=options['only'], isolate=not options['in_process'])
+        if options['save']:
+            benchmarks.save_baseline(results, options['baseline'])
+            self.stdout.write(f"saved {len(results)} workloads to {options['baseline']}")
+            return
+
+        baseline = benchmarks.load_baseline(options['baseline'])
+        if baseline["python"] != benchmarks.python_version():
+            self.stderr.write(f"baseline was recorded on Python {baseline['python']}; memory figures may not compare")
+
+        self.stdout.write(f"{'workload':<28} {'ms':>9} {'base ms':>9} {'allocs':>8} {'base':>8} {'peak KiB':>9} {'base':>8}")
+        for name, current in results.items():
+            before = baseline["workloads"].get(name, {})
+            self.stdout.write(
+                f"{name:<28} {current['ms']:>9.2f} {before.get('ms', '-'):>9} {current['allocations']:>8} {before.get('allocations', '-'):>8}"
+                f" {current['peak_kb']:>9} {before.get('peak_kb', '-'):>8}"
+            )
+
+        metrics = [m for m in benchmarks.METRICS if not (options['no_time'] and m == 'ms')]
+        found = benchmarks.regressions(results, baseline, metrics=metrics)
+        if found:
+            raise CommandError("regressions:\n" + "\n".join(f"  {name} {metric}: {before} -> {after}" for name, metric, before, after in found))
+        self.stdout.write(self.style.SUCCESS("no regressions"))
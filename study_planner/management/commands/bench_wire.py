@@ -0,0 +1,44 @@
+import gzip
+import json
+
+from django.core.management.base import BaseCommand
+
+from study_planner import benchmarks, wire
+
+
+def parse_compact(body):
+    return wire.decode(json.loads(body))
+
+
+class Command(BaseCommand):
+    help = """Compares the plain and compact schedule formats on the bench_suite plans.
+
+    Sizes are of the response bodies, raw and gzipped. "parse" is json.loads of
+    the body, plus wire.decode for the compact one (which is what main.js does
+    with JSON.parse and decodeCompactPlan); "encode" is the server's extra work.
+    """
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--only', help='Run only workloads whose name contains this')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(
+            f"{'workload':<28} {'json KiB':>9} {'gz':>7} {'compact':>8} {'gz':>7} {'ratio':>6} {'gz ratio':>8}"
+            f" {'parse ms':>9} {'compact':>8} {'encode ms':>10}"
+        )
+        for name, fn in benchmarks.workloads().items():
+            if name.startswith('chunks/') or (options['only'] and options['only'] not in name):
+                continue
+            plan = fn()
+            plain = json.dumps(plan).encode()
+            compact = json.dumps(wire.encode(plan), separators=(',', ':')).encode()
+            plain_gz, compact_gz = len(gzip.compress(plain)), len(gzip.compress(compact))
+            self.stdout.write(
+                f"{name:<28} {len(plain) / 1024:>9.1f} {plain_gz / 1024:>7.1f} {len(compact) / 1024:>8.1f} {compact_gz / 1024:>7.1f}"
+                f" {len(plain) / len(compact):>6.1f} {plain_gz / compact_gz:>8.1f}"
+                f" {benchmarks.best_of(repeat, json.loads, plain):>9.2f} {benchmarks.best_of(repeat, parse_compact, compact):>8.2f}"
+                f" {benchmarks.best_of(repeat, wire.encode, plan):>10.2f}"
+            )
@@ -0,0 +1,117 @@
+import http.client
+import json
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+class Command(BaseCommand):
+    help = """Drives running deployments with concurrent GETs and compares requests/sec and latency.
+
+    Start the same code both ways, with the same number of worker processes, e.g.
+      gunicorn padsala_project.wsgi -w 4 -b 127.0.0.1:8001
+      uvicorn padsala_project.asgi:application --workers 4 --port 8002
+    then run
+      manage.py loadtest wsgi=http://127.0.0.1:8001 asgi=http://127.0.0.1:8002 --login user:password
+    """
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', help='name=base_url pairs')
+        parser.add_argument('--paths', default='/api/auth/status,/api/v17/leaderboard,/api/sync/schedules,/api/today-plan/',
+                            help='Comma-separated paths, requested round-robin by every client')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per target')
+        parser.add_argument('--login', help='username:password to log in with first, so the authenticated paths do real work')
+
+    def session_cookie(self, base, credentials):
+        username, _, password = credentials.partition(':')
+        conn = self.connect(base)
+        conn.request('POST', base.path.rstrip('/') + '/api/auth/login', json.dumps({"username": username, "password": password}),
+                     {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise CommandError(f"login to {base.geturl()} failed with {response.status}")
+        cookie = SimpleCookie()
+        for header in response.headers.get_all('Set-Cookie') or ():
+            cookie.load(header)
+        return "; ".join(f"{name}={morsel.value}" for name, morsel in cookie.items())
+
+    def connect(self, base):
+        cls = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+        return cls(base.hostname, base.port, timeout=30)
+
+    def run_target(self, base, paths, headers, concurrency, duration):
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client(offset):
+            conn = self.connect(base)
+            mine, failed = [], 0
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    conn.request('GET', base.path.rstrip('/') + path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    conn.close()
+                    conn = self.connect(base)
+                    continue
+                mine.append(time.perf_counter() - start)
+            conn.close()
+            with lock:
+                latencies.extend(mine)
+                errors[0] += failed
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors[0],
+            "rps": len(latencies) / elapsed,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": (latencies[-1] if latencies else 0.0) * 1000,
+        }
+
+    def handle(self, *args, **options):
+        paths = [p.strip() for p in options['paths'].split(',') if p.strip()]
+        rows = []
+        for target in options['targets']:
+            name, sep, url = target.partition('=')
+            if not sep:
+                raise CommandError(f"expected name=url, got {target!r}")
+            base = urlsplit(url)
+            headers = {"Connection": "keep-alive"}
+            if options['login']:
+                headers["Cookie"] = self.session_cookie(base, options['login'])
+            self.stdout.write(f"{name}: {options['concurrency']} clients for {options['duration']:g}s on {url}")
+            rows.append((name, self.run_target(base, paths, headers, options['concurrency'], options['duration'])))
+
+        self.stdout.write(f"{'target':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name, r in rows:
+            self.stdout.write(f"{name:<10} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.2f}")
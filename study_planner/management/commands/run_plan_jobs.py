@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from study_planner import jobs
+
+_PURGE_EVERY = 60 * 60 # seconds between purges of old finished jobs, per process
+
+
+def work(poll, burst):
+    """One worker process: claims and runs jobs until stopped (or, with ``burst``, until the queue is empty)."""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True)) # finish the current job, then exit
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    purged = 0.0
+    while not stopping:
+        close_old_connections()
+        job = jobs.claim(name)
+        if job is not None:
+            jobs.run(job)
+            continue
+        if burst:
+            break
+        if time.monotonic() - purged > _PURGE_EVERY:
+            jobs.purge()
+            purged = time.monotonic()
+        time.sleep(poll)
+
+
+class Command(BaseCommand):
+    help = """Runs queued planning jobs (see study_planner.jobs).
+
+    Starts --processes worker processes, each running one job at a time, so at
+    most that many plans are computed at once. Processes, not threads: plans
+    are CPU-bound. Run it beside the web server, e.g. under the same process
+    supervisor; any number of hosts can run it against the same database.
+    SIGTERM lets the running jobs finish first.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.PLAN_JOB_PROCESSES)
+        parser.add_argument('--poll', type=float, default=0.5, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        poll, burst = options['poll'], options['burst']
+        if options['processes'] <= 1:
+            work(poll, burst)
+            return
+        connections.close_all() # children must open their own
+        children = [multiprocessing.Process(target=work, args=(poll, burst), daemon=True) for _ in range(options['processes'])]
+        for child in children:
+            child.start()
+        signal.signal(signal.SIGTERM, lambda *_: [child.terminate() for child in children]) # each child stops after its job
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt: # the children got the SIGINT too
+            for child in children:
+                child.join()
@@ -0,0 +1,67 @@
+"""Topic mastery writes and the per-subject aggregates the planner reads.
+
+Every TopicMastery change goes through apply_changes, which applies the same
+delta to the user's SubjectMastery rows in the same transaction. Planning then
+reads one row per subject instead of every topic.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import locks
+from .models import SubjectMastery, TopicMastery
+
+
+@transaction.atomic
+def apply_changes(user, changes):
+    """Applies score changes to several topics in one transaction.
+
+    ``changes`` maps (subject, topic) to its changes in the order they happened;
+    every step is kept within 0..100, as separate requests would. Returns the
+    new score of each topic.
+    """
+    locks.acquire(user, locks.MASTERY) # concurrent writes for this user queue here, so the scores read below stay current
+    existing = {
+        (tm.subject, tm.topic): tm
+        for tm in TopicMastery.objects.filter(user=user, subject__in={s for s, _ in changes}, topic__in={t for _, t in changes})
+    }
+    created, updated, scores = [], [], {}
+    deltas = defaultdict(lambda: [0, 0]) # subject -> [score delta, new topics]
+    now = timezone.now()
+    for key, steps in changes.items():
+        tm = existing.get(key)
+        if tm is None:
+            tm = TopicMastery(user=user, subject=key[0], topic=key[1])
+            created.append(tm)
+            deltas[key[0]][1] += 1
+        else:
+            updated.append(tm)
+        old = tm.mastery_score
+        for change in steps:
+            tm.mastery_score = max(0, min(100, tm.mastery_score + change))
+        tm.last_updated = now
+        deltas[key[0]][0] += tm.mastery_score - old
+        scores[key] = tm.mastery_score
+
+    TopicMastery.objects.bulk_create(created)
+    TopicMastery.objects.bulk_update(updated, ['mastery_score', 'last_updated'])
+    for subject, (delta, new_topics) in deltas.items():
+        rows = SubjectMastery.objects.filter(user=user, subject=subject)
+        if not rows.update(total=F('total') + delta, topics=F('topics') + new_topics):
+            SubjectMastery.objects.create(user=user, subject=subject, total=delta, topics=new_topics)
+    return scores
+
+
+def update_topic(user, subject, topic, change):
+    """Adds ``change`` to one topic's score and returns the new score."""
+    return apply_changes(user, {(subject, topic): [change]})[(subject, topic)]
+
+
+def subject_averages(user):
+    """``{subject: average topic score}`` for planner.generate_study_plan's ``subject_mastery``."""
+    return {
+        subject: total / topics
+        for subject, total, topics in SubjectMastery.objects.filter(user=user, topics__gt=0).values_list('subject', 'total', 'topics')
+    }
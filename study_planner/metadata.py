@@ -0,0 +1,95 @@
+"""Prebuilt syllabus metadata for the wizard.
+
+The University -> Faculty -> Course -> Semester -> Subject tree only changes when
+``seed_syllabus`` runs or someone edits it in the admin, so it is serialized once
+into the SyllabusMetadata row (plain and gzipped, with its ETag). Saves and
+deletes of those models rebuild it once the surrounding transaction commits, so
+a bulk import rebuilds it once rather than once per row.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Course, Faculty, Semester, Subject, SyllabusMetadata, University
+
+SYLLABUS_MODELS = (University, Faculty, Course, Semester, Subject)
+
+_memo = None # last SyllabusMetadata row loaded by this process
+
+
+class _Pending(threading.local):
+    flag = False # a change on this thread's connection awaits a rebuild
+
+
+_pending = _Pending()
+
+
+def build_metadata():
+    """Reconstructs the nested dictionary structure from the database for the frontend wizard."""
+    data = {}
+    unis = University.objects.prefetch_related('faculties__courses__semesters__subjects').all()
+
+    for uni in unis:
+        uni_data = {}
+        for fac in uni.faculties.all():
+            fac_data = {}
+            for course in fac.courses.all():
+                course_data = {}
+                for sem in course.semesters.all():
+                    sem_data = {}
+                    for sub in sem.subjects.all():
+                        sem_data[sub.name] = {
+                            "id": sub.id,
+                            "difficulty": sub.base_difficulty,
+                            "is_elective": sub.is_elective
+                        }
+                    course_data[sem.name] = sem_data
+                fac_data[course.name] = course_data
+            uni_data[fac.name] = fac_data
+        data[uni.name] = uni_data
+    return data
+
+
+def rebuild():
+    body = json.dumps(build_metadata(), separators=(',', ':')).encode()
+    blob, _ = SyllabusMetadata.objects.update_or_create(pk=1, defaults={
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "body": body,
+        "body_gzip": gzip.compress(body, mtime=0),
+    })
+    return blob
+
+
+def current():
+    """The current blob; one query for the ETag unless it changed since last time."""
+    global _memo
+    etag = SyllabusMetadata.objects.filter(pk=1).values_list('etag', flat=True).first()
+    if etag is None:
+        _memo = rebuild()
+    elif _memo is None or _memo.etag != etag:
+        _memo = SyllabusMetadata.objects.get(pk=1)
+    return _memo
+
+
+def _rebuild_pending():
+    # Every change queues this, but only the first callback after a commit
+    # rebuilds. A rolled-back transaction leaves the flag set with nothing
+    # queued, so the next change still queues (and runs) a rebuild.
+    if _pending.flag:
+        _pending.flag = False
+        rebuild()
+
+
+def _syllabus_changed(sender, **kwargs):
+    _pending.flag = True
+    transaction.on_commit(_rebuild_pending)
+
+
+def connect_signals():
+    for model in SYLLABUS_MODELS:
+        post_save.connect(_syllabus_changed, sender=model, dispatch_uid=f"metadata-{model.__name__}-save")
+        post_delete.connect(_syllabus_changed, sender=model, dispatch_uid=f"metadata-{model.__name__}-delete")
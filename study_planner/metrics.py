@@ -0,0 +1,218 @@
+"""Per-route request metrics, kept in process.
+
+MetricsMiddleware times each request, counts and times its SQL through an
+execute wrapper installed on every connection (so DEBUG can stay off), and
+files the figures in histograms under the route's view name. The wrapper finds
+the request's recorder through a context variable, which asgiref carries into
+the threads that run ORM calls for async views. /api/metrics serves them in the
+Prometheus text format or as JSON. Each worker process keeps its own figures;
+Prometheus sums them per instance.
+
+Requests slower than settings.SLOW_REQUEST_MS are logged to the
+``study_planner.slow_requests`` logger together with their slowest statements.
+
+Streaming responses are timed until the view returns the iterator, and their
+size is not recorded.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from . import plan_cache
+
+logger = logging.getLogger('study_planner.slow_requests')
+
+SLOW_SQL_LIMIT = 10 # statements logged per slow request
+
+# name: (help, upper bounds of the buckets)
+HISTOGRAMS = {
+    "request_duration_seconds": ("Wall time per request", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)),
+    "request_db_queries": ("SQL statements per request", (0, 1, 2, 5, 10, 25, 50, 100, 250)),
+    "request_db_seconds": ("SQL time per request", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)),
+    "response_size_bytes": ("Response body size", (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)),
+}
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total, out = 0, []
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+class RouteStats:
+    __slots__ = ('histograms', 'statuses')
+
+    def __init__(self):
+        self.histograms = {name: Histogram(bounds) for name, (_, bounds) in HISTOGRAMS.items()}
+        self.statuses = {}
+
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record(route, status, seconds, queries, db_seconds, size=None):
+    with _lock:
+        stats = _routes.get(route)
+        if stats is None:
+            stats = _routes[route] = RouteStats()
+        h = stats.histograms
+        h["request_duration_seconds"].observe(seconds)
+        h["request_db_queries"].observe(queries)
+        h["request_db_seconds"].observe(db_seconds)
+        if size is not None:
+            h["response_size_bytes"].observe(size)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def snapshot():
+    """JSON form: per route, request counts by status and each histogram's count, sum and cumulative buckets."""
+    with _lock:
+        routes = {
+            route: {
+                "responses": {str(status): n for status, n in sorted(stats.statuses.items())},
+                **{name: {"count": h.count, "sum": h.sum, "buckets": {str(bound): n for bound, n in h.cumulative()}}
+                   for name, h in stats.histograms.items()},
+            }
+            for route, stats in sorted(_routes.items())
+        }
+    return {"routes": routes, "plan_cache": plan_cache.stats()}
+
+
+def prometheus():
+    """Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        routes = sorted(_routes.items())
+        lines = ["# HELP padsala_responses_total Responses by route and status", "# TYPE padsala_responses_total counter"]
+        for route, stats in routes:
+            for status, n in sorted(stats.statuses.items()):
+                lines.append(f'padsala_responses_total{{route="{route}",status="{status}"}} {n}')
+        for name, (help_text, _) in HISTOGRAMS.items():
+            metric = f"padsala_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for route, stats in routes:
+                h = stats.histograms[name]
+                for bound, n in h.cumulative():
+                    lines.append(f'{metric}_bucket{{route="{route}",le="{bound}"}} {n}')
+                lines.append(f'{metric}_sum{{route="{route}"}} {h.sum}')
+                lines.append(f'{metric}_count{{route="{route}"}} {h.count}')
+    cache = plan_cache.stats()
+    lines += ["# HELP padsala_plan_cache_lookups_total Plan cache lookups by result", "# TYPE padsala_plan_cache_lookups_total counter",
+              f'padsala_plan_cache_lookups_total{{result="hit"}} {cache["hits"]}',
+              f'padsala_plan_cache_lookups_total{{result="miss"}} {cache["misses"]}']
+    return "\n".join(lines) + "\n"
+
+
+class QueryRecorder:
+    """Counts, times and keeps the statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self.statements.append((elapsed, sql))
+
+
+_recorder = ContextVar('metrics_recorder', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None: # management commands, the planner pool, ...
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _connection_created(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def connect_signals():
+    connection_created.connect(_connection_created, dispatch_uid="metrics-connection-created")
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def finish(self, request, response, recorder, elapsed):
+        # view_name, not the path, so the number of series is bounded by urls.py
+        match = request.resolver_match
+        route = match.view_name if match else "<unmatched>"
+        size = None if response.streaming else len(response.content)
+        record(route, response.status_code, elapsed, recorder.count, recorder.seconds, size)
+
+        if elapsed * 1000 >= getattr(settings, 'SLOW_REQUEST_MS', 500):
+            slowest = sorted(recorder.statements, key=lambda s: s[0], reverse=True)[:SLOW_SQL_LIMIT]
+            logger.warning(
+                "slow request %s %s (%s): %.0f ms, %d queries in %.0f ms\n%s",
+                request.method, request.path, route, elapsed * 1000, recorder.count, recorder.seconds * 1000,
+                "\n".join(f"  {s * 1000:8.2f} ms  {sql}" for s, sql in slowest),
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0002_subject_exam_date_studyplan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='day_template',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
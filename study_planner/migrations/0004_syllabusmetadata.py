@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0003_customuser_day_template'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyllabusMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(max_length=64)),
+                ('body', models.BinaryField()),
+                ('body_gzip', models.BinaryField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    TopicMastery = apps.get_model('study_planner', 'TopicMastery')
+    SubjectMastery = apps.get_model('study_planner', 'SubjectMastery')
+    rows = TopicMastery.objects.values('user_id', 'subject').annotate(total=Sum('mastery_score'), topics=Count('id'))
+    SubjectMastery.objects.bulk_create(
+        [SubjectMastery(user_id=r['user_id'], subject=r['subject'], total=r['total'], topics=r['topics']) for r in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0004_syllabusmetadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('total', models.IntegerField(default=0)),
+                ('topics', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_mastery', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'subject'), name='unique_subject_mastery')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0005_subjectmastery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='xp',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
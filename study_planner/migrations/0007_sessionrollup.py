@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill(apps, schema_editor):
+    SessionStats = apps.get_model('study_planner', 'SessionStats')
+    SessionRollup = apps.get_model('study_planner', 'SessionRollup')
+    totals = dict(
+        minutes=Coalesce(Sum('duration_mins'), 0), sessions=Count('id'), focus_total=Sum('focus_score'),
+        distractions=Sum('distraction_count'), idle_seconds=Sum('idle_seconds'), abandoned=Count('id', filter=Q(abandoned=True)),
+    )
+    stats = SessionStats.objects.annotate(day=TruncDate('timestamp'))
+    with_subject = stats.exclude(subject='') # '' is the across-subjects row; such sessions only count there
+    levels = (
+        (with_subject, ('user_id', 'day', 'subject'), {}),
+        (stats, ('user_id', 'day'), {'subject': ''}),
+        (with_subject, ('user_id', 'subject'), {'day': None}),
+    )
+    rows = []
+    for source, group, fixed in levels:
+        for r in source.values(*group).annotate(**totals).order_by():
+            rows.append(SessionRollup(**r, **fixed))
+    SessionRollup.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0006_customuser_xp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, null=True)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('minutes', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+                ('focus_total', models.IntegerField(default=0)),
+                ('distractions', models.IntegerField(default=0)),
+                ('idle_seconds', models.IntegerField(default=0)),
+                ('abandoned', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('day__isnull', False)), fields=('user', 'day', 'subject'), name='unique_daily_rollup'),
+                    models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('user', 'subject'), name='unique_subject_rollup'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0007_sessionrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sessionstats',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+from study_planner.schedules import content_hash, day_count
+
+
+def backfill(apps, schema_editor):
+    SavedSchedule = apps.get_model('study_planner', 'SavedSchedule')
+    SavedSchedule.objects.update(updated_at=F('created_at'))
+    rows = []
+    for s in SavedSchedule.objects.only('data', 'inputs').iterator(chunk_size=200):
+        s.content_hash = content_hash(s.data, s.inputs)
+        s.day_count = day_count(s.data)
+        rows.append(s)
+    SavedSchedule.objects.bulk_update(rows, ['content_hash', 'day_count'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0008_alter_sessionstats_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='savedschedule',
+            name='content_hash',
+            field=models.CharField(default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='savedschedule',
+            name='day_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+import study_planner.fields
+
+
+def pack_rows(apps, schema_editor):
+    SavedSchedule = apps.get_model('study_planner', 'SavedSchedule')
+    rows = []
+    for s in SavedSchedule.objects.only('data').iterator(chunk_size=200):
+        s.packed = s.data
+        rows.append(s)
+    SavedSchedule.objects.bulk_update(rows, ['packed'], batch_size=200)
+
+
+def unpack_rows(apps, schema_editor):
+    SavedSchedule = apps.get_model('study_planner', 'SavedSchedule')
+    rows = []
+    for s in SavedSchedule.objects.only('packed').iterator(chunk_size=200):
+        s.data = s.packed
+        rows.append(s)
+    SavedSchedule.objects.bulk_update(rows, ['data'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0009_savedschedule_sync_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedschedule',
+            name='packed',
+            field=study_planner.fields.CompressedJSONField(null=True),
+        ),
+        # Nullable first, so that reversing can re-add the column to a table with rows
+        migrations.AlterField(
+            model_name='savedschedule',
+            name='data',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(pack_rows, unpack_rows),
+        migrations.RemoveField(
+            model_name='savedschedule',
+            name='data',
+        ),
+        migrations.RenameField(
+            model_name='savedschedule',
+            old_name='packed',
+            new_name='data',
+        ),
+        migrations.AlterField(
+            model_name='savedschedule',
+            name='data',
+            field=study_planner.fields.CompressedJSONField(),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0010_savedschedule_compressed_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedschedule',
+            name='revision',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SavedScheduleDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=64)),
+                ('revision', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_revisions', to='study_planner.savedschedule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['schedule', 'revision'], name='schedule_day_revision_idx')],
+                'constraints': [models.UniqueConstraint(fields=('schedule', 'day'), name='unique_schedule_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 20:05
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def start_sequences(apps, schema_editor):
+    # Schedule revisions now come from the schedules lock's count (see study_planner.schedule_sync):
+    # start each user's count past the revisions their schedules already have
+    SavedSchedule = apps.get_model('study_planner', 'SavedSchedule')
+    UserLock = apps.get_model('study_planner', 'UserLock')
+    latest = SavedSchedule.objects.values('user').annotate(revision=Max('revision')).filter(revision__gt=0)
+    for row in latest.iterator():
+        lock, _ = UserLock.objects.get_or_create(user_id=row['user'], purpose='schedules')
+        if lock.taken < row['revision']:
+            lock.taken = row['revision']
+            lock.save(update_fields=['taken'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0013_userlock'),
+    ]
+
+    operations = [
+        migrations.RunPython(start_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Users' jobs become theirs by owner; older anonymous jobs had no session, so each
+    # becomes its own owner (nobody can poll them any more, but queued ones still run)
+    PlanJob = apps.get_model('study_planner', 'PlanJob')
+    slots = {}
+    rows = []
+    for job in PlanJob.objects.only('user_id', 'status').order_by('created_at').iterator(chunk_size=200):
+        job.owner = f"user:{job.user_id}" if job.user_id is not None else f"job:{job.pk}"
+        if job.status in ('pending', 'running'):
+            job.slot = slots.get(job.owner, 0)
+            slots[job.owner] = job.slot + 1
+        rows.append(job)
+    PlanJob.objects.bulk_update(rows, ['owner', 'slot'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study_planner', '0014_schedule_revision_sequence'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='planjob',
+            name='unique_active_plan_job',
+        ),
+        migrations.AddField(
+            model_name='planjob',
+            name='owner',
+            field=models.CharField(default='', max_length=48),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='planjob',
+            name='slot',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='planjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('owner', 'kind', 'key'), name='unique_active_plan_job'),
+        ),
+        migrations.AddConstraint(
+            model_name='planjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('owner', 'slot'), name='unique_active_plan_job_slot'),
+        ),
+    ]
@@ -1,12 +1,19 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+from .fields import CompressedJSONField
+from .schedules import content_hash, day_count
 
 class CustomUser(AbstractUser):
-    xp = models.IntegerField(default=0)
+    xp = models.IntegerField(default=0, db_index=True)
     streak = models.IntegerField(default=0)
     avatar = models.CharField(max_length=50, default='default')
     is_pro = models.BooleanField(default=False)
     last_study_date = models.DateTimeField(null=True, blank=True)
+    day_template = models.JSONField(null=True, blank=True) # overrides for planner.DEFAULT_DAY_TEMPLATE
 
     def __str__(self):
         return self.username
@@ -38,6 +45,13 @@ class Subject(models.Model):
     is_elective = models.BooleanField(default=False)
     def __str__(self): return self.name
 
+class SyllabusMetadata(models.Model):
+    """Serialized University->Subject tree served by /api/metadata (see study_planner.metadata)."""
+    etag = models.CharField(max_length=64)
+    body = models.BinaryField()
+    body_gzip = models.BinaryField()
+    built_at = models.DateTimeField(auto_now=True)
+
 class Chapter(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='chapters')
     name = models.CharField(max_length=255)
@@ -46,11 +60,76 @@ class Chapter(models.Model):
 class SavedSchedule(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='schedules')
     name = models.CharField(max_length=255)
-    data = models.JSONField()
+    data = CompressedJSONField() # the plan; decoded on first access, so defer() it where unused
     inputs = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=32, default='') # of data and inputs; the per-schedule ETag (see study_planner.schedules)
+    day_count = models.IntegerField(default=0)
+    revision = models.IntegerField(default=0) # bumped by every write (see study_planner.schedule_sync)
     def __str__(self): return f"{self.user.username} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'data', 'inputs'} & set(update_fields): # other updates leave the plan undecoded
+            self.content_hash = content_hash(self.data, self.inputs)
+            self.day_count = day_count(self.data)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash', 'day_count', 'updated_at'}
+        super().save(*args, **kwargs)
+
+class SavedScheduleDay(models.Model):
+    """Revision at which one part of a SavedSchedule last changed (see study_planner.schedule_sync).
+
+    ``day`` is the day's "id", or "@plan" / "@inputs" for the rest of the plan and the inputs.
+    """
+    schedule = models.ForeignKey(SavedSchedule, on_delete=models.CASCADE, related_name='day_revisions')
+    day = models.CharField(max_length=64)
+    revision = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['schedule', 'day'], name='unique_schedule_day')]
+        indexes = [models.Index(fields=['schedule', 'revision'], name='schedule_day_revision_idx')]
+
+class PlanJob(models.Model):
+    """A planning request queued for the run_plan_jobs workers (see study_planner.jobs)."""
+    SCHEDULE, EXAM_PLAN = 'schedule', 'exam_plan' # generate_schedule; api_exam_plan, which also writes StudyPlan rows
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    ACTIVE = (PENDING, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False) # what the client polls with
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='plan_jobs')
+    owner = models.CharField(max_length=48) # the user, or the session of an anonymous one (see jobs.owner)
+    slot = models.SmallIntegerField(default=0) # which of the owner's PLAN_JOB_MAX_ACTIVE places an active job holds
+    kind = models.CharField(max_length=16)
+    key = models.CharField(max_length=80) # the plan_cache key: equal for identical requests
+    payload = models.JSONField() # exams and planner arguments
+    status = models.CharField(max_length=8, default=PENDING)
+    result = CompressedJSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'kind', 'key'], condition=models.Q(status__in=['pending', 'running']), name='unique_active_plan_job'),
+            models.UniqueConstraint(fields=['owner', 'slot'], condition=models.Q(status__in=['pending', 'running']), name='unique_active_plan_job_slot'),
+        ]
+        indexes = [models.Index(fields=['status', 'created_at'], name='plan_job_queue_idx')]
+
+class UserLock(models.Model):
+    """A row writers of one kind of per-user state lock before reading it (see study_planner.locks)."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='locks')
+    purpose = models.CharField(max_length=16)
+    taken = models.IntegerField(default=0) # bumped by every acquire: the write is what takes the lock
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'purpose'], name='unique_user_lock')]
+
 class TopicMastery(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='mastery')
     subject = models.CharField(max_length=255)
@@ -58,6 +137,20 @@ class TopicMastery(models.Model):
     mastery_score = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
+class SubjectMastery(models.Model):
+    """Running sum and count of a user's TopicMastery scores in one subject (see study_planner.mastery)."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='subject_mastery')
+    subject = models.CharField(max_length=255)
+    total = models.IntegerField(default=0)
+    topics = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'subject'], name='unique_subject_mastery')]
+
+    @property
+    def average(self):
+        return self.total / self.topics if self.topics else 0.0
+
 class SessionStats(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='session_stats')
     subject = models.CharField(max_length=255)
@@ -67,7 +160,37 @@ class SessionStats(models.Model):
     distraction_count = models.IntegerField(default=0)
     idle_seconds = models.IntegerField(default=0)
     abandoned = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now) # set by the client for sessions replayed from an offline queue
+
+class SessionRollup(models.Model):
+    """Running totals of a user's SessionStats (see study_planner.rollups).
+
+    One row per (day, subject), one per day across subjects (``subject=''``) and
+    one per subject across all days (``day=None``).
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='session_rollups')
+    day = models.DateField(null=True, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    minutes = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+    focus_total = models.IntegerField(default=0)
+    distractions = models.IntegerField(default=0)
+    idle_seconds = models.IntegerField(default=0)
+    abandoned = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'subject'], condition=models.Q(day__isnull=False), name='unique_daily_rollup'),
+            models.UniqueConstraint(fields=['user', 'subject'], condition=models.Q(day__isnull=True), name='unique_subject_rollup'),
+        ]
+
+    @property
+    def avg_focus(self):
+        return self.focus_total / self.sessions if self.sessions else 0.0
+
+    @property
+    def abandonment_rate(self):
+        return self.abandoned / self.sessions if self.sessions else 0.0
 
 class StudyPlan(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='study_plans')
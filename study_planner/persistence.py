@@ -0,0 +1,62 @@
+"""Writes generated schedules to the StudyPlan table.
+
+The stored plan is diffed against the new one day by day: unchanged days are
+left alone, and changed days are deleted and bulk-inserted again inside one
+transaction. That is one SELECT, at most one DELETE and a few batched INSERTs
+instead of a commit per task.
+"""
+from collections import defaultdict
+from datetime import date as date_cls
+
+from django.db import transaction
+
+from .models import StudyPlan
+
+BATCH_SIZE = 500
+
+
+def _day_rows(day):
+    return [(day["subject"], task["minutes"], task["type"]) for task in day.get("tasks", [])]
+
+
+@transaction.atomic
+def save_study_plan(user, schedule):
+    """Replaces ``user``'s StudyPlan rows with the days of ``schedule``.
+
+    ``is_completed`` is kept for every task that survives: all tasks of an
+    unchanged day, and tasks of a changed day with the same subject, length
+    and type as a task it had before.
+    """
+    existing = defaultdict(list) # date -> [(subject, minutes, type, is_completed)] in insert order
+    for row in (StudyPlan.objects.filter(user=user).order_by('date', 'id')
+                .values_list('date', 'subject', 'duration_mins', 'plan_type', 'is_completed')):
+        existing[row[0]].append(row[1:])
+
+    stale, new_rows = [], []
+    unchanged = 0
+    for day in schedule["days"]:
+        day_date = date_cls.fromisoformat(day["ad_date"])
+        rows = _day_rows(day)
+        old = existing.pop(day_date, [])
+        if [r[:3] for r in old] == rows:
+            unchanged += 1
+            continue
+        if old:
+            stale.append(day_date)
+        completed = defaultdict(list)
+        for subject, minutes, plan_type, is_completed in old:
+            completed[(subject, minutes, plan_type)].append(is_completed)
+        for key in rows:
+            flags = completed.get(key)
+            new_rows.append(StudyPlan(
+                user=user, date=day_date, subject=key[0], duration_mins=key[1], plan_type=key[2],
+                is_completed=flags.pop(0) if flags else False,
+            ))
+    stale.extend(existing) # days no longer in the plan
+
+    deleted = 0
+    if stale:
+        deleted, _ = StudyPlan.objects.filter(user=user, date__in=stale).delete()
+    StudyPlan.objects.bulk_create(new_rows, batch_size=BATCH_SIZE)
+    return {"days_unchanged": unchanged, "days_written": len(schedule["days"]) - unchanged,
+            "rows_deleted": deleted, "rows_created": len(new_rows)}
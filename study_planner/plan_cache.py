@@ -0,0 +1,76 @@
+"""Content-addressed cache of generated schedules.
+
+Entries are keyed on a hash of everything the planner reads: the normalized
+exams, the settings, the planning date and start time, and a stamp of the
+user's mastery averages. Students with identical inputs (and no mastery, or the
+same mastery) therefore share entries. The averages are read from the database
+on every request (one row per subject), so a mastery write changes the user's
+key in every worker process at once, and nothing has to be invalidated.
+
+Values are the zlib-compressed JSON body, so a hit can be sent as-is. Eviction
+(LRU for the local-memory backend), the size bound and the TTL come from the
+``plans`` entry of ``settings.CACHES``.
+"""
+import hashlib
+import json
+import zlib
+
+from django.core.cache import caches
+
+from planner import _effective_start_time, resolve_day_template
+
+
+# Bump when the planner's output changes so old entries are not served
+PLAN_FORMAT = 1
+
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache():
+    return caches['plans']
+
+
+def stats():
+    """Hit/miss counters of this process."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": _stats["hits"] / lookups if lookups else 0.0}
+
+
+def _digest(averages):
+    return hashlib.sha1(repr(sorted(averages.items())).encode()).hexdigest()
+
+
+def mastery_stamp(averages):
+    """Stamp of the per-subject mastery ``averages`` (mastery.subject_averages) the planner uses.
+
+    Anonymous users and users without mastery rows pass ``{}`` and get the same stamp.
+    """
+    return _digest(averages)
+
+
+def plan_key(exams, stamp, now, daily_study_hours, session_mins, break_mins, start_time, revision_ladder=None, day_template=None):
+    # Order is kept: exams sharing a date are planned in the order given
+    normalized = [(ex.get('name'), ex.get('date'), ex.get('chapters'), ex.get('difficulty', 2)) for ex in exams]
+    canonical = json.dumps([
+        PLAN_FORMAT, normalized, stamp, str(now.date()), _effective_start_time(start_time, now),
+        daily_study_hours, session_mins, break_mins, start_time, revision_ladder, resolve_day_template(day_template),
+    ], sort_keys=True, separators=(',', ':'), default=str)
+    return "plan:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get(key):
+    """Cached JSON body for ``key``, or None."""
+    body = _cache().get(key)
+    if body is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return zlib.decompress(body)
+
+
+def set(key, schedule):
+    """Stores a successful schedule and returns its JSON body."""
+    body = json.dumps(schedule).encode()
+    if schedule.get("status") == "success":
+        _cache().set(key, zlib.compress(body))
+    return body
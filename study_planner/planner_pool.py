@@ -0,0 +1,49 @@
+"""Bounded thread pool for CPU-heavy planning.
+
+Under ASGI every sync view runs on asgiref's single sync thread, so a long plan
+would hold up all of them, and calling the planner directly from an async view
+would stall the event loop. The planning views hand their planner calls to
+this pool instead. At most settings.PLANNER_WORKERS plans run at once, and
+further requests wait in the pool's queue without holding a worker.
+
+Pool threads only run planner code and never touch the ORM: the views load
+chapters, mastery and cache entries themselves before submitting. The pool
+uses threads, not processes, because the replan traces in views._PLAN_TRACES
+must stay in this process. The GIL still limits plans to one core per process,
+so add processes (workers) to plan faster; the pool only keeps planning off the
+event loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+
+_pool = ThreadPoolExecutor(max_workers=getattr(settings, 'PLANNER_WORKERS', 4), thread_name_prefix='planner')
+
+
+async def run(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_pool, partial(fn, *args, **kwargs))
+
+
+async def stream(iterator):
+    """Async iterator over a sync one whose steps are CPU-bound (a streamed plan), one pool call per item."""
+    loop = asyncio.get_running_loop()
+    done = object()
+    step = None
+    try:
+        while True:
+            # Shielded: a disconnect must not mark the step finished while its thread still runs it
+            step = loop.run_in_executor(_pool, next, iterator, done)
+            item = await asyncio.shield(step)
+            if item is done:
+                return
+            yield item
+    finally:
+        # Client went away: close the plan generator so it marks its trace partial.
+        # If a pool thread is still inside next(), closing it now would raise
+        # "generator already executing", so close it as soon as that step ends.
+        if step is not None and not step.done():
+            step.add_done_callback(lambda _: _pool.submit(iterator.close))
+        else:
+            iterator.close()
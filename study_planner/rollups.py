@@ -0,0 +1,105 @@
+"""Per-user SessionStats rollups and the analytics served from them.
+
+record_sessions adds each new session to three SessionRollup rows: its day and
+subject, its day across subjects, and its subject across all days. Analytics
+then read at most BURNOUT_WINDOW day rows plus one row per subject, however
+long the user's history is.
+"""
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SessionRollup, TopicMastery
+
+BURNOUT_WINDOW = 14 # days
+
+
+def _bump(user_id, day, subject, deltas):
+    rows = SessionRollup.objects.filter(user_id=user_id, day=day, subject=subject)
+    if not rows.update(**deltas):
+        SessionRollup.objects.get_or_create(user_id=user_id, day=day, subject=subject)
+        rows.update(**deltas)
+
+
+_FIELDS = ('minutes', 'sessions', 'focus_total', 'distractions', 'idle_seconds', 'abandoned')
+
+
+def record_sessions(sessions):
+    """Adds saved SessionStats rows to their rollups; call inside the transaction that created them.
+
+    Sessions sharing a rollup row are summed first, so each row is written once
+    per batch.
+    """
+    totals = {}
+    for s in sessions:
+        if not s.subject: # '' is the across-subjects row
+            raise ValueError("sessions need a subject")
+        day = timezone.localdate(s.timestamp)
+        values = (s.duration_mins or 0, 1, s.focus_score, s.distraction_count, s.idle_seconds, int(s.abandoned))
+        for key in ((s.user_id, day, s.subject), (s.user_id, day, ''), (s.user_id, None, s.subject)):
+            old = totals.get(key)
+            totals[key] = values if old is None else tuple(a + b for a, b in zip(old, values))
+    for (user_id, day, subject), values in totals.items():
+        _bump(user_id, day, subject, {field: F(field) + value for field, value in zip(_FIELDS, values)})
+
+
+def record_session(session):
+    record_sessions([session])
+
+
+def _clamp(x):
+    return min(1.0, max(0.0, x))
+
+
+def burnout_score(days, baseline_focus):
+    """0-100 risk from the day rollups of the last BURNOUT_WINDOW days.
+
+    Weighs sustained load (over 4 h/day, saturating at 10 h), focus below the
+    user's own baseline and below 70, abandoned sessions, and distractions
+    per session (saturating at 10).
+    """
+    sessions = sum(d.sessions for d in days)
+    if not sessions:
+        return 0
+    focus = sum(d.focus_total for d in days) / sessions
+    load = _clamp((sum(d.minutes for d in days) / BURNOUT_WINDOW - 240) / 360)
+    focus_drop = _clamp((baseline_focus - focus) / 30)
+    low_focus = _clamp((70 - focus) / 40)
+    abandonment = sum(d.abandoned for d in days) / sessions
+    distraction = _clamp(sum(d.distractions for d in days) / sessions / 10)
+    return round(100 * (0.3 * load + 0.2 * focus_drop + 0.15 * low_focus + 0.2 * abandonment + 0.15 * distraction))
+
+
+def burnout_level(score):
+    return "HIGH" if score >= 60 else ("MED" if score >= 30 else "LOW")
+
+
+def _totals(row):
+    return {"minutes": row.minutes, "sessions": row.sessions, "avg_focus": row.avg_focus, "distractions": row.distractions,
+            "idle_seconds": row.idle_seconds, "abandonment_rate": row.abandonment_rate}
+
+
+def analytics(user, today=None):
+    """Payload for get_analytics_v17."""
+    today = today or timezone.localdate()
+    days = list(SessionRollup.objects.filter(user=user, subject='', day__gt=today - timedelta(days=BURNOUT_WINDOW)).order_by('day'))
+    subjects = list(SessionRollup.objects.filter(user=user, day__isnull=True).order_by('subject'))
+
+    sessions = sum(s.sessions for s in subjects)
+    avg_focus = sum(s.focus_total for s in subjects) / sessions if sessions else 0
+    score = burnout_score(days, avg_focus)
+
+    # Heatmap: current topic scores, one row per topic studied (bounded by the syllabus, not by history)
+    mastery = {}
+    for subject, topic, topic_score in TopicMastery.objects.filter(user=user).order_by('subject', 'topic').values_list('subject', 'topic', 'mastery_score'):
+        mastery.setdefault(subject, {})[topic] = topic_score
+
+    return {
+        "avg_focus": avg_focus,
+        "burnout_risk": burnout_level(score),
+        "burnout_score": score,
+        "days": {str(d.day): _totals(d) for d in days},
+        "subjects": {s.subject: _totals(s) for s in subjects},
+        "mastery": mastery,
+    }
@@ -0,0 +1,187 @@
+"""Revision-based sync of saved schedules between devices.
+
+Every write gives the schedule a new revision and records, per part of the
+schedule, the revision that last changed it (SavedScheduleDay). Revisions come
+from a per-user sequence (locks.taken), not a per-schedule counter, so a
+schedule deleted and saved again under the same name never reuses one: a
+revision held from before the deletion is older than every part of the new
+schedule, and is answered with the whole schedule instead of a delta. The parts are
+the days, keyed by their "id", the plan's other keys as PLAN and the inputs as
+INPUTS. A client that holds revision R:
+
+- pulls what changed since with ``GET /api/sync/schedules/<name>?since=R``
+  (``changes_since``): one entry per changed part, None for deleted days;
+- pushes only the days it edited with ``POST /api/sync/patch`` (``patch``),
+  naming R as the base. A patched part that changed on the server after R is a
+  conflict: it is left alone and the server's version is returned for the
+  client to take or re-send. The rest of the patch is applied.
+
+Full saves (``save``) diff the new plan against the stored one, so the other
+devices still receive only the days that differ, and with a ``base`` they
+refuse to overwrite a newer revision instead of losing its edits.
+
+What is sent and compared grows with the edit. The stored plan itself is one
+compressed value (see fields.py), so a write still decodes and re-encodes it.
+"""
+from bisect import bisect_right
+
+from django.db import transaction
+from django.db.models import Min
+
+from . import locks
+from .models import SavedSchedule, SavedScheduleDay
+
+PLAN = '@plan'
+INPUTS = '@inputs'
+
+_UNCHANGED = object()
+
+
+def parts(data, inputs):
+    """``{key: value}`` of a plan's days, its other keys and the inputs; ValueError for anything else."""
+    if not isinstance(data, dict) or not isinstance(data.get('days'), list):
+        raise ValueError("only plans with days can be synced by day")
+    out = {PLAN: {k: v for k, v in data.items() if k != 'days'}, INPUTS: inputs}
+    for day in data['days']:
+        key = day.get('id') if isinstance(day, dict) else None
+        if not isinstance(key, str) or key.startswith('@') or key in out:
+            raise ValueError("every day needs a unique id to be synced by day")
+        out[key] = day
+    return out
+
+
+def _merge_days(days, edits):
+    """``days`` with ``edits`` ({id: day or None}) applied; new days go in date order."""
+    out = [edits.get(day['id'], day) for day in days]
+    out = [day for day in out if day is not None]
+    present = {day['id'] for day in out}
+    for key, day in edits.items():
+        if day is None or key in present:
+            continue
+        if day.get('ad_date'):
+            out.insert(bisect_right([d.get('ad_date') or '' for d in out], day['ad_date']), day)
+        else:
+            out.append(day)
+    return out
+
+
+def _record(schedule, changed):
+    """Marks ``changed`` ({key: deleted}) as changed at the schedule's current revision."""
+    SavedScheduleDay.objects.bulk_create(
+        [SavedScheduleDay(schedule=schedule, day=key, revision=schedule.revision, deleted=deleted) for key, deleted in changed.items()],
+        update_conflicts=True, unique_fields=['schedule', 'day'], update_fields=['revision', 'deleted'],
+    )
+
+
+def _next_revision(user):
+    """Takes the user's schedule lock and returns the revision for the write it guards."""
+    locks.acquire(user, locks.SCHEDULES) # the revision read by the caller is still current when written back
+    return locks.taken(user, locks.SCHEDULES)
+
+
+def _check_revision(schedule, revision):
+    """ValueError unless ``revision`` can be one of this schedule's: not newer than it, nor older than all its parts."""
+    oldest = schedule.day_revisions.aggregate(oldest=Min('revision'))['oldest']
+    if revision > schedule.revision or revision < (schedule.revision if oldest is None else oldest):
+        raise ValueError(f"revision {revision} is not one of this schedule's; fetch it whole")
+
+
+def _live_keys(schedule):
+    return set(schedule.day_revisions.filter(deleted=False).values_list('day', flat=True))
+
+
+@transaction.atomic
+def save(user, name, data, inputs, base=None):
+    """Stores a whole schedule. Returns ``(schedule, saved)``.
+
+    With ``base``, a schedule whose revision is not ``base`` is left as it is
+    and ``saved`` is False.
+    """
+    revision = _next_revision(user)
+    schedule = SavedSchedule.objects.filter(user=user, name=name).first()
+    if schedule is None:
+        schedule, old = SavedSchedule(user=user, name=name), {}
+    elif base is not None and base != schedule.revision:
+        return schedule, False
+    else:
+        try:
+            old = parts(schedule.data, schedule.inputs)
+        except ValueError:
+            old = {}
+    try:
+        new = parts(data, inputs)
+    except ValueError: # not a plan: the whole value counts as changed
+        new = {PLAN: data, INPUTS: inputs}
+
+    changed = {key: False for key, value in new.items() if key not in old or old[key] != value}
+    if schedule.pk:
+        changed.update({key: True for key in (old.keys() | _live_keys(schedule)) - new.keys()})
+    schedule.data, schedule.inputs = data, inputs
+    schedule.revision = revision
+    schedule.save()
+    _record(schedule, changed)
+    return schedule, True
+
+
+@transaction.atomic
+def patch(user, name, base, days, inputs=_UNCHANGED):
+    """Applies ``days`` ({id: day, or None to delete}) and optionally new ``inputs`` on top of revision ``base``.
+
+    Returns the new revision and hash, the keys applied, the conflicting parts
+    with the server's values, and the other parts changed since ``base``.
+    Raises SavedSchedule.DoesNotExist, or ValueError for a malformed patch, a
+    schedule that is not a plan, or a ``base`` that is not one of its revisions
+    (e.g. from before it was deleted and saved again).
+    """
+    revision = _next_revision(user)
+    schedule = SavedSchedule.objects.get(user=user, name=name)
+    _check_revision(schedule, base)
+    current = parts(schedule.data, schedule.inputs)
+    for key, day in days.items():
+        if key.startswith('@') or (day is not None and (not isinstance(day, dict) or day.get('id') != key)):
+            raise ValueError(f"bad patch for day {key!r}")
+    edits = dict(days)
+    if inputs is not _UNCHANGED:
+        edits[INPUTS] = inputs
+
+    newer = set(schedule.day_revisions.filter(revision__gt=base).values_list('day', flat=True))
+    conflicts, applied = {}, {}
+    for key, value in edits.items():
+        if current.get(key) == value: # the same edit reached the server another way
+            continue
+        if key in newer:
+            conflicts[key] = current.get(key)
+        else:
+            applied[key] = value
+    changes = {key: current.get(key) for key in newer - edits.keys()}
+
+    if applied:
+        day_edits = {key: value for key, value in applied.items() if key != INPUTS}
+        if day_edits:
+            schedule.data = {k: (_merge_days(v, day_edits) if k == 'days' else v) for k, v in schedule.data.items()}
+        if INPUTS in applied:
+            schedule.inputs = applied[INPUTS]
+        schedule.revision = revision
+        schedule.save()
+        _record(schedule, {key: value is None for key, value in applied.items()})
+    return {
+        "revision": schedule.revision,
+        "hash": schedule.content_hash,
+        "applied": sorted(applied),
+        "conflicts": conflicts,
+        "changes": changes,
+    }
+
+
+def changes_since(schedule, since):
+    """``{key: value}`` of the parts changed after revision ``since``, None for deleted days.
+
+    Raises ValueError if the schedule is not a plan or ``since`` is not one of
+    its revisions; send it whole instead.
+    """
+    _check_revision(schedule, since)
+    rows = list(schedule.day_revisions.filter(revision__gt=since).values_list('day', 'deleted'))
+    if not rows:
+        return {}
+    current = parts(schedule.data, schedule.inputs)
+    return {key: None if deleted else current.get(key) for key, deleted in rows}
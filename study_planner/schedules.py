@@ -0,0 +1,23 @@
+"""Saved-schedule sync: a cheap listing, then one fetch per changed schedule.
+
+``GET /api/sync/schedules`` lists each schedule's name, times, content hash and
+day count. Clients keep their copies with the hash they were fetched at and
+``GET /api/sync/schedules/<name>`` only for the ones whose hash changed; that
+response carries the hash as its ETag, so a revalidation costs a 304.
+
+SavedSchedule.save() keeps ``content_hash`` and ``day_count`` in step with the
+data, so every write path (the API, the admin) updates them.
+"""
+import hashlib
+import json
+
+
+def content_hash(data, inputs):
+    canonical = json.dumps([data, inputs], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def day_count(data):
+    days = data.get('days') if isinstance(data, dict) else None
+    return len(days) if isinstance(days, list) else 0
+
@@ -1,3 +1,591 @@
-from django.test import TestCase
+import itertools
+import json
+import threading
+import unittest
+from unittest import mock
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from planner import PlanTrace, generate_study_plan, replan_study_plan, validate_day_template
+
+from . import benchmarks, chapter_index, fields, jobs, leaderboard, schedule_sync, views, wire
+from .persistence import save_study_plan
+from .models import (Chapter, Course, CustomUser, Faculty, PlanJob, SavedSchedule, Semester, SessionRollup, SessionStats,
+                     StudyPlan, Subject, SubjectMastery, TopicMastery, University)
+
+
+class ChapterInjectionTests(TestCase):
+    def setUp(self):
+        caches['plans'].clear()
+        chapter_index.invalidate()
+        uni = University.objects.create(name="PU")
+        course = Course.objects.create(faculty=Faculty.objects.create(university=uni, name="Engineering"), name="BE")
+        sem = Semester.objects.create(course=course, name="1st Sem")
+        self.subjects = []
+        for i in range(6):
+            sub = Subject.objects.create(semester=sem, name=f"Subject {i}")
+            Chapter.objects.bulk_create([Chapter(subject=sub, name=f"S{i} Chapter {j}") for j in range(4)])
+            self.subjects.append(sub)
+
+    def post(self, exams):
+        body = json.dumps({"exams": exams, "daily_hours": 4, "session_mins": 60, "break_mins": 10})
+        return self.client.post('/api/generate-schedule', body, content_type='application/json')
+
+    def exams(self, count):
+        return [{"name": f"Subject {i}", "date": f"2090-01-{10 + i:02d}", "difficulty": 2} for i in range(count)]
+
+    def test_one_query_for_any_number_of_exams(self):
+        with self.assertNumQueries(1):
+            response = self.post(self.exams(6))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.post(self.exams(3))
+
+    def test_injected_chapters(self):
+        days = self.post(self.exams(1) + [{"name": "Unknown", "date": "2090-01-20"}]).json()["days"]
+        activities = " ".join(task["activity"] for day in days for task in day["tasks"])
+        self.assertIn("S0 Chapter 0", activities)
+        self.assertIn("Introduction", activities)
+
+    def test_index_refreshes_on_chapter_change(self):
+        self.assertEqual(chapter_index.chapters_for("Subject 0")[0], "S0 Chapter 0")
+        with self.captureOnCommitCallbacks(execute=True):
+            Chapter.objects.filter(subject=self.subjects[0]).delete()
+            Chapter.objects.create(subject=self.subjects[0], name="Rewritten")
+        with self.assertNumQueries(1):
+            self.assertEqual(chapter_index.chapters_for("Subject 0"), ["Rewritten"])
+
+
+class SessionIngestionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+
+    def client_for_user(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def post_batch(self, client, sessions):
+        return client.post('/api/v17/log-sessions', json.dumps({"sessions": sessions}), content_type='application/json')
+
+    def test_concurrent_posts_lose_no_updates(self):
+        clients = [self.client_for_user() for _ in range(8)]
+        session = {"subject": "Physics", "topic": "Optics", "duration_mins": 25, "focus_score": 60} # +2 mastery each
+        barrier = threading.Barrier(len(clients))
+        errors = []
+
+        def worker(client, single):
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    if single:
+                        response = client.post('/api/v17/log-session', json.dumps(session), content_type='application/json')
+                    else:
+                        response = self.post_batch(client, [session])
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(client, i % 2)) for i, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(TopicMastery.objects.get(user=self.user, subject="Physics", topic="Optics").mastery_score, 80)
+        aggregate = SubjectMastery.objects.get(user=self.user, subject="Physics")
+        self.assertEqual((aggregate.total, aggregate.topics), (80, 1))
+        self.assertEqual(SessionStats.objects.filter(user=self.user).count(), 40)
+        self.assertEqual(SessionRollup.objects.get(user=self.user, day=None, subject="Physics").sessions, 40)
+
+    def test_batch_clamps_in_session_order(self):
+        client = self.client_for_user()
+        sessions = [{"subject": "Maths", "topic": "Limits", "focus_score": 95, "timestamp": f"2026-01-01T10:{i:02d}:00"} for i in range(25)]
+        response = self.post_batch(client, sessions)
+        self.assertEqual(response.json(), {"success": True, "logged": 25, "mastery": {"Maths": {"Limits": 100}}})
+        self.assertEqual(SubjectMastery.objects.get(user=self.user, subject="Maths").total, 100)
+        self.assertEqual(SessionRollup.objects.get(user=self.user, subject="", day__isnull=False).sessions, 25)
+
+    def test_invalid_batch_writes_nothing(self):
+        response = self.post_batch(self.client_for_user(), [{"subject": "Maths", "topic": "Limits"}, {"subject": "Maths"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SessionStats.objects.exists())
+        self.assertFalse(TopicMastery.objects.exists())
+
+
+class PlannerBenchmarkTests(SimpleTestCase):
+    def fake_clock(self, step):
+        ticks = itertools.count()
+        return lambda: next(ticks) * step
+
+    def test_fake_clock_makes_timings_deterministic(self):
+        suite = {"chunks": benchmarks.workloads()["chunks/30min"]}
+        first = benchmarks.run(suite, repeat=3, clock=self.fake_clock(0.002))
+        self.assertEqual(first, benchmarks.run(suite, repeat=3, clock=self.fake_clock(0.002)))
+        self.assertEqual(first["chunks"]["ms"], 2.0)
+
+    def test_gate_flags_only_growth_past_threshold(self):
+        suite = {"chunks": benchmarks.workloads()["chunks/30min"]}
+        baseline = {"workloads": benchmarks.run(suite, repeat=1, clock=self.fake_clock(0.002))}
+        same = benchmarks.run(suite, repeat=1, clock=self.fake_clock(0.0025))
+        slower = benchmarks.run(suite, repeat=1, clock=self.fake_clock(0.005))
+        self.assertEqual(benchmarks.regressions(same, baseline), [])
+        self.assertEqual(benchmarks.regressions(slower, baseline), [("chunks", "ms", 2.0, 5.0)])
+        self.assertEqual(benchmarks.regressions({"new": slower["chunks"]}, baseline), [])
+
+    def test_workloads_plan_the_same_days_every_run(self):
+        workload = benchmarks.workloads()["purbanchal/semester-1"]
+        self.assertEqual(workload(), workload())
+
+    @unittest.skipUnless(benchmarks.load_baseline()["python"] == benchmarks.python_version(), "baseline recorded on another Python")
+    def test_planner_memory_within_baseline(self):
+        results = benchmarks.run(repeat=1, clock=self.fake_clock(0))
+        self.assertEqual(benchmarks.regressions(results, benchmarks.load_baseline(), metrics=("allocations", "peak_kb")), [])
+
+
+class WireFormatTests(TestCase):
+    def plan(self):
+        exams = [{"name": "Maths", "date": "2026-10-25", "difficulty": 2}, {"name": "Physics", "date": "2026-10-28"}]
+        return generate_study_plan(exams, daily_study_hours=2.3, session_mins=37.5, break_mins=7.5, now=datetime(2026, 10, 18, 5))
+
+    def test_round_trip_with_fractional_minutes(self):
+        plan = self.plan()
+        encoded = json.loads(json.dumps(wire.encode(plan)))
+        self.assertTrue(encoded["tasks"]["ends"]) # ranges that do not end at start + whole minutes
+        self.assertEqual(wire.decode(encoded), plan)
+
+    def test_plan_it_cannot_rebuild_is_refused(self):
+        plan = self.plan()
+        plan["days"][0]["tasks"][0]["time"] = "6am - 7am"
+        with self.assertRaises(ValueError):
+            wire.encode(plan)
+        plan = self.plan()
+        plan["days"][0]["note"] = "edited"
+        with self.assertRaises(ValueError):
+            wire.encode(plan)
+
+    def test_saved_plan_falls_back_to_plain_json(self):
+        self.client.force_login(CustomUser.objects.create_user("learner", "learner@example.com", "pw"))
+        plans = {"compact": self.plan(), "plain": self.plan()}
+        plans["plain"]["days"][0]["tasks"][0]["time"] = "6am - 7am"
+        for name, plan in plans.items():
+            self.client.post('/api/sync/save', json.dumps({"name": name, "data": plan, "inputs": None}), content_type='application/json')
+        compact = self.client.get('/api/sync/schedules/compact?format=compact').json()
+        self.assertEqual(wire.decode(compact["compact"]), plans["compact"])
+        plain = self.client.get('/api/sync/schedules/plain?format=compact').json()
+        self.assertNotIn("compact", plain)
+        self.assertEqual(plain["data"], plans["plain"])
+
+
+class ScheduleSyncTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def plan(self, days, tag):
+        return {"status": "success", "days": [self.day(i, tag) for i in range(days)]}
+
+    def day(self, i, tag):
+        return {"id": f"day-{i}", "ad_date": f"2026-11-{i + 1:02d}", "tasks": [tag]}
+
+    def test_patch_conflict_keeps_the_newer_day(self):
+        schedule, _ = schedule_sync.save(self.user, "p", self.plan(3, "old"), None)
+        base = schedule.revision
+        first = schedule_sync.patch(self.user, "p", base, {"day-0": self.day(0, "a")})
+        second = schedule_sync.patch(self.user, "p", base, {"day-0": self.day(0, "b"), "day-1": self.day(1, "b")})
+        self.assertEqual(second["applied"], ["day-1"])
+        self.assertEqual(second["conflicts"], {"day-0": self.day(0, "a")})
+        self.assertGreater(second["revision"], first["revision"])
+        schedule.refresh_from_db()
+        self.assertEqual([day["tasks"] for day in schedule.data["days"]], [["a"], ["b"], ["old"]])
+        self.assertEqual(schedule_sync.changes_since(schedule, first["revision"]), {"day-1": self.day(1, "b")})
+
+    def test_deleted_days_are_sent_as_none(self):
+        schedule, _ = schedule_sync.save(self.user, "p", self.plan(3, "old"), None)
+        base = schedule.revision
+        schedule_sync.patch(self.user, "p", base, {"day-1": None})
+        schedule.refresh_from_db()
+        self.assertEqual(schedule_sync.changes_since(schedule, base), {"day-1": None})
+        schedule_sync.save(self.user, "p", self.plan(1, "old"), None)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule_sync.changes_since(schedule, base), {"day-1": None, "day-2": None})
+
+    def test_since_from_before_delete_and_resave_sends_the_whole_plan(self):
+        old, _ = schedule_sync.save(self.user, "p", self.plan(3, "p1"), {"hours": 4})
+        old.delete()
+        schedule_sync.save(self.user, "p", self.plan(2, "p2"), None)
+        patched = schedule_sync.patch(self.user, "p", SavedSchedule.objects.get(name="p").revision, {"day-0": self.day(0, "edit")})
+        body = self.client.get(f'/api/sync/schedules/p?since={old.revision}').json()
+        self.assertNotIn("changes", body)
+        self.assertEqual(body["data"], SavedSchedule.objects.get(name="p").data)
+        self.assertEqual(body["hash"], patched["hash"])
+        for base in (old.revision, patched["revision"] + 1):
+            response = self.client.post('/api/sync/patch', json.dumps({"name": "p", "base": base, "days": {}}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_stale_full_save_is_refused(self):
+        schedule, _ = schedule_sync.save(self.user, "p", self.plan(2, "old"), None)
+        schedule_sync.patch(self.user, "p", schedule.revision, {"day-0": self.day(0, "new")})
+        response = self.client.post('/api/sync/save', json.dumps({"name": "p", "data": self.plan(2, "stale"), "base": schedule.revision}), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SavedSchedule.objects.get(name="p").data["days"][0]["tasks"], ["new"])
+
+
+@override_settings(PLAN_JOB_MAX_ACTIVE=2, PLAN_JOB_LEASE=60)
+class PlanJobTests(TestCase):
+    def setUp(self):
+        caches['plans'].clear()
+
+    def submit(self, client, hours=4):
+        exams = [{"name": "Maths", "date": str(date.today() + timedelta(days=7))}]
+        return client.post('/api/jobs', json.dumps({"exams": exams, "daily_hours": hours}), content_type='application/json')
+
+    def test_identical_submit_is_deduplicated(self):
+        first = self.submit(self.client).json()
+        second = self.submit(self.client).json()
+        self.assertEqual(second["id"], first["id"])
+        self.assertTrue(second["deduplicated"])
+        self.assertEqual(PlanJob.objects.count(), 1)
+
+    def test_active_jobs_are_capped_per_visitor(self):
+        self.assertEqual([self.submit(self.client, hours).status_code for hours in (3, 4, 5)], [202, 202, 429])
+        other = Client()
+        job = self.submit(other).json()
+        self.assertEqual(self.client.get(f'/api/jobs/{job["id"]}').status_code, 404)
+        self.assertEqual(other.get(f'/api/jobs/{job["id"]}').json()["status"], "pending")
+        jobs.run(jobs.claim("test"))
+        self.assertEqual(self.submit(self.client, 5).status_code, 202) # a finished job frees its slot
+
+    def test_claim_runs_oldest_first(self):
+        ids = [self.submit(self.client, hours).json()["id"] for hours in (3, 4)]
+        job = jobs.claim("test")
+        self.assertEqual((str(job.pk), job.status, job.attempts, job.worker), (ids[0], PlanJob.RUNNING, 1, "test"))
+        jobs.run(job)
+        self.assertEqual(str(jobs.claim("test").pk), ids[1])
+        self.assertIsNone(jobs.claim("test"))
+        response = self.client.get(f'/api/jobs/{ids[0]}/result')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "success")
+
+    def test_expired_lease_is_run_again_then_given_up(self):
+        job_id = self.submit(self.client).json()["id"]
+        jobs.claim("dead")
+        self.assertIsNone(jobs.claim("test"))
+        PlanJob.objects.filter(pk=job_id).update(started_at=timezone.now() - timedelta(seconds=61))
+        job = jobs.claim("test")
+        self.assertEqual((str(job.pk), job.attempts), (job_id, 2))
+        PlanJob.objects.filter(pk=job_id).update(attempts=jobs.MAX_ATTEMPTS, started_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(jobs.claim("test"))
+        self.assertEqual(PlanJob.objects.get(pk=job_id).status, PlanJob.FAILED)
+        jobs.run(job) # the first reclaim finishing late no longer counts
+        self.assertEqual(PlanJob.objects.get(pk=job_id).status, PlanJob.FAILED)
+
+
+class StreamedPlanTests(TestCase):
+    def test_trace_stays_checked_out_while_streaming(self):
+        caches['plans'].clear()
+        user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        self.client.force_login(user)
+        exams = [{"name": "Maths", "date": str(date.today() + timedelta(days=5))}]
+        response = self.client.post('/api/generate-schedule', json.dumps({"exams": exams}), content_type='application/json',
+                                    HTTP_ACCEPT='application/x-ndjson')
+        lines = iter(response.streaming_content)
+        next(lines)
+        self.assertNotIn(user.id, views._PLAN_TRACES) # a concurrent request must not plan from it meanwhile
+        rest = list(lines)
+        self.assertTrue(rest)
+        self.assertIn(user.id, views._PLAN_TRACES)
+
+
+class DayTemplateTests(TestCase):
+    def test_plan_with_unusable_template_is_refused(self):
+        exams = [{"name": "Maths", "date": str(date.today() + timedelta(days=5))}]
+        template = {"meals": [{"start": "noon", "minutes": 60, "activity": "Lunch"}]}
+        for path in ('/api/generate-schedule', '/api/jobs'):
+            response = self.client.post(path, json.dumps({"exams": exams, "day_template": template}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("meal", response.json()["error"])
+        self.assertFalse(PlanJob.objects.exists())
+
+    def test_overlapping_blocks_are_rejected(self):
+        meal = {"start": "12:30", "minutes": 60, "activity": "Lunch"}
+        for template in (
+            {"meals": [meal, {"start": "13:00", "minutes": 30, "activity": "Tea"}]},
+            {"meals": [{"start": "23:30", "minutes": 45, "activity": "Late dinner"}]},
+            {"exam_start": "00:30"}, # no room for the polish before it
+            {"exam_start": "22:00"}, # nor for the exam and recovery after
+        ):
+            with self.assertRaises(ValueError):
+                validate_day_template(template)
+        validate_day_template({"meals": [meal, {"start": "13:30", "minutes": 30, "activity": "Tea"}], "exam_start": "10:00"})
+
+    def test_meals_and_exam_land_at_their_fixed_times(self):
+        template = {"meals": [{"start": "12:30", "minutes": 40, "activity": "Lunch"}], "exam_start": "10:00"}
+        plan = generate_study_plan([{"name": "Maths", "date": "2026-10-21"}], daily_study_hours=6, now=datetime(2026, 10, 18, 5),
+                                   day_template=template)
+        for day in plan["days"]:
+            fixed = [(task["time"], task["type"]) for task in day["tasks"] if task["type"] in ("meal", "exam")]
+            self.assertEqual(fixed, [("10:00 - 13:00", "exam")] if day["is_exam_day"] else [("12:30 - 13:10", "meal")])
+
+
+class DataMigrationTests(TransactionTestCase):
+    def migrate(self, target=None):
+        """Migrates study_planner to ``target`` (the latest if None) and returns the models as of there."""
+        executor = MigrationExecutor(connection)
+        targets = [('study_planner', target)] if target else executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate()
+
+    def test_rollup_backfill_with_sessions_without_subject(self):
+        apps = self.migrate('0006_customuser_xp_index')
+        user = apps.get_model('study_planner', 'CustomUser').objects.create(username="learner")
+        stats = apps.get_model('study_planner', 'SessionStats')
+        for subject in ("Maths", "", "Maths"):
+            stats.objects.create(user=user, subject=subject, topic="Limits", duration_mins=30, focus_score=80)
+        rollups = self.migrate('0007_sessionrollup').get_model('study_planner', 'SessionRollup')
+        totals = {(r.day is None, r.subject): (r.sessions, r.minutes) for r in rollups.objects.all()}
+        self.assertEqual(totals, {(False, "Maths"): (2, 60), (False, ""): (3, 90), (True, "Maths"): (2, 60)})
+
+    def test_schedule_data_packed_from_plain_json(self):
+        plan = generate_study_plan([{"name": "Maths", "date": "2026-10-28"}], daily_study_hours=6, now=datetime(2026, 10, 18, 5))
+        apps = self.migrate('0009_savedschedule_sync_fields')
+        user = apps.get_model('study_planner', 'CustomUser').objects.create(username="learner")
+        schedules = apps.get_model('study_planner', 'SavedSchedule')
+        schedules.objects.create(user=user, name="plan", data=plan)
+        schedules.objects.create(user=user, name="notes", data={"note": "not a plan"})
+        schedules = self.migrate('0010_savedschedule_compressed_data').get_model('study_planner', 'SavedSchedule')
+        stored = dict(schedules.objects.values_list('name', 'data'))
+        self.assertEqual(stored["plan"][:1], b'W') # in the wire format
+        self.assertEqual(stored["notes"][:1], b'J')
+        self.assertEqual({s.name: s.data for s in schedules.objects.all()}, {"plan": plan, "notes": {"note": "not a plan"}})
+
+
+class ReplanTests(SimpleTestCase):
+    NOW = datetime(2026, 10, 18, 5)
+    EXAMS = [
+        {"name": "Maths", "date": "2026-10-28", "difficulty": 2},
+        {"name": "Physics", "date": "2026-11-02"},
+        {"name": "Chemistry", "date": "2026-11-07", "difficulty": 3},
+    ]
+
+    def assert_replans_only_changed_days(self, exams, **kwargs):
+        trace = PlanTrace()
+        before = replan_study_plan(trace, self.EXAMS, daily_study_hours=6, now=self.NOW)
+        after = replan_study_plan(trace, exams, daily_study_hours=6, now=self.NOW, **kwargs)
+        self.assertEqual(after, generate_study_plan(exams, daily_study_hours=6, now=self.NOW, **kwargs))
+        kept = 0 # days both plans start with
+        while kept < min(len(before["days"]), len(after["days"])) and before["days"][kept] == after["days"][kept]:
+            kept += 1
+        self.assertGreater(kept, 0)
+        self.assertEqual(trace.days_replanned, len(after["days"]) - kept) # the unchanged days were reused
+
+    def test_exam_date_moved(self):
+        exams = [dict(exam) for exam in self.EXAMS]
+        exams[2]["date"] = "2026-11-09"
+        self.assert_replans_only_changed_days(exams)
+
+    def test_mastery_changed(self):
+        self.assert_replans_only_changed_days(self.EXAMS, subject_mastery={"Physics": 60})
+
+    def test_exam_added(self):
+        self.assert_replans_only_changed_days(self.EXAMS + [{"name": "Biology", "date": "2026-11-05"}])
+
+
+class MetadataConditionalGetTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            uni = University.objects.create(name="PU")
+            course = Course.objects.create(faculty=Faculty.objects.create(university=uni, name="Engineering"), name="BE")
+            self.semester = Semester.objects.create(course=course, name="1st Sem")
+            Subject.objects.create(semester=self.semester, name="Physics")
+
+    def test_unchanged_syllabus_costs_a_304(self):
+        first = self.client.get('/api/metadata')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Physics", first.json()["PU"]["Engineering"]["BE"]["1st Sem"])
+        again = self.client.get('/api/metadata', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+    def test_changed_syllabus_gets_a_new_etag(self):
+        etag = self.client.get('/api/metadata')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(semester=self.semester, name="Chemistry")
+        response = self.client.get('/api/metadata', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn("Chemistry", response.json()["PU"]["Engineering"]["BE"]["1st Sem"])
+
+
+class ScheduleConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        self.client.force_login(self.user)
+        self.save({"days": [{"id": "day-0", "tasks": []}]})
+
+    def save(self, data):
+        self.client.post('/api/sync/save', json.dumps({"name": "p", "data": data, "inputs": None}), content_type='application/json')
+
+    def test_unchanged_schedule_and_listing_cost_a_304(self):
+        for path in ('/api/sync/schedules', '/api/sync/schedules/p'):
+            first = self.client.get(path)
+            self.assertEqual(first.status_code, 200)
+            self.assertTrue(first['ETag'])
+            again = self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b"")
+
+    def test_changed_schedule_gets_a_new_etag(self):
+        etags = {path: self.client.get(path)['ETag'] for path in ('/api/sync/schedules', '/api/sync/schedules/p')}
+        self.save({"days": [{"id": "day-0", "tasks": ["Revise"]}]})
+        for path, etag in etags.items():
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/sync/schedules/p').json()["data"]["days"][0]["tasks"], ["Revise"])
+
+
+class StudyPlanPersistenceTests(TestCase):
+    def day(self, ad_date, subject, *minutes):
+        return {"ad_date": ad_date, "subject": subject, "tasks": [{"minutes": m, "type": "study"} for m in minutes]}
+
+    def test_completion_survives_a_resave_of_other_days(self):
+        user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        save_study_plan(user, {"days": [self.day("2026-11-01", "Maths", 60, 45), self.day("2026-11-02", "Physics", 60)]})
+        done = StudyPlan.objects.filter(user=user, date="2026-11-01").first()
+        StudyPlan.objects.filter(pk=done.pk).update(is_completed=True)
+
+        stats = save_study_plan(user, {"days": [self.day("2026-11-01", "Maths", 60, 45), self.day("2026-11-02", "Physics", 30, 30)]})
+        self.assertEqual((stats["days_unchanged"], stats["days_written"]), (1, 1))
+        self.assertTrue(StudyPlan.objects.get(pk=done.pk).is_completed) # the row itself was left alone
+        self.assertEqual(StudyPlan.objects.filter(user=user, is_completed=True).count(), 1)
+        self.assertEqual(list(StudyPlan.objects.filter(user=user, date="2026-11-02").values_list('duration_mins', flat=True)), [30, 30])
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboard._index = None # loaded afresh from this test's users
+        self.users = [CustomUser.objects.create_user(name, f"{name}@example.com", "pw", xp=xp) for name, xp in (("ana", 300), ("bo", 200), ("cy", 100))]
+        self.client.force_login(self.users[2])
+
+    def tearDown(self):
+        leaderboard._index = None
+
+    def sync_xp(self, body):
+        return self.client.post('/api/v17/sync-xp', json.dumps(body), content_type='application/json')
+
+    def test_rank_follows_an_xp_sync(self):
+        board = self.client.get('/api/v17/leaderboard?around=1').json()
+        self.assertEqual(board["user_rank"], 3)
+        self.assertEqual([row["username"] for row in board["around"]], ["bo", "cy"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.sync_xp({"xp": 250, "streak": 2}).status_code, 200)
+        board = self.client.get('/api/v17/leaderboard?around=1').json()
+        self.assertEqual(board["user_rank"], 2)
+        self.assertEqual([row["username"] for row in board["around"]], ["ana", "cy", "bo"])
+
+    def test_bad_numbers_are_refused(self):
+        for body in ({"xp": "abc"}, {"xp": None}, {"xp": []}, {"xp": 5, "streak": "x"}):
+            self.assertEqual(self.sync_xp(body).status_code, 400)
+        self.assertEqual(CustomUser.objects.get(pk=self.users[2].pk).xp, 100)
+        self.assertEqual(self.client.get('/api/v17/leaderboard?limit=abc').status_code, 400)
+
+
+class SessionRollupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        self.client.force_login(self.user)
+        self.today = timezone.localdate()
+        yesterday = timezone.now() - timedelta(days=1)
+        sessions = [
+            {"subject": "Maths", "topic": "Limits", "timestamp": yesterday.isoformat(), "abandoned": True},
+            {"subject": "Maths", "topic": "Limits"},
+            {"subject": "Physics", "topic": "Optics", "abandoned": True},
+            {"subject": "Physics", "topic": "Optics"},
+        ]
+        for session in sessions:
+            session.update(duration_mins=60, focus_score=30, distractions=4)
+        response = self.client.post('/api/v17/log-sessions', json.dumps({"sessions": sessions}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def rollup(self, day, subject):
+        row = SessionRollup.objects.get(user=self.user, day=day, subject=subject)
+        return row.sessions, row.minutes, row.abandoned
+
+    def test_sessions_update_day_across_subject_and_subject_rows(self):
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(self.rollup(yesterday, "Maths"), (1, 60, 1))
+        self.assertEqual(self.rollup(self.today, "Maths"), (1, 60, 0))
+        self.assertEqual(self.rollup(self.today, "Physics"), (2, 120, 1))
+        self.assertEqual(self.rollup(yesterday, ""), (1, 60, 1))
+        self.assertEqual(self.rollup(self.today, ""), (3, 180, 1))
+        self.assertEqual(self.rollup(None, "Maths"), (2, 120, 1))
+        self.assertEqual(self.rollup(None, "Physics"), (2, 120, 1))
+        self.assertEqual(SessionRollup.objects.filter(user=self.user).count(), 7)
+
+    def test_burnout_risk_from_known_history(self):
+        # Light load (0), focus at the user's baseline (0) but 40 below 70 (0.15 x 1),
+        # half the sessions abandoned (0.2 x 0.5), 4 distractions a session (0.15 x 0.4)
+        analytics = self.client.get('/api/v17/analytics').json()
+        self.assertEqual((analytics["burnout_score"], analytics["burnout_risk"]), (31, "MED"))
+        self.assertEqual(analytics["days"][str(self.today)]["sessions"], 3)
+        self.assertEqual(analytics["subjects"]["Physics"]["abandonment_rate"], 0.5)
+
+
+class MetricsAccessTests(TestCase):
+    def test_anonymous_users_are_refused(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics?format=json').status_code, 401)
+
+    def test_non_staff_users_are_refused(self):
+        self.client.force_login(CustomUser.objects.create_user("learner", "learner@example.com", "pw"))
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics?format=json').status_code, 403)
+
+    def test_staff_users_get_prometheus_text(self):
+        self.client.force_login(CustomUser.objects.create_user("ops", "ops@example.com", "pw", is_staff=True))
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertEqual(self.client.get('/api/metrics?format=json').status_code, 200)
+
+
+class CompressedJSONFieldTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user("learner", "learner@example.com", "pw")
+        self.plan = generate_study_plan([{"name": "Maths", "date": "2026-10-28"}], daily_study_hours=6, now=datetime(2026, 10, 18, 5))
+        self.schedule = SavedSchedule.objects.create(user=user, name="Term plan", data=self.plan)
+
+    def test_decoded_only_when_read(self):
+        schedule = SavedSchedule.objects.get(pk=self.schedule.pk)
+        self.assertIsInstance(schedule.__dict__['data'], fields.Packed)
+        with mock.patch.object(fields, 'unpack', wraps=fields.unpack) as unpack:
+            self.assertEqual(schedule.name, "Term plan")
+            unpack.assert_not_called()
+            self.assertEqual(schedule.data, self.plan)
+            self.assertEqual(schedule.data, self.plan)
+        unpack.assert_called_once()
+
+    def test_unread_value_saved_unchanged(self):
+        job = PlanJob.objects.create(owner="user:1", kind=PlanJob.SCHEDULE, key="k", payload={}, status=PlanJob.DONE, result=self.plan)
+        stored = PlanJob.objects.values_list('result', flat=True).get(pk=job.pk)
+        job = PlanJob.objects.get(pk=job.pk)
+        job.attempts = 2
+        with mock.patch.object(fields, 'unpack') as unpack, mock.patch.object(fields, 'pack') as pack:
+            job.save() # writes every column, the result as it was loaded
+        unpack.assert_not_called()
+        pack.assert_not_called()
+        self.assertEqual(PlanJob.objects.values_list('result', flat=True).get(pk=job.pk), stored)
+        self.assertEqual(PlanJob.objects.get(pk=job.pk).result, self.plan)
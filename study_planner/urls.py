@@ -3,13 +3,19 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('sw.js', views.service_worker, name='service_worker'),
     path('api/metadata', views.get_metadata, name='get_metadata'),
+    path('api/today', views.get_today, name='get_today'),
+    path('api/metrics', views.get_metrics, name='get_metrics'),
     path('api/generate-schedule', views.generate_schedule, name='generate_schedule'),
     path('api/replan-day', views.replan_day, name='replan_day'),
     path('api/sync/schedules', views.get_schedules, name='get_schedules'),
+    path('api/sync/schedules/<path:name>', views.get_saved_schedule, name='get_saved_schedule'),
     path('api/sync/save', views.save_schedule, name='save_schedule'),
+    path('api/sync/patch', views.patch_schedule, name='patch_schedule'),
     path('api/sync/delete', views.delete_schedule, name='delete_schedule'),
     path('api/v17/log-session', views.log_session_v17, name='log_session_v17'),
+    path('api/v17/log-sessions', views.log_sessions_v17, name='log_sessions_v17'),
     path('api/v17/analytics', views.get_analytics_v17, name='get_analytics_v17'),
     path('api/v17/sync-xp', views.sync_xp, name='sync_xp'),
     path('api/v17/leaderboard', views.get_leaderboard, name='get_leaderboard'),
@@ -20,4 +26,8 @@ urlpatterns = [
     path('api/exam-plan/', views.api_exam_plan, name='api_exam_plan'),
     path('api/today-plan/', views.api_today_plan, name='api_today_plan'),
     path('api/update-mastery/', views.api_update_mastery, name='api_update_mastery'),
+    path('api/day-template/', views.api_day_template, name='api_day_template'),
+    path('api/jobs', views.submit_job, name='submit_job'),
+    path('api/jobs/<uuid:job_id>', views.job_status, name='job_status'),
+    path('api/jobs/<uuid:job_id>/result', views.job_result, name='job_result'),
 ]
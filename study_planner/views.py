@@ -1,92 +1,279 @@
 from django.shortcuts import render
-from django.db.models import Avg, Sum
-from django.http import JsonResponse
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
-from .models import University, Faculty, Course, Semester, Subject, Chapter, SavedSchedule, CustomUser, TopicMastery, SessionStats, StudyPlan
-from planner import generate_study_plan, get_micro_chunks
+from .models import SavedSchedule, CustomUser, StudyPlan, PlanJob
+from planner import generate_study_plan, replan_study_plan, iter_study_plan, get_micro_chunks, PlanTrace, REVISION_LADDERS, DayTimeline, resolve_day_template, validate_day_template, StageTimer
 import json
-from datetime import datetime, timedelta
-import nepali_datetime
+from collections import OrderedDict
+from datetime import datetime
+import re
+import base64
+import hashlib
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import bs_calendar
+from . import chapter_index, fields, ingest, jobs, leaderboard, metadata, metrics, plan_cache, planner_pool, rollups, schedule_sync, wire
+from .mastery import subject_averages, update_topic
+from .persistence import save_study_plan
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+import threading
+
+# Per-user planner checkpoints, so a re-submitted plan only recomputes the days
+# an edit actually affects. In-process only: each worker keeps its own LRU.
+_PLAN_TRACES = OrderedDict()
+_PLAN_TRACES_MAX = 256
+_PLAN_TRACES_LOCK = threading.Lock() # plans run on the planner pool's threads
+
+_GZIP_RE = re.compile(r'\bgzip\b')
+
+def _check_in(user_id, trace):
+    with _PLAN_TRACES_LOCK:
+        _PLAN_TRACES[user_id] = trace
+        while len(_PLAN_TRACES) > _PLAN_TRACES_MAX:
+            _PLAN_TRACES.popitem(last=False)
+
+def _checked_out(user_id, trace, plan):
+    """``plan``'s items; ``trace`` goes back only once the generator stops writing to it."""
+    try:
+        yield from plan
+    finally:
+        _check_in(user_id, trace)
+
+def _plan_for_user(user, exams, stream=False, **kwargs):
+    """Plans ``exams``; ``stream`` returns iter_study_plan's generator instead of the full plan.
+
+    The user's trace stays checked out while it is planned with, so a concurrent
+    request plans from a fresh one instead of a half-updated checkpoint.
+    """
+    if not user.is_authenticated:
+        return iter_study_plan(exams, **kwargs) if stream else generate_study_plan(exams, **kwargs)
+    with _PLAN_TRACES_LOCK:
+        trace = _PLAN_TRACES.pop(user.id, None) or PlanTrace()
+    if stream:
+        return _checked_out(user.id, trace, iter_study_plan(exams, trace=trace, replan=True, **kwargs))
+    try:
+        return replan_study_plan(trace, exams, **kwargs)
+    finally:
+        _check_in(user.id, trace)
+
+def _plan_and_cache(user, exams, cache_key, **kwargs):
+    """Full plan for the planner pool: returns it and its cached JSON body."""
+    schedule = _plan_for_user(user, exams, **kwargs)
+    return schedule, plan_cache.set(cache_key, schedule)
+
+def _ndjson(header, days, cache_key=None):
+    """One JSON document per line: the plan header, then one line per day.
+
+    With ``cache_key`` the complete schedule is stored once the last day is sent.
+    """
+    yield json.dumps(header) + "\n"
+    sent = []
+    try:
+        for day in days:
+            sent.append(day)
+            yield json.dumps(day) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n" # headers are already sent, so report it in-band
+        return
+    finally:
+        days.close() # on a disconnect too, so the plan releases its trace now rather than at garbage collection
+    if cache_key:
+        plan_cache.set(cache_key, {"status": header["status"], "days": sent, "summary": header["summary"]})
+
+def _compact_body(schedule, body):
+    """``schedule`` (parsed from its JSON ``body`` if None) in the compact wire format, or None if it does not fit."""
+    try:
+        return json.dumps(wire.encode(json.loads(body) if schedule is None else schedule), separators=(',', ':'))
+    except ValueError:
+        return None
+
+def _day_template(user, data):
+    """Day template for this request: explicit payload, else the user's saved one."""
+    if data.get('day_template'):
+        return data['day_template']
+    if user.is_authenticated:
+        return user.day_template
+    return None
+
+_PROFILE_TOP = 40 # functions listed in a profiled plan's pstats text
+
+def _profiled_plan(exams, **kwargs):
+    """A full plan (no cache, no replan) with its stage breakdown and a cProfile of a second run.
+
+    The stages are timed on their own run so the profiler's overhead does not
+    skew them. ``pstats_dump`` is the base64 of what Profile.dump_stats writes:
+    decode it to a file and open it with pstats.Stats or snakeviz.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+    schedule = generate_study_plan(exams, timer=timer, **kwargs)
+    total = time.perf_counter() - start
+    if schedule["status"] != "success":
+        return schedule
+
+    profiler = cProfile.Profile()
+    profiler.runcall(generate_study_plan, exams, **kwargs)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).strip_dirs().sort_stats('cumulative').print_stats(_PROFILE_TOP)
+    profiler.create_stats()
+    schedule["profile"] = {
+        "total_ms": round(total * 1000, 3),
+        "stages": timer.report(),
+        "pstats": text.getvalue(),
+        "pstats_dump": base64.b64encode(marshal.dumps(profiler.stats)).decode(),
+    }
+    return schedule
+
+def _plan_args(user, data):
+    """Planner settings from a wizard payload."""
+    return {
+        "daily_study_hours": int(data.get('daily_hours', 8)),
+        "session_mins": int(data.get('session_mins', 90)),
+        "break_mins": int(data.get('break_mins', 15)),
+        "start_time": data.get('start_time', "06:00"),
+        "revision_ladder": REVISION_LADDERS.get(data.get('revision_ladder')),
+        "day_template": _day_template(user, data),
+    }
 
 def index(request):
-    return render(request, 'index.html')
+    return render(request, 'index.html', {"asset_version": settings.ASSET_VERSION})
+
+# Assets the service worker precaches; the page references them with ?v=ASSET_VERSION
+_PRECACHE_ASSETS = ('css/style.css', 'js/main.js')
+_SW_PREFIX = None
+
+def _service_worker_prefix():
+    """``CACHE_VERSION`` and ``PRECACHE_URLS`` for sw.js.
+
+    The version hashes the assets and sw.js itself, so any change to them makes
+    browsers install the new worker and refetch the precache.
+    """
+    global _SW_PREFIX
+    if _SW_PREFIX is None or settings.DEBUG:
+        digest = hashlib.sha1(settings.ASSET_VERSION.encode())
+        for name in _PRECACHE_ASSETS + ('sw.js', 'manifest.json'):
+            with open(finders.find(name), 'rb') as f:
+                digest.update(f.read())
+        urls = [f"{static(name)}?v={settings.ASSET_VERSION}" for name in _PRECACHE_ASSETS] + [static('manifest.json')]
+        _SW_PREFIX = f"const CACHE_VERSION = {json.dumps(digest.hexdigest()[:12])};\nconst PRECACHE_URLS = {json.dumps(urls)};\n\n"
+    return _SW_PREFIX
+
+def service_worker(request):
+    """static/sw.js, served from the site root so its scope covers the page and the API."""
+    with open(finders.find('sw.js'), encoding='utf-8') as f:
+        body = _service_worker_prefix() + f.read()
+    response = HttpResponse(body, content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache' # browsers must see a new version as soon as it is deployed
+    return response
 
 def get_metadata(request):
-    """Reconstructs the nested dictionary structure from the database for the frontend wizard."""
-    data = {}
-    unis = University.objects.prefetch_related('faculties__courses__semesters__subjects').all()
-    
-    for uni in unis:
-        uni_data = {}
-        for fac in uni.faculties.all():
-            fac_data = {}
-            for course in fac.courses.all():
-                course_data = {}
-                for sem in course.semesters.all():
-                    sem_data = {}
-                    for sub in sem.subjects.all():
-                        sem_data[sub.name] = {
-                            "id": sub.id,
-                            "difficulty": sub.base_difficulty,
-                            "is_elective": sub.is_elective
-                        }
-                    course_data[sem.name] = sem_data
-                fac_data[course.name] = course_data
-            uni_data[fac.name] = fac_data
-        data[uni.name] = uni_data
-
-    # Add Current BS Date
-    now = datetime.now()
+    """Syllabus tree for the wizard, served from the prebuilt blob (see metadata.py)."""
+    blob = metadata.current()
+    if _GZIP_RE.search(request.headers.get('Accept-Encoding', '')):
+        body, etag = bytes(blob.body_gzip), f'"{blob.etag}-gz"'
+    else:
+        body, etag = bytes(blob.body), f'"{blob.etag}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+        if etag.endswith('-gz"'):
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache' # always revalidate; unchanged syllabus costs a 304
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+def get_today(request):
     try:
-        np_now = nepali_datetime.date.from_datetime_date(now.date())
-        data['today_bs'] = np_now.strftime('%Y-%m-%d')
+        today_bs = bs_calendar.today_bs()
     except:
-        data['today_bs'] = "2082-09-05"
-    
-    return JsonResponse(data)
+        today_bs = "2082-09-05"
+    return JsonResponse({"today_bs": today_bs})
+
+def get_metrics(request):
+    """Staff-only request metrics: Prometheus text, or JSON with ``?format=json``."""
+    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    if not request.user.is_staff: return JsonResponse({"error": "Forbidden"}, status=403)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(metrics.snapshot())
+    return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _plan_request(user, data, exams, inject_chapters=False):
+    """Database side of a planning request, run before anything goes to the planner pool.
+
+    Returns the planner keyword arguments, the cache key, and the cached body if
+    there is one. On a miss (or for a staff profile) the user's mastery, which
+    is part of the key, is added to the keyword arguments. Raises ValueError
+    for settings the planner cannot use, e.g. a bad day template.
+    """
+    if inject_chapters: # from the syllabus index
+        for ex in exams:
+            if not ex.get('chapters'):
+                ex['chapters'] = chapter_index.chapters_for(ex.get('name')) or ["Introduction", "Core Concepts", "Practical Application", "Final Review"]
+    plan_args = _plan_args(user, data)
+    if plan_args["day_template"] is not None:
+        validate_day_template(plan_args["day_template"])
+    now = datetime.now()
+    averages = subject_averages(user) if user.is_authenticated else {}
+    cache_key = plan_cache.plan_key(exams, plan_cache.mastery_stamp(averages), now, **plan_args)
+    profile = bool(data.get('profile')) and user.is_staff
+    body = None if profile else plan_cache.get(cache_key)
+    if body is None:
+        plan_args["subject_mastery"] = averages
+    return dict(plan_args, now=now), cache_key, body, profile
 
 @csrf_exempt
-def generate_schedule(request):
+async def generate_schedule(request):
     if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
     try:
         data = json.loads(request.body)
         exams = data.get('exams', [])
-        
-        # Inject chapters if missing (from DB)
-        for ex in exams:
-            if not ex.get('chapters') or len(ex['chapters']) == 0:
-                sub = Subject.objects.filter(name=ex['name']).first()
-                if sub:
-                    ex['chapters'] = list(sub.chapters.values_list('name', flat=True))
-                if not ex['chapters']:
-                    ex['chapters'] = ["Introduction", "Core Concepts", "Practical Application", "Final Review"]
-        
-        total_hours = int(data.get('daily_hours', 8))
-        session_mins = int(data.get('session_mins', 90))
-        break_mins = int(data.get('break_mins', 15))
-        start_time = data.get('start_time', "06:00")
-
-        # Mastery mapping
-        topic_mastery_map = {}
-        if request.user.is_authenticated:
-            mastery_data = TopicMastery.objects.filter(user=request.user)
-            for m in mastery_data:
-                if m.subject not in topic_mastery_map: topic_mastery_map[m.subject] = {}
-                topic_mastery_map[m.subject][m.topic] = m.mastery_score
-
-        schedule = generate_study_plan(
-            exams, 
-            daily_study_hours=total_hours,
-            session_mins=session_mins,
-            break_mins=break_mins,
-            start_time=start_time,
-            topic_mastery_map=topic_mastery_map
-        )
-        return JsonResponse(schedule, safe=False)
+        user = await request.auser()
+        try:
+            plan_args, cache_key, body, profile = await sync_to_async(_plan_request)(user, data, exams, inject_chapters=True)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if profile:
+            return JsonResponse(await planner_pool.run(_profiled_plan, exams, **plan_args))
+        compact = wire.wants_compact(request)
+        if body is not None:
+            if compact:
+                return await _plan_response(None, body)
+            return HttpResponse(body, content_type='application/json') # the wizard reads either format
+
+        # Clients that accept NDJSON get each day as soon as it is planned
+        if not compact and 'application/x-ndjson' in request.headers.get('Accept', ''):
+            schedule = _plan_for_user(user, exams, stream=True, **plan_args)
+            header = await planner_pool.run(next, schedule) # bad input still fails here, before the response starts
+            content = _ndjson(header, schedule, cache_key)
+            if isinstance(request, ASGIRequest): # WSGI servers iterate synchronously, in the request's own thread
+                content = planner_pool.stream(content)
+            return StreamingHttpResponse(content, content_type='application/x-ndjson')
+        schedule, body = await planner_pool.run(_plan_and_cache, user, exams, cache_key, **plan_args)
+        if compact:
+            return await _plan_response(schedule, body)
+        return HttpResponse(body, content_type='application/json')
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+async def _plan_response(schedule, body):
+    """Compact response for a plan, or its plain JSON ``body`` if the plan does not fit the format (e.g. errors)."""
+    compact = await planner_pool.run(_compact_body, schedule, body)
+    if compact is None:
+        return HttpResponse(body, content_type='application/json')
+    return HttpResponse(compact, content_type=wire.MEDIA_TYPE)
+
 @csrf_exempt
 def replan_day(request):
     if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
@@ -97,6 +284,13 @@ def replan_day(request):
         break_mins = int(data.get('break_mins', 15))
         start_str = data.get('start_time', "06:00")
         current_dt = datetime.combine(datetime.now().date(), datetime.strptime(start_str, "%H:%M").time())
+        template = _day_template(request.user, data)
+        if template is not None:
+            try:
+                validate_day_template(template)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+        timeline = DayTimeline(current_dt.date(), current_dt.hour * 60 + current_dt.minute, resolve_day_template(template))
         tasks, _ = get_micro_chunks(
             data.get('subject'),
             data.get('focus', 'Revision'),
@@ -104,95 +298,182 @@ def replan_day(request):
             session_mins,
             break_mins,
             'study',
-            current_dt
+            current_dt,
+            timeline
         )
         return JsonResponse({"tasks": tasks})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-def get_schedules(request):
-    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
-    schedules = SavedSchedule.objects.filter(user=request.user).order_by('-created_at')
-    
-    nepal_now = datetime.utcnow() + timedelta(hours=5, minutes=45)
-    today_ad_str = nepal_now.date().strftime("%Y-%m-%d")
-
-    results = []
-    for s in schedules:
-        results.append({
-            "name": s.name,
-            "data": s.data,
-            "inputs": s.inputs
-        })
-    return JsonResponse(results, safe=False)
+async def get_schedules(request):
+    """Listing of the user's saved schedules; the plans themselves come from get_saved_schedule."""
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    results = [
+        {"name": s["name"], "created_at": s["created_at"], "updated_at": s["updated_at"], "hash": s["content_hash"], "days": s["day_count"], "revision": s["revision"]}
+        async for s in SavedSchedule.objects.filter(user=user).order_by('-created_at').values('name', 'created_at', 'updated_at', 'content_hash', 'day_count', 'revision')
+    ]
+    response = JsonResponse(results, safe=False)
+    etag = f'"{hashlib.sha256(response.content).hexdigest()[:32]}"'
+    response = get_conditional_response(request, etag=etag) or response
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _schedule_changes(user, name, since):
+    """Body for ``?since=``, or None when the schedule has to be sent whole (not a plan, or ``since`` is unknown)."""
+    schedule = SavedSchedule.objects.only('data', 'inputs', 'revision', 'content_hash').get(user=user, name=name)
+    try:
+        changes = schedule_sync.changes_since(schedule, since)
+    except ValueError:
+        return None
+    return {"name": name, "revision": schedule.revision, "hash": schedule.content_hash, "since": since, "changes": changes}
+
+async def get_saved_schedule(request, name):
+    """One saved schedule, plain or compact; its content hash is the ETag, so an unchanged one costs a 304.
+
+    With ``?since=<revision>`` only the days changed after that revision are sent (see schedule_sync).
+    """
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    if 'since' in request.GET:
+        try:
+            delta = await sync_to_async(_schedule_changes)(user, name, int(request.GET['since']))
+        except ValueError:
+            return JsonResponse({"error": "since must be a revision number"}, status=400)
+        except SavedSchedule.DoesNotExist:
+            return JsonResponse({"error": "Not found"}, status=404)
+        if delta is not None:
+            response = JsonResponse(delta)
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+    schedules = SavedSchedule.objects.filter(user=user, name=name)
+    content_hash = await schedules.values_list('content_hash', flat=True).afirst()
+    if content_hash is None: return JsonResponse({"error": "Not found"}, status=404)
+    compact = wire.wants_compact(request)
+    etag = f'"{content_hash}-c"' if compact else f'"{content_hash}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        row = await schedules.values('name', 'data', 'inputs', 'updated_at', 'content_hash', 'revision').afirst()
+        if row is None: return JsonResponse({"error": "Not found"}, status=404) # deleted in between
+        etag = f'"{row["content_hash"]}-c"' if compact else f'"{row["content_hash"]}"'
+        entry = {"name": row["name"], "inputs": row["inputs"], "updated_at": row["updated_at"], "hash": row["content_hash"], "revision": row["revision"]}
+        # Plans are stored in the compact format (see fields.py), so a compact fetch only decompresses
+        stored = fields.plan_json(row["data"]) if compact else None
+        if stored is not None:
+            entry["compact"] = json.loads(stored)
+        else:
+            entry["data"] = await planner_pool.run(fields.unpack, row["data"])
+        response = JsonResponse(entry, json_dumps_params={"separators": (',', ':')} if compact else None)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Accept',))
+    return response
 
 @csrf_exempt
-def save_schedule(request):
-    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+async def save_schedule(request):
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
     data = json.loads(request.body)
-    SavedSchedule.objects.update_or_create(
-        user=request.user, 
-        name=data.get('name'),
-        defaults={'data': data.get('data'), 'inputs': data.get('inputs')}
-    )
-    return JsonResponse({"success": True})
+    # With "base" (the revision the client edited) a newer server copy is not overwritten
+    base = data.get('base')
+    if base is not None and type(base) is not int: return JsonResponse({"error": "base must be a revision number"}, status=400)
+    schedule, saved = await sync_to_async(schedule_sync.save)(user, data.get('name'), data.get('data'), data.get('inputs'), base)
+    if not saved:
+        return JsonResponse({"error": "Conflict", "revision": schedule.revision}, status=409)
+    return JsonResponse({"success": True, "hash": schedule.content_hash, "revision": schedule.revision})
 
 @csrf_exempt
-def delete_schedule(request):
-    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+async def patch_schedule(request):
+    """Applies the days a client edited on top of its base revision (see schedule_sync.patch)."""
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
     data = json.loads(request.body)
-    SavedSchedule.objects.filter(user=request.user, name=data.get('name')).delete()
+    if type(data.get('base')) is not int or not isinstance(data.get('days', {}), dict):
+        return JsonResponse({"error": "expected a base revision and a days object"}, status=400)
+    extra = {"inputs": data["inputs"]} if "inputs" in data else {}
+    try:
+        result = await sync_to_async(schedule_sync.patch)(user, data.get('name'), data['base'], data.get('days', {}), **extra)
+    except SavedSchedule.DoesNotExist:
+        return JsonResponse({"error": "Not found"}, status=404)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"success": True, **result})
+
+@csrf_exempt
+async def delete_schedule(request):
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    data = json.loads(request.body)
+    await SavedSchedule.objects.filter(user=user, name=data.get('name')).adelete()
     return JsonResponse({"success": True})
 
 @csrf_exempt
-def log_session_v17(request):
-    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+async def log_session_v17(request):
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     data = json.loads(request.body)
-    score = data.get('focus_score', 100)
-    
-    SessionStats.objects.create(
-        user=request.user,
-        subject=data.get('subject'),
-        topic=data.get('topic'),
-        duration_mins=data.get('duration_mins'),
-        focus_score=score,
-        distraction_count=data.get('distractions', 0),
-        idle_seconds=data.get('idle_seconds', 0)
-    )
-    
-    mastery_gain = 5 if score > 80 else (2 if score > 50 else 0)
-    tm, created = TopicMastery.objects.get_or_create(
-        user=request.user,
-        subject=data.get('subject'),
-        topic=data.get('topic')
-    )
-    tm.mastery_score = min(100, tm.mastery_score + mastery_gain)
-    tm.save()
+    try:
+        await sync_to_async(ingest.log_sessions)(user, [data])
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
     
-    return JsonResponse({"success": True, "mastery_gain": mastery_gain})
+    return JsonResponse({"success": True, "mastery_gain": ingest.mastery_gain(int(data.get('focus_score', 100)))})
+
+@csrf_exempt
+async def log_sessions_v17(request):
+    """Batched log-session: ``{"sessions": [...]}``, each item shaped like a log-session body plus an optional ISO ``timestamp``."""
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
+    sessions = json.loads(request.body).get('sessions')
+    if not isinstance(sessions, list) or len(sessions) > ingest.MAX_BATCH:
+        return JsonResponse({"error": f"sessions must be a list of at most {ingest.MAX_BATCH} items"}, status=400)
+    try:
+        scores = await sync_to_async(ingest.log_sessions)(user, sessions)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    mastery = {}
+    for (subject, topic), score in scores.items():
+        mastery.setdefault(subject, {})[topic] = score
+    return JsonResponse({"success": True, "logged": len(sessions), "mastery": mastery})
 
 def get_analytics_v17(request):
     if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
-    stats = SessionStats.objects.filter(user=request.user)
-    avg_focus = stats.aggregate(Avg('focus_score'))['focus_score__avg'] or 0
-    burnout = "LOW"
-    # Placeholder for counts...
-    return JsonResponse({"avg_focus": avg_focus, "burnout_risk": burnout, "mastery": {}})
+    return JsonResponse(rollups.analytics(request.user))
 
 @csrf_exempt
 def sync_xp(request):
     if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     data = json.loads(request.body)
-    request.user.xp = data.get('xp', 0)
-    request.user.streak = data.get('streak', 0)
-    request.user.save()
+    try:
+        xp, streak = int(data.get('xp', 0)), int(data.get('streak', 0))
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "xp and streak must be whole numbers"}, status=400)
+    request.user.xp, request.user.streak = xp, streak
+    request.user.save(update_fields=['xp', 'streak']) # the leaderboard index picks this up on commit
     return JsonResponse({"success": True})
 
-def get_leaderboard(request):
-    top = CustomUser.objects.order_by('-xp')[:10]
-    leaderboard = [{"username": u.username, "xp": u.xp, "streak": u.streak} for u in top]
-    return JsonResponse({"leaderboard": leaderboard, "user_rank": 0})
+async def get_leaderboard(request):
+    """Top 10 (or ``?offset=&limit=``), the caller's rank, and ``?around=N`` neighbours each side."""
+    try:
+        offset = max(0, int(request.GET.get('offset', 0)))
+        limit = min(100, max(1, int(request.GET.get('limit', 10))))
+        around = min(50, max(0, int(request.GET['around']))) if 'around' in request.GET else None
+    except ValueError:
+        return JsonResponse({"error": "offset, limit and around must be whole numbers"}, status=400)
+    index = await sync_to_async(leaderboard.get)() # queries only when the index is (re)loaded
+    user = await request.auser()
+    data = {"leaderboard": index.page(offset, limit), "user_rank": 0, "total": len(index)}
+    if user.is_authenticated:
+        data["user_rank"] = index.rank(user.id) or 0
+        if around is not None:
+            data["around"] = index.around(user.id, above=around, below=around)
+    return JsonResponse(data)
 
 @csrf_exempt
 def login_user(request):
@@ -233,55 +514,134 @@ def logout_user(request):
     logout(request)
     return JsonResponse({"success": True})
 
-def auth_status(request):
-    if request.user.is_authenticated:
-        return JsonResponse({"logged_in": True, "username": request.user.username})
+async def auth_status(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        return JsonResponse({"logged_in": True, "username": user.username})
     return JsonResponse({"logged_in": False})
 
 @csrf_exempt
-def api_exam_plan(request):
-    if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+async def api_exam_plan(request):
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
     try:
         data = json.loads(request.body)
         exams = data.get('exams', [])
-        topic_mastery_map = {}
-        mastery_data = TopicMastery.objects.filter(user=request.user)
-        for m in mastery_data:
-            if m.subject not in topic_mastery_map: topic_mastery_map[m.subject] = {}
-            topic_mastery_map[m.subject][m.topic] = m.mastery_score
-            
-        schedule = generate_study_plan(
-            exams,
-            daily_study_hours=int(data.get('daily_hours', 8)),
-            session_mins=int(data.get('session_mins', 90)),
-            break_mins=int(data.get('break_mins', 15)),
-            start_time=data.get('start_time', "06:00"),
-            topic_mastery_map=topic_mastery_map
-        )
+        try:
+            plan_args, cache_key, body, profile = await sync_to_async(_plan_request)(user, data, exams)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if profile:
+            return JsonResponse(await planner_pool.run(_profiled_plan, exams, **plan_args))
+        if body is None:
+            schedule, body = await planner_pool.run(_plan_and_cache, user, exams, cache_key, **plan_args)
+        else:
+            schedule = json.loads(body)
         
         if schedule.get("status") == "success":
-            StudyPlan.objects.filter(user=request.user).delete()
-            for day in schedule["days"]:
-                ad_date_obj = datetime.strptime(day["ad_date"], "%Y-%m-%d").date()
-                for task in day.get("tasks", []):
-                    StudyPlan.objects.create(
-                        user=request.user,
-                        date=ad_date_obj,
-                        subject=day["subject"],
-                        duration_mins=task["minutes"],
-                        plan_type=task["type"]
-                    )
+            await sync_to_async(save_study_plan)(user, schedule)
         
-        return JsonResponse(schedule, safe=False)
+        return HttpResponse(body, content_type='application/json')
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-def api_today_plan(request):
+def _submit_job(user, session_key, kind, data, exams):
+    plan_args, cache_key, body, _ = _plan_request(user, data, exams, inject_chapters=kind == PlanJob.SCHEDULE)
+    return jobs.submit(user, kind, exams, plan_args, cache_key, body, session_key=session_key)
+
+def _job_status(job):
+    status = {
+        "id": str(job.pk), "kind": job.kind, "status": job.status,
+        "created_at": job.created_at, "started_at": job.started_at, "finished_at": job.finished_at,
+    }
+    if job.status == PlanJob.PENDING:
+        status["position"] = jobs.position(job)
+    elif job.status == PlanJob.DONE:
+        status["result"] = reverse('job_result', args=[job.pk])
+    elif job.status == PlanJob.FAILED:
+        status["error"] = job.error
+    return status
+
+@csrf_exempt
+async def submit_job(request):
+    """Queues a generate_schedule (``"kind": "schedule"``) or api_exam_plan (``"exam_plan"``) request; see jobs.py.
+
+    Answers 202 with the job's status and its URL in Location. An identical
+    request still pending or running gets that job back, marked deduplicated.
+    Anonymous jobs belong to the visitor's session, started here if need be.
+    """
+    if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
+    try:
+        data = json.loads(request.body)
+        kind = data.get('kind', PlanJob.SCHEDULE)
+        if kind not in jobs.KINDS: return JsonResponse({"error": f"kind must be one of {', '.join(jobs.KINDS)}"}, status=400)
+        user = await request.auser()
+        if kind == PlanJob.EXAM_PLAN and not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+        if not user.is_authenticated and request.session.session_key is None:
+            await request.session.acreate()
+        job, created = await sync_to_async(_submit_job)(user, request.session.session_key, kind, data, data.get('exams', []))
+        status = await sync_to_async(_job_status)(job)
+    except jobs.QueueFull:
+        return JsonResponse({"error": "Too many planning jobs in progress"}, status=429)
+    except ValueError as e: # a malformed request or planner settings (see _plan_request)
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    response = JsonResponse(dict(status, deduplicated=not created), status=202)
+    response['Location'] = reverse('job_status', args=[job.pk])
+    return response
+
+async def job_status(request, job_id):
+    user = await request.auser()
+    job = await PlanJob.objects.filter(pk=job_id, owner=jobs.owner(user, request.session.session_key)).defer('payload', 'result').afirst()
+    if job is None: return JsonResponse({"error": "Not found"}, status=404)
+    response = JsonResponse(await sync_to_async(_job_status)(job))
+    response['Cache-Control'] = 'no-store'
+    return response
+
+def _stored_body(raw):
+    return json.dumps(fields.unpack(raw))
+
+async def job_result(request, job_id):
+    """The finished job's plan, as generate_schedule or api_exam_plan would have answered (compact on request)."""
+    user = await request.auser()
+    row = await PlanJob.objects.filter(pk=job_id, owner=jobs.owner(user, request.session.session_key)).values('status', 'result', 'error').afirst()
+    if row is None: return JsonResponse({"error": "Not found"}, status=404)
+    if row["status"] == PlanJob.FAILED: return JsonResponse({"error": row["error"]}, status=500)
+    if row["status"] != PlanJob.DONE:
+        response = JsonResponse({"status": row["status"]}, status=202)
+        response['Retry-After'] = '1'
+        return response
+    stored = fields.plan_json(row["result"]) if wire.wants_compact(request) else None
+    if stored is not None: # results are stored in the compact format already (see fields.py)
+        response = HttpResponse(stored, content_type=wire.MEDIA_TYPE)
+    else:
+        response = HttpResponse(await planner_pool.run(_stored_body, row["result"]), content_type='application/json')
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+@csrf_exempt
+def api_day_template(request):
     if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        template = data.get('day_template') or None
+        if template is not None:
+            try:
+                validate_day_template(template)
+            except ValueError as e: # a bad template would fail every plan of this user
+                return JsonResponse({"error": str(e)}, status=400)
+        request.user.day_template = template
+        request.user.save(update_fields=['day_template'])
+    return JsonResponse({"day_template": resolve_day_template(request.user.day_template)})
+
+async def api_today_plan(request):
+    user = await request.auser()
+    if not user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     today = datetime.now().date()
-    plans = StudyPlan.objects.filter(user=request.user, date=today)
-    data = [{"subject": p.subject, "topic": p.topic, "duration_mins": p.duration_mins, "type": p.plan_type, "is_completed": p.is_completed} for p in plans]
+    plans = StudyPlan.objects.filter(user=user, date=today)
+    data = [{"subject": p.subject, "topic": p.topic, "duration_mins": p.duration_mins, "type": p.plan_type, "is_completed": p.is_completed} async for p in plans]
     return JsonResponse({"today": str(today), "plans": data})
 
 @csrf_exempt
@@ -289,7 +649,9 @@ def api_update_mastery(request):
     if not request.user.is_authenticated: return JsonResponse({"error": "Unauthorized"}, status=401)
     if request.method != 'POST': return JsonResponse({"error": "Method not allowed"}, status=405)
     data = json.loads(request.body)
-    tm, _ = TopicMastery.objects.get_or_create(user=request.user, subject=data.get('subject'), topic=data.get('topic'))
-    tm.mastery_score = max(0, min(100, tm.mastery_score + data.get('change', 0)))
-    tm.save()
-    return JsonResponse({"success": True, "mastery_score": tm.mastery_score})
+    subject, topic = data.get('subject'), data.get('topic')
+    # '' is SessionRollup's all-subjects row, so an empty subject is rejected here as in ingest.parse
+    if not subject or not topic or not isinstance(subject, str) or not isinstance(topic, str):
+        return JsonResponse({"error": "subject and topic are required"}, status=400)
+    score = update_topic(request.user, subject, topic, data.get('change', 0))
+    return JsonResponse({"success": True, "mastery_score": score})
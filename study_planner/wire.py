@@ -0,0 +1,201 @@
+"""Compact wire format for schedules.
+
+Plans repeat the same few strings on every task (activity labels, types,
+subjects) and spell every time range out. The compact form sends each string
+once and the days and tasks as columns of small integers::
+
+    {"compact": 1,
+     "plan": {...},            # every top-level key of the plan except "days"
+     "strings": [...],
+     "start": "2026-01-01",    # ad_date of the first day
+     "days": {"index": [...],  # "day-N": N minus the previous day's N
+              "date": [...],   # days since the previous day's ad_date
+              "bs": [...],     # bs_date: day-of-month step within the previous
+                               # day's BS month, else the full string
+              "exam": [...],   # is_exam_day as 0/1
+              "status": [...], "subject": [...],  # string ids
+              "tasks": [...]}, # task count; the days' tasks are concatenated
+     "tasks": {"gap": [...],   # minutes since the previous task of the day ended
+                               # (the first task: its start minute)
+               "minutes": [...],
+               "type": [...], "label": [...],  # string ids
+               "subject": [...],  # string id, -1 when the task has none
+               "ends": [[k, minute], ...]}}  # tasks whose range does not end at
+                                             # start + minutes (fractional minutes)
+
+``day_of_week`` and the "HH:MM - HH:MM" ranges are rebuilt from the dates and
+minutes. ``encode`` raises ValueError for anything it could not rebuild
+exactly (e.g. a saved plan edited by an older client); callers then send the
+plan as plain JSON. ``decode`` mirrors decodeCompactPlan in static/js/main.js.
+"""
+from datetime import date, timedelta
+
+MEDIA_TYPE = 'application/vnd.padsala.compact+json'
+VERSION = 1
+
+_DAY_KEYS = frozenset(('id', 'bs_date', 'ad_date', 'day_of_week', 'is_exam_day', 'status', 'subject', 'tasks'))
+_TASK_KEYS = frozenset(('time', 'activity', 'type', 'minutes'))
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def wants_compact(request):
+    """True for ``?format=compact`` or an Accept header naming MEDIA_TYPE."""
+    return request.GET.get('format') == 'compact' or MEDIA_TYPE in request.headers.get('Accept', '')
+
+
+def _hhmm(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _minute(text):
+    hours, _, minutes = text.partition(':')
+    try:
+        value = int(hours) * 60 + int(minutes)
+    except ValueError:
+        value = -1
+    if not 0 <= value < 1440 or _hhmm(value) != text:
+        raise ValueError(f"not a HH:MM time: {text!r}")
+    return value
+
+
+def _bs_step(previous, current):
+    """bs_date as a day step within ``previous``'s month when that rebuilds it exactly."""
+    if previous and previous[:8] == current[:8]:
+        try:
+            step = int(current[8:]) - int(previous[8:])
+        except ValueError:
+            return current
+        if _bs_day(previous, step) == current:
+            return step
+    return current
+
+
+def _bs_day(previous, step):
+    return f"{previous[:8]}{int(previous[8:]) + step:02d}"
+
+
+class _Strings:
+    __slots__ = ('strings', '_ids')
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def id(self, value):
+        if not isinstance(value, str):
+            raise ValueError(f"expected a string, got {value!r}")
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+
+def encode(plan):
+    """Compact form of a rendered plan (see the module docstring)."""
+    if not isinstance(plan, dict) or not isinstance(plan.get('days'), list):
+        raise ValueError("not a plan with days")
+    strings = _Strings()
+    days = {"index": [], "date": [], "bs": [], "exam": [], "status": [], "subject": [], "tasks": []}
+    tasks = {"gap": [], "minutes": [], "type": [], "label": [], "subject": [], "ends": []}
+    start = prev_date = None
+    prev_index, prev_bs = 0, None
+
+    for day in plan['days']:
+        if not isinstance(day, dict) or day.keys() != _DAY_KEYS:
+            raise ValueError("unexpected day fields")
+        day_id = day['id']
+        if not isinstance(day_id, str) or not day_id.startswith('day-') or not day_id[4:].isdigit() or str(int(day_id[4:])) != day_id[4:]:
+            raise ValueError(f"unexpected day id: {day_id!r}")
+        if not isinstance(day['ad_date'], str):
+            raise ValueError(f"unexpected ad_date on {day_id}")
+        ad = date.fromisoformat(day['ad_date'])
+        if ad.isoformat() != day['ad_date'] or day['day_of_week'] != _WEEKDAYS[ad.weekday()]:
+            raise ValueError(f"unexpected date fields on {day_id}")
+        if not isinstance(day['is_exam_day'], bool) or not isinstance(day['bs_date'], str) or not isinstance(day['tasks'], list):
+            raise ValueError(f"unexpected field types on {day_id}")
+
+        index = int(day_id[4:])
+        days["index"].append(index - prev_index)
+        if start is None:
+            start = prev_date = ad
+        days["date"].append((ad - prev_date).days)
+        days["bs"].append(_bs_step(prev_bs, day['bs_date']))
+        days["exam"].append(int(day['is_exam_day']))
+        days["status"].append(strings.id(day['status']))
+        days["subject"].append(strings.id(day['subject']))
+        days["tasks"].append(len(day['tasks']))
+        prev_index, prev_date, prev_bs = index, ad, day['bs_date']
+
+        end = None
+        for task in day['tasks']:
+            if not isinstance(task, dict) or not (task.keys() == _TASK_KEYS or task.keys() == _TASK_KEYS | {'subject'}):
+                raise ValueError(f"unexpected task fields on {day_id}")
+            minutes = task['minutes']
+            if type(minutes) is not int or minutes < 0:
+                raise ValueError(f"unexpected task minutes on {day_id}")
+            if not isinstance(task['time'], str):
+                raise ValueError(f"unexpected task time on {day_id}")
+            first, sep, last = task['time'].partition(' - ')
+            if not sep:
+                raise ValueError(f"unexpected task time on {day_id}")
+            begin, finish = _minute(first), _minute(last)
+            if finish != (begin + minutes) % 1440:
+                tasks["ends"].append([len(tasks["gap"]), finish])
+            tasks["gap"].append(begin if end is None else (begin - end) % 1440)
+            tasks["minutes"].append(minutes)
+            tasks["type"].append(strings.id(task['type']))
+            tasks["label"].append(strings.id(task['activity']))
+            tasks["subject"].append(strings.id(task['subject']) if 'subject' in task else -1)
+            end = begin + minutes
+
+    return {
+        "compact": VERSION,
+        "plan": {k: v for k, v in plan.items() if k != 'days'},
+        "strings": strings.strings,
+        "start": start.isoformat() if start else None,
+        "days": days,
+        "tasks": tasks,
+    }
+
+
+def decode(doc):
+    """The plan ``encode`` was given."""
+    if doc.get("compact") != VERSION:
+        raise ValueError(f"unsupported compact version: {doc.get('compact')!r}")
+    strings, d, t = doc["strings"], doc["days"], doc["tasks"]
+    out = []
+    ad = date.fromisoformat(doc["start"]) if doc["start"] else None
+    index, bs, k = 0, None, 0
+    ends = dict(t["ends"])
+    for i in range(len(d["index"])):
+        index += d["index"][i]
+        ad += timedelta(days=d["date"][i])
+        step = d["bs"][i]
+        bs = step if isinstance(step, str) else _bs_day(bs, step)
+        day_tasks, end = [], None
+        for _ in range(d["tasks"][i]):
+            begin = t["gap"][k] if end is None else (end + t["gap"][k]) % 1440
+            minutes = t["minutes"][k]
+            task = {
+                "time": f"{_hhmm(begin)} - {_hhmm(ends.get(k, (begin + minutes) % 1440))}",
+                "activity": strings[t["label"][k]],
+                "type": strings[t["type"][k]],
+                "minutes": minutes,
+            }
+            if t["subject"][k] >= 0:
+                task["subject"] = strings[t["subject"][k]]
+            day_tasks.append(task)
+            end = begin + minutes
+            k += 1
+        out.append({
+            "id": f"day-{index}",
+            "bs_date": bs,
+            "ad_date": ad.isoformat(),
+            "day_of_week": _WEEKDAYS[ad.weekday()],
+            "is_exam_day": bool(d["exam"][i]),
+            "status": strings[d["status"][i]],
+            "subject": strings[d["subject"][i]],
+            "tasks": day_tasks,
+        })
+    return {**doc["plan"], "days": out}